@@ -23,6 +23,20 @@ config.set_main_option("sqlalchemy.url", str(settings.db_url) + "?async_fallback
 
 target_metadata = Base.metadata
 
+# Объекты, которые ведутся только миграциями и не описаны в моделях:
+# генерируемый интервал события и exclusion-констрейнт по нему, столбцы
+# полнотекстового поиска и их индексы
+DB_ONLY_OBJECTS = {
+    ("column", "Slot"), ("index", "ex_Events_PlatformID_Slot"),
+    ("column", "SearchVector"),
+    ("index", "ix_Platforms_SearchVector"), ("index", "ix_Events_SearchVector"),
+    ("index", "ix_Platforms_Name_trgm"), ("index", "ix_Events_Name_trgm"),
+}
+
+
+def include_object(object, name, type_, reflected, compare_to):
+    return not (reflected and compare_to is None and (type_, name) in DB_ONLY_OBJECTS)
+
 
 
 
@@ -44,6 +58,7 @@ def run_migrations_offline() -> None:
         target_metadata=target_metadata,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
+        include_object=include_object,
     )
 
     with context.begin_transaction():
@@ -65,7 +80,8 @@ def run_migrations_online() -> None:
 
     with connectable.connect() as connection:
         context.configure(
-            connection=connection, target_metadata=target_metadata
+            connection=connection, target_metadata=target_metadata,
+            include_object=include_object
         )
 
         with context.begin_transaction():
@@ -0,0 +1,30 @@
+"""updated at
+
+Revision ID: 3c1f6b2d9e47
+Revises: 8ee6c9ff5dec
+Create Date: 2026-10-17 16:05:41.218734
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3c1f6b2d9e47'
+down_revision: Union[str, None] = '8ee6c9ff5dec'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TABLES = ('Users', 'Platforms', 'Events')
+
+
+def upgrade() -> None:
+    for table in TABLES:
+        op.add_column(table, sa.Column('UpdatedAt', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False))
+
+
+def downgrade() -> None:
+    for table in TABLES:
+        op.drop_column(table, 'UpdatedAt')
@@ -0,0 +1,54 @@
+"""event slot exclusion
+
+Revision ID: 5d2a7c41e8b3
+Revises: 3c1f6b2d9e47
+Create Date: 2026-10-17 17:12:09.640215
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5d2a7c41e8b3'
+down_revision: Union[str, None] = '3c1f6b2d9e47'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Интервал занятости площадки [начало, конец). У события без дат/времени
+    # интервала нет (NULL), такие события в проверке пересечений не участвуют
+    op.execute("""
+        ALTER TABLE "Events" ADD COLUMN "Slot" tsrange GENERATED ALWAYS AS (
+            CASE WHEN "DateStart" IS NOT NULL AND "DateEnd" IS NOT NULL
+                  AND "TimeStart" IS NOT NULL AND "TimeEnd" IS NOT NULL
+                  AND "DateStart"::date + "TimeStart" < "DateEnd"::date + "TimeEnd"
+            THEN tsrange("DateStart"::date + "TimeStart", "DateEnd"::date + "TimeEnd", '[)')
+            END
+        ) STORED
+    """)
+
+    conflicts = op.get_bind().execute(sa.text("""
+        SELECT a."EventID", b."EventID" FROM "Events" a
+        JOIN "Events" b ON a."PlatformID" = b."PlatformID"
+            AND a."EventID" < b."EventID" AND a."Slot" && b."Slot"
+        LIMIT 20
+    """)).all()
+    if conflicts:
+        pairs = ", ".join(f"{a}/{b}" for a, b in conflicts)
+        raise RuntimeError(f"Events overlap on the same platform, resolve them before upgrading: {pairs}")
+
+    # Равенство PlatformID выражено через пересечение вырожденных int4range,
+    # чтобы GiST-констрейнту не требовалось расширение btree_gist
+    op.execute("""
+        ALTER TABLE "Events" ADD CONSTRAINT "ex_Events_PlatformID_Slot"
+        EXCLUDE USING gist (int4range("PlatformID", "PlatformID", '[]') WITH &&, "Slot" WITH &&)
+    """)
+
+
+def downgrade() -> None:
+    op.execute('ALTER TABLE "Events" DROP CONSTRAINT "ex_Events_PlatformID_Slot"')
+    op.drop_column('Events', 'Slot')
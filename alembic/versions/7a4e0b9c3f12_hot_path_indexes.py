@@ -0,0 +1,50 @@
+"""hot path indexes
+
+Revision ID: 7a4e0b9c3f12
+Revises: 5d2a7c41e8b3
+Create Date: 2026-10-17 18:02:55.813406
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7a4e0b9c3f12'
+down_revision: Union[str, None] = '5d2a7c41e8b3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Фильтры списков идут вместе с keyset-пагинацией по первичному ключу,
+# поэтому индексы составные: (фильтр, ID) отдает страницу без сортировки
+INDEXES = (
+    ('ix_Events_PlatformID_EventID', 'Events', '"PlatformID", "EventID"'),
+    ('ix_Events_UserID_EventID', 'Events', '"UserID", "EventID"'),
+    ('ix_Events_City_EventID', 'Events', '"City", "EventID"'),
+    ('ix_Events_DateStart', 'Events', '"DateStart"'),
+    ('ix_Platforms_City_PlatformID', 'Platforms', '"City", "PlatformID"'),
+    ('ix_Users_lower_Login', 'Users', 'lower("Login")'),
+)
+
+
+def upgrade() -> None:
+    # CONCURRENTLY не блокирует запись, но не работает внутри транзакции
+    with op.get_context().autocommit_block():
+        bind = op.get_bind()
+        for name, table, columns in INDEXES:
+            # После прерванной сборки остается невалидный индекс, IF NOT EXISTS его бы пропустил
+            invalid = bind.execute(sa.text(
+                "SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+                "WHERE c.relname = :name AND NOT i.indisvalid"
+            ), {"name": name}).first()
+            if invalid:
+                op.execute(f'DROP INDEX CONCURRENTLY "{name}"')
+            op.execute(f'CREATE INDEX CONCURRENTLY IF NOT EXISTS "{name}" ON "{table}" ({columns})')
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, _, _ in reversed(INDEXES):
+            op.execute(f'DROP INDEX CONCURRENTLY IF EXISTS "{name}"')
@@ -0,0 +1,40 @@
+"""image refcounts
+
+Revision ID: 8ee6c9ff5dec
+Revises: a0dfc92459b4
+Create Date: 2026-10-17 13:40:12.508311
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8ee6c9ff5dec'
+down_revision: Union[str, None] = 'a0dfc92459b4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('Images',
+    sa.Column('FileName', sa.String(length=255), nullable=False),
+    sa.Column('RefCount', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('FileName')
+    )
+    # Счетчики для уже загруженных файлов
+    op.execute("""
+        INSERT INTO "Images" ("FileName", "RefCount")
+        SELECT "FileName", count(*) FROM (
+            SELECT "Image" AS "FileName" FROM "Platforms" WHERE "Image" IS NOT NULL
+            UNION ALL
+            SELECT regexp_replace("PhotoURL", '^.*/', '') FROM "Users" WHERE "PhotoURL" LIKE '%/uploads/%'
+        ) refs
+        GROUP BY "FileName"
+    """)
+
+
+def downgrade() -> None:
+    op.drop_table('Images')
@@ -0,0 +1,82 @@
+"""search vectors
+
+Revision ID: 9e3b5a1c7d20
+Revises: 7a4e0b9c3f12
+Create Date: 2026-10-17 20:41:09.517203
+
+"""
+import logging
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9e3b5a1c7d20'
+down_revision: Union[str, None] = '7a4e0b9c3f12'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+log = logging.getLogger("alembic.runtime.migration")
+
+# Веса: A - название (по нему же подсказки), B - город и адрес, C - описание.
+# Конфигурация указана явно, иначе to_tsvector не IMMUTABLE и столбец не сгенерировать
+VECTORS = {
+    'Platforms': """
+        setweight(to_tsvector('russian', coalesce("Name", '')), 'A') ||
+        setweight(to_tsvector('russian', coalesce("City", '') || ' ' || coalesce("Address", '')), 'B')
+    """,
+    'Events': """
+        setweight(to_tsvector('russian', coalesce("Name", '')), 'A') ||
+        setweight(to_tsvector('russian', coalesce("City", '') || ' ' || coalesce("Address", '')), 'B') ||
+        setweight(to_tsvector('russian', coalesce("Description", '')), 'C')
+    """,
+}
+
+INDEXES = (
+    ('ix_Platforms_SearchVector', 'Platforms', 'gin', '"SearchVector"'),
+    ('ix_Events_SearchVector', 'Events', 'gin', '"SearchVector"'),
+)
+# Нечеткий поиск по названию, только если расширение pg_trgm доступно на сервере
+TRIGRAM_INDEXES = (
+    ('ix_Platforms_Name_trgm', 'Platforms', 'gin', '"Name" gin_trgm_ops'),
+    ('ix_Events_Name_trgm', 'Events', 'gin', '"Name" gin_trgm_ops'),
+)
+
+
+def _create_indexes(bind, indexes):
+    for name, table, method, columns in indexes:
+        # После прерванной сборки остается невалидный индекс, IF NOT EXISTS его бы пропустил
+        invalid = bind.execute(sa.text(
+            "SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+            "WHERE c.relname = :name AND NOT i.indisvalid"
+        ), {"name": name}).first()
+        if invalid:
+            op.execute(f'DROP INDEX CONCURRENTLY "{name}"')
+        op.execute(f'CREATE INDEX CONCURRENTLY IF NOT EXISTS "{name}" ON "{table}" USING {method} ({columns})')
+
+
+def upgrade() -> None:
+    for table, vector in VECTORS.items():
+        op.execute(f'ALTER TABLE "{table}" ADD COLUMN "SearchVector" tsvector GENERATED ALWAYS AS ({vector}) STORED')
+
+    bind = op.get_bind()
+    trigram = bind.execute(sa.text(
+        "SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'"
+    )).first()
+    if trigram:
+        op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    else:
+        log.warning("pg_trgm недоступен, нечеткий поиск по названиям будет выключен")
+
+    with op.get_context().autocommit_block():
+        _create_indexes(bind, INDEXES + (TRIGRAM_INDEXES if trigram else ()))
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, _, _, _ in reversed(INDEXES + TRIGRAM_INDEXES):
+            op.execute(f'DROP INDEX CONCURRENTLY IF EXISTS "{name}"')
+    for table in reversed(list(VECTORS)):
+        op.execute(f'ALTER TABLE "{table}" DROP COLUMN "SearchVector"')
@@ -0,0 +1,50 @@
+"""platform geohash
+
+Revision ID: a0dfc92459b4
+Revises: 8bf714679e37
+Create Date: 2026-10-17 12:05:41.218734
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.utils.geo import encode_geohash
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a0dfc92459b4'
+down_revision: Union[str, None] = '8bf714679e37'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('Platforms', sa.Column('GeoHash', sa.BigInteger(), nullable=True))
+
+    # Заполняем GeoHash для уже существующих площадок
+    platforms = sa.table(
+        'Platforms',
+        sa.column('PlatformID', sa.Integer()),
+        sa.column('Latitude', sa.Float()),
+        sa.column('Longitude', sa.Float()),
+        sa.column('GeoHash', sa.BigInteger()),
+    )
+    bind = op.get_bind()
+    rows = bind.execute(
+        sa.select(platforms.c.PlatformID, platforms.c.Latitude, platforms.c.Longitude)
+    ).all()
+    for platform_id, latitude, longitude in rows:
+        bind.execute(
+            platforms.update()
+            .where(platforms.c.PlatformID == platform_id)
+            .values(GeoHash=encode_geohash(latitude, longitude))
+        )
+
+    op.create_index(op.f('ix_Platforms_GeoHash'), 'Platforms', ['GeoHash'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_Platforms_GeoHash'), table_name='Platforms')
+    op.drop_column('Platforms', 'GeoHash')
@@ -0,0 +1,42 @@
+"""platforms notify
+
+Revision ID: b4d8f2a6c913
+Revises: 9e3b5a1c7d20
+Create Date: 2026-10-17 22:14:37.204816
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b4d8f2a6c913'
+down_revision: Union[str, None] = '9e3b5a1c7d20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # ID измененной площадки для каталогов в памяти воркеров
+    # (app/service/platform_service/platform_catalog.py). NOTIFY доставляется
+    # после commit и не доставляется при откате
+    op.execute("""
+        CREATE OR REPLACE FUNCTION platforms_notify() RETURNS trigger AS $$
+        BEGIN
+            PERFORM pg_notify('platforms_changed', COALESCE(NEW."PlatformID", OLD."PlatformID")::text);
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER "tr_Platforms_notify"
+        AFTER INSERT OR UPDATE OR DELETE ON "Platforms"
+        FOR EACH ROW EXECUTE FUNCTION platforms_notify()
+    """)
+
+
+def downgrade() -> None:
+    op.execute('DROP TRIGGER IF EXISTS "tr_Platforms_notify" ON "Platforms"')
+    op.execute('DROP FUNCTION IF EXISTS platforms_notify()')
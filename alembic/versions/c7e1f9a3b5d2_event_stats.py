@@ -0,0 +1,163 @@
+"""event stats
+
+Revision ID: c7e1f9a3b5d2
+Revises: b4d8f2a6c913
+Create Date: 2026-10-18 01:12:44.618203
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c7e1f9a3b5d2'
+down_revision: Union[str, None] = 'b4d8f2a6c913'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('EventStatsPlatforms',
+    sa.Column('PlatformID', sa.Integer(), nullable=False),
+    sa.Column('Events', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('PlatformID')
+    )
+    op.create_table('EventStatsCities',
+    sa.Column('City', sa.String(length=255), nullable=False),
+    sa.Column('Events', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('City')
+    )
+    op.create_table('EventStatsDays',
+    sa.Column('Day', sa.Date(), nullable=False),
+    sa.Column('Events', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('Day')
+    )
+    op.create_table('EventStatsPlatformDays',
+    sa.Column('PlatformID', sa.Integer(), nullable=False),
+    sa.Column('Day', sa.Date(), nullable=False),
+    sa.Column('Events', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('PlatformID', 'Day')
+    )
+
+    # Прибавляет изменения (+1 новая строка, -1 старая) к счетчикам. Строки
+    # счетчиков блокируются в порядке таблиц и ключей, поэтому параллельные
+    # записи не взаимоблокируются, но записи одного города или дня ждут
+    # друг друга до commit; f1c3e5a7b9d2 раскладывает счетчики по шардам.
+    # Изменение, не затронувшее площадку, город и дату, сворачивается в 0
+    # и ничего не пишет
+    op.execute("""
+        CREATE OR REPLACE FUNCTION event_stats_apply(platform_ids int[], cities text[], days date[], deltas int[])
+        RETURNS void AS $$
+            INSERT INTO "EventStatsPlatforms" AS s ("PlatformID", "Events")
+            SELECT t.pid, sum(t.delta) FROM unnest(platform_ids, deltas) AS t(pid, delta)
+            GROUP BY t.pid HAVING sum(t.delta) <> 0 ORDER BY t.pid
+            ON CONFLICT ("PlatformID") DO UPDATE SET "Events" = s."Events" + EXCLUDED."Events";
+
+            INSERT INTO "EventStatsCities" AS s ("City", "Events")
+            SELECT t.city, sum(t.delta) FROM unnest(cities, deltas) AS t(city, delta)
+            GROUP BY t.city HAVING sum(t.delta) <> 0 ORDER BY t.city
+            ON CONFLICT ("City") DO UPDATE SET "Events" = s."Events" + EXCLUDED."Events";
+
+            INSERT INTO "EventStatsDays" AS s ("Day", "Events")
+            SELECT t.day, sum(t.delta) FROM unnest(days, deltas) AS t(day, delta)
+            WHERE t.day IS NOT NULL
+            GROUP BY t.day HAVING sum(t.delta) <> 0 ORDER BY t.day
+            ON CONFLICT ("Day") DO UPDATE SET "Events" = s."Events" + EXCLUDED."Events";
+
+            INSERT INTO "EventStatsPlatformDays" AS s ("PlatformID", "Day", "Events")
+            SELECT t.pid, t.day, sum(t.delta) FROM unnest(platform_ids, days, deltas) AS t(pid, day, delta)
+            WHERE t.day IS NOT NULL
+            GROUP BY t.pid, t.day HAVING sum(t.delta) <> 0 ORDER BY t.pid, t.day
+            ON CONFLICT ("PlatformID", "Day") DO UPDATE SET "Events" = s."Events" + EXCLUDED."Events";
+        $$ LANGUAGE sql
+    """)
+    # Триггеры уровня выражения с таблицами переходов: пакетная вставка
+    # (POST /events/bulk, генератор данных) обновляет каждый счетчик один раз
+    op.execute("""
+        CREATE OR REPLACE FUNCTION events_stats() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                PERFORM event_stats_apply(
+                    array_agg("PlatformID"), array_agg(COALESCE("City", '')),
+                    array_agg(CAST("DateStart" AS date)), array_agg(1)
+                ) FROM new_rows;
+            ELSIF TG_OP = 'DELETE' THEN
+                PERFORM event_stats_apply(
+                    array_agg("PlatformID"), array_agg(COALESCE("City", '')),
+                    array_agg(CAST("DateStart" AS date)), array_agg(-1)
+                ) FROM old_rows;
+            ELSE
+                PERFORM event_stats_apply(array_agg(pid), array_agg(city), array_agg(day), array_agg(delta))
+                FROM (
+                    SELECT "PlatformID" AS pid, COALESCE("City", '') AS city, CAST("DateStart" AS date) AS day, 1 AS delta
+                    FROM new_rows
+                    UNION ALL
+                    SELECT "PlatformID", COALESCE("City", ''), CAST("DateStart" AS date), -1
+                    FROM old_rows
+                ) changes;
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER "tr_Events_stats_insert" AFTER INSERT ON "Events"
+        REFERENCING NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION events_stats()
+    """)
+    op.execute("""
+        CREATE TRIGGER "tr_Events_stats_update" AFTER UPDATE ON "Events"
+        REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION events_stats()
+    """)
+    op.execute("""
+        CREATE TRIGGER "tr_Events_stats_delete" AFTER DELETE ON "Events"
+        REFERENCING OLD TABLE AS old_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION events_stats()
+    """)
+    op.execute("""
+        CREATE OR REPLACE FUNCTION events_stats_truncate() RETURNS trigger AS $$
+        BEGIN
+            TRUNCATE "EventStatsPlatforms", "EventStatsCities", "EventStatsDays", "EventStatsPlatformDays";
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER "tr_Events_stats_truncate" AFTER TRUNCATE ON "Events"
+        FOR EACH STATEMENT EXECUTE FUNCTION events_stats_truncate()
+    """)
+
+    # Счетчики для уже записанных событий
+    op.execute("""
+        INSERT INTO "EventStatsPlatforms" ("PlatformID", "Events")
+        SELECT "PlatformID", count(*) FROM "Events" GROUP BY "PlatformID"
+    """)
+    op.execute("""
+        INSERT INTO "EventStatsCities" ("City", "Events")
+        SELECT COALESCE("City", ''), count(*) FROM "Events" GROUP BY COALESCE("City", '')
+    """)
+    op.execute("""
+        INSERT INTO "EventStatsDays" ("Day", "Events")
+        SELECT CAST("DateStart" AS date), count(*) FROM "Events"
+        WHERE "DateStart" IS NOT NULL GROUP BY CAST("DateStart" AS date)
+    """)
+    op.execute("""
+        INSERT INTO "EventStatsPlatformDays" ("PlatformID", "Day", "Events")
+        SELECT "PlatformID", CAST("DateStart" AS date), count(*) FROM "Events"
+        WHERE "DateStart" IS NOT NULL GROUP BY "PlatformID", CAST("DateStart" AS date)
+    """)
+
+
+def downgrade() -> None:
+    for trigger in ("insert", "update", "delete", "truncate"):
+        op.execute(f'DROP TRIGGER IF EXISTS "tr_Events_stats_{trigger}" ON "Events"')
+    op.execute('DROP FUNCTION IF EXISTS events_stats_truncate()')
+    op.execute('DROP FUNCTION IF EXISTS events_stats()')
+    op.execute('DROP FUNCTION IF EXISTS event_stats_apply(int[], text[], date[], int[])')
+    op.drop_table('EventStatsPlatformDays')
+    op.drop_table('EventStatsDays')
+    op.drop_table('EventStatsCities')
+    op.drop_table('EventStatsPlatforms')
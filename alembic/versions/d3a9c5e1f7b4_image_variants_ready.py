@@ -0,0 +1,29 @@
+"""image variants ready
+
+Revision ID: d3a9c5e1f7b4
+Revises: c7e1f9a3b5d2
+Create Date: 2026-10-18 03:24:10.512937
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd3a9c5e1f7b4'
+down_revision: Union[str, None] = 'c7e1f9a3b5d2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Для уже загруженных файлов отметки ставит python -m app.storage.variants
+    op.add_column('Platforms', sa.Column('ImageVariantsReady', sa.Boolean(), server_default=sa.text('false'), nullable=False))
+    op.add_column('Users', sa.Column('PhotoVariantsReady', sa.Boolean(), server_default=sa.text('false'), nullable=False))
+
+
+def downgrade() -> None:
+    op.drop_column('Users', 'PhotoVariantsReady')
+    op.drop_column('Platforms', 'ImageVariantsReady')
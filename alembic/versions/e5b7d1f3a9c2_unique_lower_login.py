@@ -0,0 +1,60 @@
+"""unique lower login
+
+Revision ID: e5b7d1f3a9c2
+Revises: d3a9c5e1f7b4
+Create Date: 2026-10-18 04:12:37.518273
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5b7d1f3a9c2'
+down_revision: Union[str, None] = 'd3a9c5e1f7b4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Логин ищется без учета регистра, поэтому и уникален без учета регистра.
+# Уникальный индекс заменяет обычный ix_Users_lower_Login из 7a4e0b9c3f12
+NAME = 'ux_Users_lower_Login'
+
+
+def _duplicates(bind) -> list:
+    return bind.execute(sa.text("""
+        SELECT string_agg("UserID" || ':' || "Login", ', ' ORDER BY "UserID") FROM "Users"
+        GROUP BY lower("Login") HAVING count(*) > 1
+        ORDER BY min("UserID")
+    """)).scalars().all()
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    duplicates = _duplicates(bind)
+    if duplicates:
+        shown = "\n".join(duplicates[:50])
+        raise RuntimeError(
+            f"Логины, различающиеся только регистром (групп: {len(duplicates)}, формат UserID:Login) - "
+            f"переименуйте их и повторите миграцию:\n{shown}"
+        )
+
+    # CONCURRENTLY не блокирует запись, но не работает внутри транзакции
+    with op.get_context().autocommit_block():
+        # Сборку прерывает и дубликат, вставленный во время нее: невалидный
+        # индекс удаляется, иначе IF NOT EXISTS его бы пропустил
+        invalid = bind.execute(sa.text(
+            "SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+            "WHERE c.relname = :name AND NOT i.indisvalid"
+        ), {"name": NAME}).first()
+        if invalid:
+            op.execute(f'DROP INDEX CONCURRENTLY "{NAME}"')
+        op.execute(f'CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS "{NAME}" ON "Users" (lower("Login"))')
+        op.execute('DROP INDEX CONCURRENTLY IF EXISTS "ix_Users_lower_Login"')
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.execute('CREATE INDEX CONCURRENTLY IF NOT EXISTS "ix_Users_lower_Login" ON "Users" (lower("Login"))')
+        op.execute(f'DROP INDEX CONCURRENTLY IF EXISTS "{NAME}"')
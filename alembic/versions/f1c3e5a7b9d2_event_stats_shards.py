@@ -0,0 +1,117 @@
+"""event stats shards
+
+Revision ID: f1c3e5a7b9d2
+Revises: e5b7d1f3a9c2
+Create Date: 2026-10-18 05:02:18.304716
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f1c3e5a7b9d2'
+down_revision: Union[str, None] = 'e5b7d1f3a9c2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Счетчики одного города или дня обновляет почти каждая запись событий, и
+# одна строка на ключ сериализовала бы все такие транзакции до их commit.
+# Теперь у ключа до SHARDS строк: соединение пишет в шард pg_backend_pid() % SHARDS,
+# поэтому параллельные записи из разных соединений почти не делят строки,
+# а чтение суммирует шарды. Число строк на ключ ограничено, свертка не нужна
+SHARDS = 16
+
+TABLES = {
+    'EventStatsPlatforms': ('PlatformID',),
+    'EventStatsCities': ('City',),
+    'EventStatsDays': ('Day',),
+    'EventStatsPlatformDays': ('PlatformID', 'Day'),
+}
+
+
+# Строки счетчиков блокируются в порядке таблиц и ключей, поэтому записи,
+# попавшие в один шард, ждут друг друга, но не взаимоблокируются.
+# Изменение, не затронувшее площадку, город и дату, сворачивается в 0
+# и ничего не пишет
+APPLY_SHARDED = f"""
+    CREATE OR REPLACE FUNCTION event_stats_apply(platform_ids int[], cities text[], days date[], deltas int[])
+    RETURNS void AS $$
+        INSERT INTO "EventStatsPlatforms" AS s ("PlatformID", "Shard", "Events")
+        SELECT t.pid, CAST(pg_backend_pid() % {SHARDS} AS smallint), sum(t.delta)
+        FROM unnest(platform_ids, deltas) AS t(pid, delta)
+        GROUP BY t.pid HAVING sum(t.delta) <> 0 ORDER BY t.pid
+        ON CONFLICT ("PlatformID", "Shard") DO UPDATE SET "Events" = s."Events" + EXCLUDED."Events";
+
+        INSERT INTO "EventStatsCities" AS s ("City", "Shard", "Events")
+        SELECT t.city, CAST(pg_backend_pid() % {SHARDS} AS smallint), sum(t.delta)
+        FROM unnest(cities, deltas) AS t(city, delta)
+        GROUP BY t.city HAVING sum(t.delta) <> 0 ORDER BY t.city
+        ON CONFLICT ("City", "Shard") DO UPDATE SET "Events" = s."Events" + EXCLUDED."Events";
+
+        INSERT INTO "EventStatsDays" AS s ("Day", "Shard", "Events")
+        SELECT t.day, CAST(pg_backend_pid() % {SHARDS} AS smallint), sum(t.delta)
+        FROM unnest(days, deltas) AS t(day, delta)
+        WHERE t.day IS NOT NULL
+        GROUP BY t.day HAVING sum(t.delta) <> 0 ORDER BY t.day
+        ON CONFLICT ("Day", "Shard") DO UPDATE SET "Events" = s."Events" + EXCLUDED."Events";
+
+        INSERT INTO "EventStatsPlatformDays" AS s ("PlatformID", "Day", "Shard", "Events")
+        SELECT t.pid, t.day, CAST(pg_backend_pid() % {SHARDS} AS smallint), sum(t.delta)
+        FROM unnest(platform_ids, days, deltas) AS t(pid, day, delta)
+        WHERE t.day IS NOT NULL
+        GROUP BY t.pid, t.day HAVING sum(t.delta) <> 0 ORDER BY t.pid, t.day
+        ON CONFLICT ("PlatformID", "Day", "Shard") DO UPDATE SET "Events" = s."Events" + EXCLUDED."Events";
+    $$ LANGUAGE sql
+"""
+
+# Функция из c7e1f9a3b5d2, для downgrade
+APPLY_UNSHARDED = """
+    CREATE OR REPLACE FUNCTION event_stats_apply(platform_ids int[], cities text[], days date[], deltas int[])
+    RETURNS void AS $$
+        INSERT INTO "EventStatsPlatforms" AS s ("PlatformID", "Events")
+        SELECT t.pid, sum(t.delta) FROM unnest(platform_ids, deltas) AS t(pid, delta)
+        GROUP BY t.pid HAVING sum(t.delta) <> 0 ORDER BY t.pid
+        ON CONFLICT ("PlatformID") DO UPDATE SET "Events" = s."Events" + EXCLUDED."Events";
+
+        INSERT INTO "EventStatsCities" AS s ("City", "Events")
+        SELECT t.city, sum(t.delta) FROM unnest(cities, deltas) AS t(city, delta)
+        GROUP BY t.city HAVING sum(t.delta) <> 0 ORDER BY t.city
+        ON CONFLICT ("City") DO UPDATE SET "Events" = s."Events" + EXCLUDED."Events";
+
+        INSERT INTO "EventStatsDays" AS s ("Day", "Events")
+        SELECT t.day, sum(t.delta) FROM unnest(days, deltas) AS t(day, delta)
+        WHERE t.day IS NOT NULL
+        GROUP BY t.day HAVING sum(t.delta) <> 0 ORDER BY t.day
+        ON CONFLICT ("Day") DO UPDATE SET "Events" = s."Events" + EXCLUDED."Events";
+
+        INSERT INTO "EventStatsPlatformDays" AS s ("PlatformID", "Day", "Events")
+        SELECT t.pid, t.day, sum(t.delta) FROM unnest(platform_ids, days, deltas) AS t(pid, day, delta)
+        WHERE t.day IS NOT NULL
+        GROUP BY t.pid, t.day HAVING sum(t.delta) <> 0 ORDER BY t.pid, t.day
+        ON CONFLICT ("PlatformID", "Day") DO UPDATE SET "Events" = s."Events" + EXCLUDED."Events";
+    $$ LANGUAGE sql
+"""
+
+
+def upgrade() -> None:
+    for table, keys in TABLES.items():
+        op.add_column(table, sa.Column('Shard', sa.SmallInteger(), server_default=sa.text('0'), nullable=False))
+        op.drop_constraint(f'{table}_pkey', table, type_='primary')
+        op.create_primary_key(f'{table}_pkey', table, [*keys, 'Shard'])
+    op.execute(APPLY_SHARDED)
+
+
+def downgrade() -> None:
+    op.execute(APPLY_UNSHARDED)
+    for table, keys in TABLES.items():
+        columns = ', '.join(f'"{key}"' for key in keys)
+        op.execute(f'CREATE TEMP TABLE folded AS SELECT {columns}, sum("Events") AS "Events" FROM "{table}" GROUP BY {columns}')
+        op.execute(f'DELETE FROM "{table}"')
+        op.drop_constraint(f'{table}_pkey', table, type_='primary')
+        op.drop_column(table, 'Shard')
+        op.create_primary_key(f'{table}_pkey', table, list(keys))
+        op.execute(f'INSERT INTO "{table}" ({columns}, "Events") SELECT {columns}, "Events" FROM folded')
+        op.execute('DROP TABLE folded')
@@ -0,0 +1,11 @@
+from app.cache.backends import MISSING, CacheBackend, MemoryCache, NullCache, RedisCache, create_cache
+from app.settings.settings import settings
+
+# Общий кэш пользователей процесса. Бэкенд "memory" живет внутри воркера,
+# "redis" разделяется между воркерами и инвалидируется для всех сразу
+user_cache: CacheBackend = create_cache(
+    settings.USER_CACHE_BACKEND,
+    max_size=settings.USER_CACHE_SIZE,
+    url=settings.USER_CACHE_URL,
+    prefix="kurs:user:"
+)
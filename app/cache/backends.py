@@ -0,0 +1,143 @@
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Tuple
+
+
+class _Missing:
+    def __repr__(self):
+        return "MISSING"
+
+
+# Отличает "ключа нет в кэше" от закэшированного None (отрицательный результат)
+MISSING = _Missing()
+
+
+class CacheBackend:
+    """Интерфейс кэша. Значения - JSON-совместимые объекты, ttl в секундах."""
+
+    async def get(self, key: str) -> Any:
+        raise NotImplementedError
+
+    async def set(self, key: str, value: Any, ttl: float):
+        raise NotImplementedError
+
+    async def delete(self, *keys: str):
+        raise NotImplementedError
+
+    async def close(self):
+        pass
+
+    def stats(self) -> Dict[str, int]:
+        return {}
+
+
+class NullCache(CacheBackend):
+    """Кэш выключен: всегда промах."""
+
+    async def get(self, key: str) -> Any:
+        return MISSING
+
+    async def set(self, key: str, value: Any, ttl: float):
+        pass
+
+    async def delete(self, *keys: str):
+        pass
+
+
+class MemoryCache(CacheBackend):
+    """TTL + LRU в памяти процесса.
+
+    При переполнении вытесняется запись, к которой дольше всего не обращались,
+    просроченная запись удаляется при первом чтении после истечения.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, Tuple[Any, float]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    async def get(self, key: str) -> Any:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return MISSING
+        value, expires_at = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            self.misses += 1
+            return MISSING
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    async def set(self, key: str, value: Any, ttl: float):
+        if ttl <= 0 or self.max_size <= 0:
+            return
+        self._entries[key] = (value, time.monotonic() + ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    async def delete(self, *keys: str):
+        for key in keys:
+            self._entries.pop(key, None)
+
+    def stats(self) -> Dict[str, int]:
+        return {"size": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+class RedisCache(CacheBackend):
+    """Общий для всех воркеров кэш в Redis.
+
+    Вытеснение по памяти настраивается на стороне Redis (maxmemory-policy
+    allkeys-lru), TTL ставится на каждый ключ. Пакет redis нужен только
+    для этого бэкенда. Для проверки без сервера подходит клиент fakeredis.
+    """
+
+    def __init__(self, url: str = "", prefix: str = "", client=None):
+        if client is None:
+            try:
+                import redis.asyncio as redis
+            except ImportError as e:
+                raise RuntimeError("Для USER_CACHE_BACKEND=redis нужен пакет redis") from e
+            client = redis.Redis.from_url(url)
+        self.client = client
+        self.prefix = prefix
+        self.hits = 0
+        self.misses = 0
+
+    async def get(self, key: str) -> Any:
+        raw = await self.client.get(self.prefix + key)
+        if raw is None:
+            self.misses += 1
+            return MISSING
+        self.hits += 1
+        return json.loads(raw)
+
+    async def set(self, key: str, value: Any, ttl: float):
+        if ttl <= 0:
+            return
+        await self.client.set(self.prefix + key, json.dumps(value), px=int(ttl * 1000))
+
+    async def delete(self, *keys: str):
+        if keys:
+            await self.client.delete(*[self.prefix + key for key in keys])
+
+    async def close(self):
+        await self.client.aclose()
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses}
+
+
+def create_cache(backend: str, max_size: int = 0, url: str = "", prefix: str = "") -> CacheBackend:
+    """Создает бэкенд по имени из настроек: memory, redis или none."""
+    if backend == "memory":
+        return MemoryCache(max_size)
+    if backend == "redis":
+        return RedisCache(url, prefix=prefix)
+    if backend == "none":
+        return NullCache()
+    raise ValueError(f"Неизвестный бэкенд кэша: {backend}")
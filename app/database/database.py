@@ -5,19 +5,84 @@ from sqlalchemy.ext.asyncio import (
     create_async_engine,
     AsyncEngine
 )
+from typing import Optional
+from uuid import uuid4
 import os
 
 from app.settings.settings import settings
+from app.metrics.sql import InstrumentedAsyncPool, instrument_engine
+from app.metrics.profiler import profiler_enabled, instrument_profiler
 
-async def get_engine() -> AsyncEngine:
-    return create_async_engine(str(settings.db_url))
+# Один движок и одна фабрика сессий на процесс: создаются в lifespan (main.py)
+# и переиспользуются всеми запросами, чтобы пул соединений asyncpg не пересоздавался.
+_engine: Optional[AsyncEngine] = None
+_session_factory: Optional[sessionmaker] = None
 
 
-async def get_session():
+def _connect_args() -> dict:
+    if not settings.DB_TRANSACTION_POOLING:
+        return {}
+    # За PgBouncer в режиме transaction pooling соседние запросы могут уйти в разные
+    # серверные соединения, поэтому кэши подготовленных выражений asyncpg отключаем,
+    # а имена выражений делаем уникальными.
+    return {
+        "statement_cache_size": 0,
+        "prepared_statement_cache_size": 0,
+        "prepared_statement_name_func": lambda: f"__asyncpg_{uuid4()}__",
+    }
+
+
+def create_engine_from_settings() -> AsyncEngine:
+    if settings.DATABASE_URL and settings.DATABASE_URL.startswith("sqlite"):
+        # У SQLite свой пул (для :memory: - одно соединение), настройки пула не применяются
+        return create_async_engine(settings.DATABASE_URL)
+    pool_options = {"poolclass": InstrumentedAsyncPool} if settings.METRICS_ENABLED else {}
+    return create_async_engine(
+        settings.DATABASE_URL or str(settings.db_url),
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        connect_args=_connect_args(),
+        **pool_options,
+    )
+
+
+def init_engine() -> AsyncEngine:
+    """Создает движок и фабрику сессий, если они еще не созданы."""
+    global _engine, _session_factory
+    if _engine is None:
+        _engine = create_engine_from_settings()
+        if settings.METRICS_ENABLED:
+            instrument_engine(_engine)
+        if profiler_enabled():
+            instrument_profiler(_engine)
+        _session_factory = sessionmaker(_engine, class_=AsyncSession, expire_on_commit=False)
+    return _engine
+
+
+async def dispose_engine():
+    """Закрывает все соединения пула при остановке приложения."""
+    global _engine, _session_factory
+    if _engine is not None:
+        await _engine.dispose()
+    _engine = None
+    _session_factory = None
 
-    async_session = sessionmaker(await get_engine(), class_=AsyncSession, expire_on_commit=False)
-    async with async_session() as session:
+
+def get_engine() -> AsyncEngine:
+    return init_engine()
+
+
+def get_session_factory() -> sessionmaker:
+    init_engine()
+    return _session_factory
+
+
+async def get_session():
+    async with get_session_factory()() as session:
         try:
             yield session
         finally:
-            await session.close()
\ No newline at end of file
+            await session.close()
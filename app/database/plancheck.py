@@ -0,0 +1,187 @@
+"""Проверка планов запросов сервисов на отсутствие последовательного сканирования.
+
+Запуск: python -m app.database.plancheck [--users N] [--platforms N] [--events N] [--strict]
+
+Внутри одной транзакции таблицы наполняются тестовыми данными, собирается
+статистика (ANALYZE), затем вызываются методы EventService, PlatformService
+и UserService. Каждый выполненный ими SELECT повторяется через EXPLAIN, и
+если в плане есть Seq Scan по таблицам приложения, проверка падает с кодом 1.
+В конце транзакция откатывается, данные в базе не меняются.
+
+С --strict последовательное сканирование запрещается планировщику
+(enable_seqscan = off): Seq Scan в плане остается, только если подходящего
+индекса нет вовсе. В тестах (tests/test_plancheck.py) проверка запускается
+в этом режиме на небольших объемах, если Postgres из настроек доступен.
+"""
+import argparse
+import asyncio
+import random
+import sys
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, List, Tuple
+
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
+
+from app.database.database import get_engine, dispose_engine
+from app.service.events_service.events_service import EventService
+from app.service.platform_service.platform_service import PlatformService
+from app.service.user_service.user_service import UserService
+from app.service.search_service.search_service import SearchService
+from app.utils.geo import encode_geohash
+
+TABLES = {"Users", "Platforms", "Events"}
+CITIES = 50
+SEED_START = datetime(2020, 1, 1)
+
+
+async def _seed(conn: AsyncConnection, users: int, platforms: int, events: int) -> Tuple[int, int]:
+    """Наполняет таблицы и возвращает первые ID новых пользователей и площадок."""
+    first_user = (await conn.execute(text("""
+        WITH ins AS (
+            INSERT INTO "Users" ("Login", "Email", "PasswordHash", "City")
+            SELECT 'plancheck_' || g, 'plancheck_' || g || '@example.com', 'x', 'city' || (g % :cities)
+            FROM generate_series(1, :n) g
+            RETURNING "UserID"
+        ) SELECT min("UserID") FROM ins
+    """), {"n": users, "cities": CITIES})).scalar_one()
+
+    rng = random.Random(0)
+    rows = []
+    for i in range(platforms):
+        lat, lon = rng.uniform(41, 70), rng.uniform(20, 180)
+        rows.append({
+            "name": f"plancheck_{i}", "city": f"city{i % CITIES}",
+            "lat": lat, "lon": lon, "geohash": encode_geohash(lat, lon)
+        })
+    await conn.execute(text("""
+        INSERT INTO "Platforms" ("Name", "City", "Address", "Latitude", "Longitude", "GeoHash")
+        VALUES (:name, :city, '', :lat, :lon, :geohash)
+    """), rows)
+    first_platform = (await conn.execute(text(
+        'SELECT min("PlatformID") FROM "Platforms" WHERE "Name" LIKE \'plancheck\\_%\''
+    ))).scalar_one()
+
+    # На каждой площадке по одному событию в день, интервалы не пересекаются
+    await conn.execute(text("""
+        INSERT INTO "Events" ("UserID", "PlatformID", "Name", "City",
+                              "DateStart", "DateEnd", "TimeStart", "TimeEnd")
+        SELECT :u + g % :users, :p + g % :platforms, 'plancheck', 'city' || (g % :cities),
+               CAST(:start AS timestamp) + (g / :platforms) * interval '1 day',
+               CAST(:start AS timestamp) + (g / :platforms) * interval '1 day',
+               time '10:00', time '11:00'
+        FROM generate_series(0, :n - 1) g
+    """), {
+        "u": first_user, "p": first_platform, "users": users, "platforms": platforms,
+        "cities": CITIES, "n": events, "start": SEED_START
+    })
+    await conn.execute(text('ANALYZE "Users", "Platforms", "Events"'))
+    return first_user, first_platform
+
+
+def _seq_scans(plan: dict) -> List[str]:
+    found = []
+    if plan.get("Node Type") == "Seq Scan" and plan.get("Relation Name") in TABLES:
+        found.append(plan["Relation Name"])
+    for child in plan.get("Plans", []):
+        found += _seq_scans(child)
+    return found
+
+
+def _summary(plan: dict) -> str:
+    nodes = []
+
+    def walk(node):
+        label = node["Node Type"]
+        if "Index Name" in node:
+            label += f" {node['Index Name']}"
+        elif "Relation Name" in node:
+            label += f" {node['Relation Name']}"
+        nodes.append(label)
+        for child in node.get("Plans", []):
+            walk(child)
+
+    walk(plan)
+    return " > ".join(nodes)
+
+
+async def main(args: argparse.Namespace) -> int:
+    engine = get_engine()
+    captured: List[Tuple[str, tuple]] = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(("SELECT", "WITH")):
+            captured.append((statement, parameters))
+
+    failed = 0
+    checks: List[Tuple[str, Callable[[], Awaitable]]] = []
+    try:
+        async with engine.connect() as conn:
+            transaction = await conn.begin()
+            try:
+                first_user, first_platform = await _seed(conn, args.users, args.platforms, args.events)
+                if args.strict:
+                    await conn.execute(text("SET LOCAL enable_seqscan = off"))
+                session = AsyncSession(bind=conn, join_transaction_mode="create_savepoint", expire_on_commit=False)
+                events, platforms, users = EventService(session), PlatformService(session), UserService(session)
+                search = SearchService(session)
+
+                user_id = first_user + args.users // 2
+                platform_id = first_platform + args.platforms // 2
+                day = SEED_START + timedelta(days=(args.events // args.platforms) // 2)
+                window = (day.replace(hour=9), day.replace(hour=12))
+                checks = [
+                    ("EventService.get_event_by_id", lambda: events.get_event_by_id(1)),
+                    ("EventService.get_all_events", lambda: events.get_all_events(50)),
+                    ("EventService.get_all_events(platform_id)", lambda: events.get_all_events(50, platform_id=platform_id)),
+                    ("EventService.get_all_events(user_id)", lambda: events.get_all_events(50, user_id=user_id)),
+                    ("EventService.get_all_events(city)", lambda: events.get_all_events(50, city="city7")),
+                    ("EventService.get_page_version(platform_id)", lambda: events.get_page_version(50, platform_id=platform_id)),
+                    ("EventService.get_busy_intervals", lambda: events.get_busy_intervals([platform_id], *window)),
+                    ("EventService.find_overlaps", lambda: events.find_overlaps(platform_id, window)),
+                    ("PlatformService.get_platform", lambda: platforms.get_platform(platform_id)),
+                    ("PlatformService.get_all_platforms(city)", lambda: platforms.get_all_platforms(50, city="city7")),
+                    ("PlatformService.get_page_version(city)", lambda: platforms.get_page_version(50, city="city7")),
+                    ("PlatformService.get_platform_ids(city)", lambda: platforms.get_platform_ids(city="city7")),
+                    ("PlatformService.get_nearby_platforms", lambda: platforms.get_nearby_platforms(55.75, 37.62, 5, 10)),
+                    ("SearchService.search", lambda: search.search(f"plancheck {platform_id - first_platform} city7")),
+                    ("SearchService.suggest", lambda: search.suggest(f"plancheck {args.platforms // 3}")),
+                    ("UserService.get_user_by_id", lambda: users.get_user_by_id(user_id)),
+                    ("UserService.get_user_by_login", lambda: users.get_user_by_login(f"PlanCheck_{args.users // 3}")),
+                    ("UserService.get_profile(Email)", lambda: users.get_profile(Email=f"plancheck_{args.users // 4}@example.com")),
+                ]
+
+                for name, call in checks:
+                    captured.clear()
+                    event.listen(engine.sync_engine, "before_cursor_execute", capture)
+                    try:
+                        await call()
+                    finally:
+                        event.remove(engine.sync_engine, "before_cursor_execute", capture)
+                    if not captured:
+                        print(f"SKIP {name}: запрос не выполнялся")
+                        continue
+                    for statement, parameters in captured:
+                        result = await conn.exec_driver_sql("EXPLAIN (FORMAT JSON) " + statement, parameters)
+                        plan = result.scalar_one()[0]["Plan"]
+                        scans = _seq_scans(plan)
+                        status = "FAIL" if scans else "OK"
+                        failed += bool(scans)
+                        print(f"{status:4} {name}: {_summary(plan)}")
+                await session.close()
+            finally:
+                await transaction.rollback()
+    finally:
+        await dispose_engine()
+
+    print(f"\nПроверок: {len(checks)}, с последовательным сканированием: {failed}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Проверка планов запросов сервисов")
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--platforms", type=int, default=2000)
+    parser.add_argument("--events", type=int, default=100000)
+    parser.add_argument("--strict", action="store_true", help="запретить планировщику Seq Scan (enable_seqscan = off)")
+    sys.exit(asyncio.run(main(parser.parse_args())))
@@ -0,0 +1,67 @@
+from time import perf_counter
+from typing import Dict
+
+from starlette.routing import Mount
+
+from app.metrics.registry import registry
+
+REQUESTS = registry.counter(
+    "http_requests_total", "HTTP-запросы по шаблону маршрута и коду ответа",
+    ("method", "route", "status")
+)
+REQUEST_SECONDS = registry.histogram(
+    "http_request_duration_seconds", "Время обработки HTTP-запроса до конца тела ответа",
+    ("method", "route")
+)
+
+# Запросы мимо всех маршрутов (404) - одна метка, чтобы не плодить ряды по сырым путям
+UNMATCHED = "<unmatched>"
+
+
+class MetricsMiddleware:
+    """ASGI-middleware без BaseHTTPMiddleware: тело ответа не буферизуется,
+    стриминг не ломается. Метка route - шаблон пути ("/v1/platforms/{platform_id}"),
+    его кладет в scope маршрутизатор FastAPI."""
+
+    def __init__(self, app):
+        self.app = app
+        self._mounts: Dict[int, str] = {}
+
+    def _route(self, scope) -> str:
+        route = scope.get("route")
+        if route is not None:
+            return route.path
+        # Mount (раздача /uploads) не пишет route, только endpoint - само приложение
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return UNMATCHED
+        template = self._mounts.get(id(endpoint))
+        if template is None:
+            for candidate in scope["app"].routes:
+                if isinstance(candidate, Mount) and candidate.app is endpoint:
+                    template = self._mounts[id(endpoint)] = candidate.path + "/{path}"
+                    break
+            else:
+                return UNMATCHED
+        return template
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        started = perf_counter()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = self._route(scope)
+            method = scope["method"]
+            REQUEST_SECONDS.observe(perf_counter() - started, (method, route))
+            REQUESTS.inc((method, route, status))
@@ -0,0 +1,249 @@
+"""Профилировщик SQL в пределах одного HTTP-запроса.
+
+Включается для всех запросов (PROFILER_ENABLED) или для отдельного запроса
+заголовком X-Debug-Profile: "<unix-время>:<подпись>", где подпись -
+HMAC-SHA256 от "<время>:<метод>:<путь>" ключом PROFILER_SECRET (см.
+sign_profile_header или python -m app.metrics.profiler GET /v1/events/).
+Подпись живет PROFILER_SIGNATURE_TTL секунд и привязана к пути, поэтому
+подсмотренный заголовок не включит профиль для других запросов.
+
+Выражения собираются слушателями движка в объект профиля из contextvar:
+запросы без профиля платят одним ContextVar.get на выражение. В ответ
+добавляются заголовки:
+    X-DB-Statements  - число выражений
+    X-DB-Repeated    - число форм, повторенных PROFILER_REPEAT_THRESHOLD раз и больше
+    Server-Timing    - db;dur=<мс суммарно>
+Полный отчет (самые медленные выражения, повторы, план самого медленного:
+EXPLAIN ANALYZE для чтения, EXPLAIN без выполнения для остального) пишется
+в лог app.metrics.profiler одной строкой JSON. Выражения, выполненные после
+начала ответа (потоковые списки), попадают только в лог.
+
+Форма выражения - текст с параметрами, замененными на "?", и списками
+параметров IN, свернутыми в один: одинаковые SELECT, различающиеся только
+значениями, - типичный след N+1 (ленивая загрузка связей в цикле).
+"""
+import contextvars
+import hashlib
+import hmac
+import json
+import logging
+import re
+import time
+from time import perf_counter
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import event
+
+from app.settings.settings import settings
+
+logger = logging.getLogger(__name__)
+
+HEADER = b"x-debug-profile"
+# Длина выражения в логе; полный текст нужен только для EXPLAIN
+STATEMENT_LOG_CHARS = 500
+EXPLAIN_TIMEOUT_MS = 5000
+
+# Параметр любого paramstyle; "::" - приведение типа, не параметр
+_PARAMETER = r"(?:\$\d+|\?|%\(\w+\)s|(?<!:):\w+)"
+_PARAMETER_LIST = re.compile(rf"{_PARAMETER}(?:\s*,\s*{_PARAMETER})*")
+_NUMBER = re.compile(r"(?<![\w\"$])\d+(?:\.\d+)?\b")
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_SPACES = re.compile(r"\s+")
+# Признаки изменения данных или блокировок, в том числе в CTE (WITH old AS ... UPDATE)
+_WRITES = re.compile(r"\b(?:INSERT|UPDATE|DELETE|MERGE|FOR\s+(?:NO\s+KEY\s+|KEY\s+)?SHARE)\b", re.IGNORECASE)
+# Выражения, для которых EXPLAIN имеет смысл
+_EXPLAINABLE = ("SELECT", "WITH", "INSERT", "UPDATE", "DELETE")
+
+_profile: contextvars.ContextVar[Optional["Profile"]] = contextvars.ContextVar("sql_profile", default=None)
+
+
+def statement_shape(statement: str) -> str:
+    """Текст выражения без значений: параметры и литералы заменены на "?"."""
+    shape = _STRING.sub("?", statement)
+    shape = _PARAMETER_LIST.sub("?", shape)
+    shape = _NUMBER.sub("?", shape)
+    return _SPACES.sub(" ", shape).strip()
+
+
+class Profile:
+    def __init__(self):
+        # (выражение, параметры, длительность в секундах)
+        self.statements: List[Tuple[str, object, float]] = []
+
+    def add(self, statement: str, parameters, duration: float):
+        self.statements.append((statement, parameters, duration))
+
+    @property
+    def total(self) -> float:
+        return sum(duration for _, _, duration in self.statements)
+
+    def slowest(self, count: int) -> List[Tuple[str, object, float]]:
+        return sorted(self.statements, key=lambda item: item[2], reverse=True)[:count]
+
+    def repeated(self, threshold: int) -> List[dict]:
+        """SELECT, повторенные по форме threshold раз и больше, от частых к редким."""
+        shapes: Dict[str, list] = {}
+        for statement, _, duration in self.statements:
+            shape = statement_shape(statement)
+            if not shape[:6].upper().startswith(("SELECT", "WITH")):
+                continue
+            stats = shapes.setdefault(shape, [0, 0.0])
+            stats[0] += 1
+            stats[1] += duration
+        found = [
+            {"shape": shape[:STATEMENT_LOG_CHARS], "count": count, "total_ms": round(total * 1000, 3)}
+            for shape, (count, total) in shapes.items() if count >= threshold
+        ]
+        return sorted(found, key=lambda item: item["count"], reverse=True)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _profile.get() is not None:
+        context._profile_started = perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = _profile.get()
+    started = getattr(context, "_profile_started", None)
+    if profile is not None and started is not None:
+        profile.add(statement, parameters, perf_counter() - started)
+
+
+def profiler_enabled() -> bool:
+    return settings.PROFILER_ENABLED or bool(settings.PROFILER_SECRET)
+
+
+def instrument_profiler(engine):
+    """Подключает сбор выражений профиля к движку (AsyncEngine или Engine)."""
+    sync_engine = getattr(engine, "sync_engine", engine)
+    event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def _signature(secret: str, timestamp: str, method: str, path: str) -> str:
+    message = f"{timestamp}:{method.upper()}:{path}".encode()
+    return hmac.new(secret.encode(), message, hashlib.sha256).hexdigest()
+
+
+def sign_profile_header(method: str, path: str, secret: Optional[str] = None) -> str:
+    """Значение X-Debug-Profile для запроса method path (путь без query string)."""
+    timestamp = str(int(time.time()))
+    return f"{timestamp}:{_signature(secret or settings.PROFILER_SECRET, timestamp, method, path)}"
+
+
+def verify_profile_header(value: str, method: str, path: str) -> bool:
+    secret = settings.PROFILER_SECRET
+    if not secret:
+        return False
+    timestamp, _, signature = value.partition(":")
+    try:
+        age = time.time() - int(timestamp)
+    except ValueError:
+        return False
+    if not -60 <= age <= settings.PROFILER_SIGNATURE_TTL:
+        return False
+    return hmac.compare_digest(signature, _signature(secret, timestamp, method, path))
+
+
+def is_read_only(statement: str) -> bool:
+    """SELECT верхнего уровня без изменений данных и блокировок строк.
+
+    ANALYZE выполняет выражение по-настоящему: откат возвращает данные, но
+    не блокировки, срабатывания триггеров (NOTIFY, статистика) и значения
+    последовательностей, поэтому выполнять можно только такие выражения.
+    """
+    text = _STRING.sub("?", statement).lstrip()
+    return text[:6].upper() == "SELECT" and not _WRITES.search(text)
+
+
+async def _explain(statement: str, parameters) -> Optional[str]:
+    """План выражения в отдельной транзакции, которая откатывается.
+    ANALYZE - только для выражений только для чтения (is_read_only)."""
+    from app.database.database import get_engine
+
+    engine = get_engine()
+    if engine.dialect.name != "postgresql":
+        return None
+    options = "(ANALYZE, BUFFERS) " if is_read_only(statement) else ""
+    async with engine.connect() as connection:
+        await connection.exec_driver_sql(f"SET LOCAL statement_timeout = {EXPLAIN_TIMEOUT_MS}")
+        result = await connection.exec_driver_sql(f"EXPLAIN {options}{statement}", parameters)
+        plan = "\n".join(row[0] for row in result)
+        await connection.rollback()
+    return plan
+
+
+class ProfilerMiddleware:
+    """ASGI-middleware: заводит профиль для запроса и отдает сводку в заголовках."""
+
+    def __init__(self, app):
+        self.app = app
+
+    def _wanted(self, scope) -> bool:
+        if settings.PROFILER_ENABLED:
+            return True
+        for name, value in scope["headers"]:
+            if name == HEADER:
+                return verify_profile_header(value.decode("latin-1"), scope["method"], scope["path"])
+        return False
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self._wanted(scope):
+            return await self.app(scope, receive, send)
+
+        profile = Profile()
+        token = _profile.set(profile)
+        threshold = settings.PROFILER_REPEAT_THRESHOLD
+        status = 500
+
+        async def send_with_profile(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((b"x-db-statements", str(len(profile.statements)).encode()))
+                headers.append((b"x-db-repeated", str(len(profile.repeated(threshold))).encode()))
+                headers.append((b"server-timing", f"db;dur={profile.total * 1000:.3f}".encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        started = perf_counter()
+        try:
+            await self.app(scope, receive, send_with_profile)
+        finally:
+            _profile.reset(token)
+            await self._log(scope, status, profile, perf_counter() - started)
+
+    async def _log(self, scope, status: int, profile: Profile, elapsed: float):
+        slowest = profile.slowest(settings.PROFILER_SLOWEST)
+        report = {
+            "method": scope["method"],
+            "path": scope["path"],
+            "status": status,
+            "duration_ms": round(elapsed * 1000, 3),
+            "statements": len(profile.statements),
+            "db_ms": round(profile.total * 1000, 3),
+            "slowest": [
+                {"ms": round(duration * 1000, 3), "statement": statement[:STATEMENT_LOG_CHARS]}
+                for statement, _, duration in slowest
+            ],
+            "repeated": profile.repeated(settings.PROFILER_REPEAT_THRESHOLD),
+        }
+        if settings.PROFILER_EXPLAIN:
+            candidates = [item for item in slowest if item[0].lstrip()[:6].upper().startswith(_EXPLAINABLE)]
+            if candidates:
+                statement, parameters, _ = candidates[0]
+                try:
+                    report["explain"] = await _explain(statement, parameters)
+                except Exception as exc:
+                    report["explain_error"] = str(exc)
+        level = logging.WARNING if report["repeated"] else logging.INFO
+        logger.log(level, "sql profile %s", json.dumps(report, ensure_ascii=False, default=str))
+
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) != 3 or not settings.PROFILER_SECRET:
+        sys.exit("usage: python -m app.metrics.profiler METHOD PATH (нужен PROFILER_SECRET)")
+    print(f"X-Debug-Profile: {sign_profile_header(sys.argv[1], sys.argv[2])}")
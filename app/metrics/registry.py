@@ -0,0 +1,146 @@
+"""Метрики процесса в текстовом формате Prometheus.
+
+Счетчики и гистограммы хранятся в словарях по кортежу значений меток,
+запись - один bisect и сложение под блокировкой (bcrypt пишет из своих
+потоков). Гистограмма хранит число наблюдений в каждом интервале, в
+накопленный вид для le они переводятся только при выдаче /metrics.
+Значения, которые и так где-то считаются (размеры пула, статистика кэшей),
+снимаются функциями-сборщиками в момент запроса.
+
+Метрики у каждого воркера свои: при нескольких воркерах uvicorn Prometheus
+видит тот процесс, который ответил на запрос.
+"""
+import math
+import threading
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+
+# Интервалы по умолчанию - время HTTP-запроса в секундах
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence, extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _number(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if isinstance(value, int) or float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Metric:
+    type = "untyped"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+
+    def samples(self) -> Iterable[str]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+        lines.extend(self.samples())
+        return lines
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        super().__init__(name, help, labels)
+        self._values: Dict[tuple, float] = {}
+
+    def inc(self, labels: tuple = (), amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self) -> Iterable[str]:
+        for values, total in list(self._values.items()):
+            yield f"{self.name}{_labels(self.labels, values)} {_number(total)}"
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+        # По метке: число наблюдений в каждом интервале (последний - до +Inf) и сумма
+        self._series: Dict[tuple, list] = {}
+
+    def observe(self, value: float, labels: tuple = ()):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def samples(self) -> Iterable[str]:
+        with self._lock:
+            snapshot = [(values, list(series)) for values, series in self._series.items()]
+        for values, series in snapshot:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), series):
+                cumulative += count
+                le = 'le="' + _number(bound) + '"'
+                yield f"{self.name}_bucket{_labels(self.labels, values, le)} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.labels, values)} {_number(series[-1])}"
+            yield f"{self.name}_count{_labels(self.labels, values)} {cumulative}"
+
+
+class Collected(Metric):
+    """Значения снимаются функцией в момент выдачи: [(значения меток, число)]."""
+
+    def __init__(self, name: str, help: str, collect: Callable[[], Iterable[Tuple[tuple, float]]],
+                 labels: Sequence[str] = (), type: str = "gauge"):
+        super().__init__(name, help, labels)
+        self.type = type
+        self.collect = collect
+
+    def samples(self) -> Iterable[str]:
+        for values, value in self.collect():
+            yield f"{self.name}{_labels(self.labels, values)} {_number(value)}"
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+
+    def _add(self, metric: Metric) -> Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Метрика {metric.name} уже зарегистрирована")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str, labels: Sequence[str] = ()) -> Counter:
+        return self._add(Counter(name, help, labels))
+
+    def histogram(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._add(Histogram(name, help, labels, buckets))
+
+    def collected(self, name: str, help: str, collect, labels: Sequence[str] = (), type: str = "gauge") -> Collected:
+        return self._add(Collected(name, help, collect, labels, type))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
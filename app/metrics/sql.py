@@ -0,0 +1,90 @@
+from time import perf_counter
+
+from sqlalchemy import event
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from app.metrics.registry import registry
+
+# SQL и пул - от долей миллисекунды до таймаута пула (DB_POOL_TIMEOUT)
+FAST_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 30.0)
+
+STATEMENT_SECONDS = registry.histogram(
+    "db_statement_duration_seconds", "Время выполнения SQL-выражения драйвером",
+    ("operation",), FAST_BUCKETS
+)
+STATEMENT_ERRORS = registry.counter("db_statement_errors_total", "SQL-выражения, завершившиеся ошибкой", ("operation",))
+POOL_WAIT_SECONDS = registry.histogram(
+    "db_pool_checkout_wait_seconds", "Ожидание соединения из пула (включая открытие нового)",
+    buckets=FAST_BUCKETS
+)
+POOL_HELD_SECONDS = registry.histogram(
+    "db_pool_connection_held_seconds", "Сколько соединение было занято от выдачи до возврата в пул",
+    buckets=FAST_BUCKETS
+)
+
+_OPERATIONS = ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH")
+
+
+def _operation(statement: str) -> str:
+    head = statement[:16].lstrip()[:6].upper()
+    for operation in _OPERATIONS:
+        if head.startswith(operation):
+            return operation
+    return "OTHER"
+
+
+class InstrumentedAsyncPool(AsyncAdaptedQueuePool):
+    """Пул, замеряющий ожидание соединения: у SQLAlchemy нет события до выдачи."""
+
+    def _do_get(self):
+        started = perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            POOL_WAIT_SECONDS.observe(perf_counter() - started)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._metrics_started = perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, "_metrics_started", None)
+    if started is not None:
+        STATEMENT_SECONDS.observe(perf_counter() - started, (_operation(statement),))
+
+
+def _handle_error(exception_context):
+    statement = exception_context.statement
+    STATEMENT_ERRORS.inc((_operation(statement) if statement else "OTHER",))
+
+
+def _checkout(dbapi_connection, connection_record, connection_proxy):
+    connection_record.info["metrics_checkout"] = perf_counter()
+
+
+def _checkin(dbapi_connection, connection_record):
+    started = connection_record.info.pop("metrics_checkout", None)
+    if started is not None:
+        POOL_HELD_SECONDS.observe(perf_counter() - started)
+
+
+def instrument_engine(engine):
+    """Подключает замеры SQL и пула к движку (AsyncEngine или Engine)."""
+    sync_engine = getattr(engine, "sync_engine", engine)
+    event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(sync_engine, "handle_error", _handle_error)
+    event.listen(sync_engine.pool, "checkout", _checkout)
+    event.listen(sync_engine.pool, "checkin", _checkin)
+
+
+def pool_usage(engine):
+    """Текущее состояние пула для сборщика: занято, свободно, сверх pool_size, размер."""
+    pool = getattr(engine, "sync_engine", engine).pool
+    stats = []
+    for state, method in (("checked_out", "checkedout"), ("idle", "checkedin"), ("overflow", "overflow"), ("size", "size")):
+        getter = getattr(pool, method, None)
+        if getter is not None:
+            stats.append(((state,), max(getter(), 0)))
+    return stats
@@ -1,12 +1,16 @@
 from sqlalchemy.orm import declarative_base, Mapped, mapped_column, relationship
-from sqlalchemy import Integer, String, Float, DateTime, Time, Boolean, Text, ForeignKey
-from datetime import time, date
+from sqlalchemy import Integer, BigInteger, SmallInteger, String, Float, Date, DateTime, Time, Boolean, Text, ForeignKey, Index, func, text
+from datetime import time, date, datetime
 
 
 Base = declarative_base()
 
 class User(Base):
     __tablename__ = "Users"
+    __table_args__ = (
+        # Логин ищется и уникален без учета регистра
+        Index("ux_Users_lower_Login", text('lower("Login")'), unique=True),
+    )
 
     UserID: Mapped[int] = mapped_column(Integer, autoincrement=True, primary_key=True)
     Login: Mapped[str] = mapped_column(String(255), unique=True)
@@ -18,12 +22,26 @@ class User(Base):
     City: Mapped[str] = mapped_column(String(255), nullable=True)
     Phone: Mapped[str] = mapped_column(String(20), nullable=True)
     PhotoURL: Mapped[str] = mapped_column(String(255), nullable=True)
+    # Варианты фото построены (см. app/storage/variants.py); отметка меняет UpdatedAt и ETag
+    PhotoVariantsReady: Mapped[bool] = mapped_column(Boolean, nullable=False, default=False, server_default=text("false"))
+    # Время последнего изменения строки, по нему строятся ETag и Last-Modified
+    UpdatedAt: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), nullable=False, server_default=func.now(), onupdate=func.now()
+    )
 
-    events: Mapped[list["Event"]] = relationship("Event", back_populates="user")
+    # Порядок по EventID совпадает с индексом ix_Events_UserID_EventID
+    events: Mapped[list["Event"]] = relationship("Event", back_populates="user", order_by="Event.EventID")
 
 
 class Event(Base):
     __tablename__ = "Events"
+    __table_args__ = (
+        # (фильтр, ID) под keyset-пагинацию списков
+        Index("ix_Events_PlatformID_EventID", "PlatformID", "EventID"),
+        Index("ix_Events_UserID_EventID", "UserID", "EventID"),
+        Index("ix_Events_City_EventID", "City", "EventID"),
+        Index("ix_Events_DateStart", "DateStart"),
+    )
 
     EventID: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     UserID: Mapped[int] = mapped_column(Integer, ForeignKey("Users.UserID"), nullable=False)
@@ -34,8 +52,15 @@ class Event(Base):
     DateEnd: Mapped[date] = mapped_column(DateTime, nullable=True)
     TimeStart: Mapped[time] = mapped_column(Time, nullable=True)  # Используем тип time
     TimeEnd: Mapped[time] = mapped_column(Time, nullable=True)    # Используем тип time
+    # В БД есть еще генерируемый столбец "Slot" (tsrange) и exclusion-констрейнт
+    # против пересечений на одной площадке, см. миграцию 5d2a7c41e8b3,
+    # и столбец "SearchVector" (tsvector) для поиска, см. миграцию 9e3b5a1c7d20
     Description: Mapped[str] = mapped_column(String(500), nullable=True)
     Address: Mapped[str] = mapped_column(String(255), nullable=True)
+    # Время последнего изменения строки, по нему строятся ETag и Last-Modified
+    UpdatedAt: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), nullable=False, server_default=func.now(), onupdate=func.now()
+    )
 
     # Связи
     user: Mapped["User"] = relationship("User", back_populates="events")
@@ -44,14 +69,78 @@ class Event(Base):
 
 class Platform(Base):
     __tablename__ = "Platforms"
+    __table_args__ = (
+        Index("ix_Platforms_City_PlatformID", "City", "PlatformID"),
+    )
 
     PlatformID: Mapped[int] = mapped_column(Integer, autoincrement=True, primary_key=True)
     Name: Mapped[str] = mapped_column(String(255), nullable=False)
     City: Mapped[str] = mapped_column(String(255), nullable=True)
     Address: Mapped[str] = mapped_column(String(255), nullable=True)
     Image: Mapped[str] = mapped_column(String(255), nullable=True)
+    # Варианты изображения построены (см. app/storage/variants.py); отметка меняет UpdatedAt и ETag
+    ImageVariantsReady: Mapped[bool] = mapped_column(Boolean, nullable=False, default=False, server_default=text("false"))
     Latitude: Mapped[float] = mapped_column(Float, nullable=True)
     Longitude: Mapped[float] = mapped_column(Float, nullable=True)
+    # Целочисленный geohash (см. app/utils/geo.py) для поиска ближайших площадок
+    GeoHash: Mapped[int] = mapped_column(BigInteger, nullable=True, index=True)
+    # В БД есть еще генерируемый столбец "SearchVector" (tsvector) для поиска,
+    # см. миграцию 9e3b5a1c7d20
+    # Время последнего изменения строки, по нему строятся ETag и Last-Modified
+    UpdatedAt: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), nullable=False, server_default=func.now(), onupdate=func.now()
+    )
 
     # Связи
-    events: Mapped[list["Event"]] = relationship("Event", back_populates="platform")
\ No newline at end of file
+    # Порядок по EventID совпадает с индексом ix_Events_PlatformID_EventID
+    events: Mapped[list["Event"]] = relationship("Event", back_populates="platform", order_by="Event.EventID")
+
+
+class StoredImage(Base):
+    """Счетчик ссылок на файл в каталоге загрузок (Platform.Image, User.PhotoURL)."""
+    __tablename__ = "Images"
+
+    FileName: Mapped[str] = mapped_column(String(255), primary_key=True)
+    RefCount: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+
+
+# Сводные счетчики событий для /v1/stats. В Postgres их ведут триггеры на
+# "Events" (миграция c7e1f9a3b5d2) в той же транзакции, что и изменение
+# событий; пересчет с нуля - python -m app.service.stats_service.rebuild.
+# Событие без города учитывается под пустой строкой, без даты - только
+# в счетчиках площадки и города.
+# Счетчик ключа разложен по строкам-шардам (Shard, миграция f1c3e5a7b9d2):
+# каждое соединение пишет в свой шард, значение - сумма по шардам.
+
+class EventStatsPlatform(Base):
+    __tablename__ = "EventStatsPlatforms"
+
+    PlatformID: Mapped[int] = mapped_column(Integer, primary_key=True)
+    Shard: Mapped[int] = mapped_column(SmallInteger, primary_key=True, default=0, server_default=text("0"))
+    Events: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+
+
+class EventStatsCity(Base):
+    __tablename__ = "EventStatsCities"
+
+    City: Mapped[str] = mapped_column(String(255), primary_key=True)
+    Shard: Mapped[int] = mapped_column(SmallInteger, primary_key=True, default=0, server_default=text("0"))
+    Events: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+
+
+class EventStatsDay(Base):
+    __tablename__ = "EventStatsDays"
+
+    Day: Mapped[date] = mapped_column(Date, primary_key=True)
+    Shard: Mapped[int] = mapped_column(SmallInteger, primary_key=True, default=0, server_default=text("0"))
+    Events: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+
+
+class EventStatsPlatformDay(Base):
+    """Для предстоящих событий площадки: сумма по дням от сегодняшнего."""
+    __tablename__ = "EventStatsPlatformDays"
+
+    PlatformID: Mapped[int] = mapped_column(Integer, primary_key=True)
+    Day: Mapped[date] = mapped_column(Date, primary_key=True)
+    Shard: Mapped[int] = mapped_column(SmallInteger, primary_key=True, default=0, server_default=text("0"))
+    Events: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
@@ -1,37 +1,192 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.database.database import get_session
-from app.service.events_service.events_service import EventService
-from app.schemas.request.events.events_schemas import EventCreate, EventUpdate, EventResponse
-from typing import List
+from app.database.database import get_session, get_session_factory
+from app.service.events_service.events_service import EventService, BULK_MAX_EVENTS, EVENT_INCLUDES
+from app.service.platform_service.platform_service import platform_fields
+from app.security.current_user import get_current_user_id
+from app.schemas.request.events.events_schemas import EventCreate, EventUpdate, EventResponse, EventBulkResponse, EventBulkError, EventWithRelations
+from app.utils.pagination import decode_cursor, set_next_cursor, DEFAULT_PAGE_LIMIT, MAX_PAGE_LIMIT
+from app.utils.streaming import wants_stream, ndjson_response
+from app.utils.conditional import make_etag, conditional_response, rows_version
+from app.utils.serialization import SchemaMapper, json_response
+from app.utils.include import include_query
+from typing import Any, Dict, FrozenSet, List, Optional
 
 router = APIRouter(prefix="/events", tags=["Events"])
 
+_events = SchemaMapper(EventResponse)
+_events_with_relations = SchemaMapper(EventWithRelations)
+_event_fields = tuple(EventResponse.model_fields)
+
+
+def _with_relations(event, include: FrozenSet[str]) -> dict:
+    # Незапрошенных связей нет в dict, и при exclude_unset их нет в ответе
+    data = {field: getattr(event, field) for field in _event_fields}
+    if "platform" in include:
+        data["platform"] = platform_fields(event.platform)
+    if "user" in include:
+        data["user"] = event.user
+    return data
+
+
+def _relations_version(event, include: FrozenSet[str]) -> list:
+    return [getattr(event, name).UpdatedAt.isoformat() for name in sorted(include)]
+
+
+def _relations_page_version(events, include: FrozenSet[str]) -> tuple:
+    # Связанная строка учитывается один раз, сколько бы событий на нее ни ссылалось
+    # (в пределах сессии это один и тот же объект)
+    related = {id(getattr(event, name)): getattr(event, name) for event in events for name in include}
+    return len(related), round(sum(row.UpdatedAt.timestamp() for row in related.values()), 6)
+
 @router.post("/", response_model=EventResponse)
-async def create_event(event: EventCreate, session: AsyncSession = Depends(get_session)):
+async def create_event(
+    event: EventCreate,
+    current_user_id: int = Depends(get_current_user_id),
+    session: AsyncSession = Depends(get_session)
+):
+    if event.UserID != current_user_id:
+        raise HTTPException(status_code=403, detail="Событие можно создать только от своего имени")
     service = EventService(session)
     return await service.create_event(event)
 
-@router.get("/", response_model=List[EventResponse])  
-async def get_all_events(session: AsyncSession = Depends(get_session)):
+@router.post("/bulk", response_model=EventBulkResponse)
+async def create_events_bulk(
+    events: List[Dict[str, Any]],
+    current_user_id: int = Depends(get_current_user_id),
+    session: AsyncSession = Depends(get_session)
+):
+    # Элементы проверяются по одному в сервисе, чтобы одна ошибка
+    # не отклоняла весь пакет и в ответе был индекс проблемного события
+    if len(events) > BULK_MAX_EVENTS:
+        raise HTTPException(status_code=413, detail=f"Не больше {BULK_MAX_EVENTS} событий за запрос")
     service = EventService(session)
-    events = await service.get_all_events()
-    return events
+    created, errors = await service.create_events(events, owner_id=current_user_id)
+    result = EventBulkResponse.model_construct(
+        created=_events.many(created),
+        errors=[EventBulkError(**error) for error in errors]
+    )
+    return json_response(result.model_dump_json())
+
+@router.get("/", response_model=List[EventResponse])
+async def get_all_events(
+    request: Request,
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_LIMIT, ge=1, le=MAX_PAGE_LIMIT),
+    cursor: Optional[str] = None,
+    city: Optional[str] = None,
+    platform_id: Optional[int] = None,
+    user_id: Optional[int] = None,
+    stream: bool = False,
+    include: FrozenSet[str] = Depends(include_query(*EVENT_INCLUDES)),
+    session: AsyncSession = Depends(get_session)
+):
+    after_id = decode_cursor(cursor)
+
+    if wants_stream(request, stream):
+        if include:
+            raise HTTPException(status_code=400, detail="include не поддерживается в потоковом режиме")
+        # Сессия зависимости закрывается до отправки тела ответа,
+        # поэтому поток читает события через собственную сессию
+        async def rows():
+            async with get_session_factory()() as stream_session:
+                service = EventService(stream_session)
+                async for event in service.stream_events(after_id, city, platform_id, user_id):
+                    yield event
+
+        return ndjson_response(
+            rows(),
+            lambda e: EventResponse.model_validate(e).model_dump_json().encode()
+        )
+
+    service = EventService(session)
+    if include:
+        # Связи "к одному" приходят JOIN в том же запросе; версия страницы
+        # считается по загруженным строкам, отдельного запроса версии нет
+        events, next_id = await service.get_all_events(
+            limit,
+            after_id=after_id,
+            city=city,
+            platform_id=platform_id,
+            user_id=user_id,
+            include=include
+        )
+        etag = make_etag(
+            "events", limit, after_id, city, platform_id, user_id, *rows_version(events, "EventID"),
+            *sorted(include), *_relations_page_version(events, include)
+        )
+        not_modified = conditional_response(request, response, etag)
+        if not_modified:
+            return not_modified
+        set_next_cursor(request, response, next_id)
+        items = _events_with_relations.many(_with_relations(event, include) for event in events)
+        return json_response(_events_with_relations.dump_json(items, exclude_unset=True), response)
+
+    # Удаление не меняет max(UpdatedAt), поэтому у списка только ETag, без Last-Modified
+    count, last_update, id_sum = await service.get_page_version(
+        limit,
+        after_id=after_id,
+        city=city,
+        platform_id=platform_id,
+        user_id=user_id
+    )
+    etag = make_etag(
+        "events", limit, after_id, city, platform_id, user_id,
+        count, last_update and last_update.isoformat(), id_sum
+    )
+    not_modified = conditional_response(request, response, etag)
+    if not_modified:
+        return not_modified
+
+    events, next_id = await service.get_all_events(
+        limit,
+        after_id=after_id,
+        city=city,
+        platform_id=platform_id,
+        user_id=user_id
+    )
+    set_next_cursor(request, response, next_id)
+    return json_response(_events.dump_json(_events.many(events)), response)
 
 @router.get("/{event_id}", response_model=EventResponse)
-async def get_event(event_id: int, session: AsyncSession = Depends(get_session)):
+async def get_event(
+    event_id: int,
+    request: Request,
+    response: Response,
+    include: FrozenSet[str] = Depends(include_query(*EVENT_INCLUDES)),
+    session: AsyncSession = Depends(get_session)
+):
     service = EventService(session)
-    event = await service.get_event_by_id(event_id)
+    event = await service.get_event_by_id(event_id, include)
     if not event:
         raise HTTPException(status_code=404, detail="Событие не найдено")
+    etag = make_etag("event", event.EventID, event.UpdatedAt.isoformat(), *_relations_version(event, include))
+    last_modified = max([event.UpdatedAt] + [getattr(event, name).UpdatedAt for name in include])
+    not_modified = conditional_response(request, response, etag, last_modified)
+    if not_modified:
+        return not_modified
+    if include:
+        item = _events_with_relations.many([_with_relations(event, include)])[0]
+        return json_response(item.model_dump_json(exclude_unset=True), response)
     return event
 
 @router.put("/{event_id}", response_model=EventResponse)
-async def update_event(event_id: int, event: EventUpdate, session: AsyncSession = Depends(get_session)):
+async def update_event(
+    event_id: int,
+    event: EventUpdate,
+    current_user_id: int = Depends(get_current_user_id),
+    session: AsyncSession = Depends(get_session)
+):
+    if event.UserID is not None and event.UserID != current_user_id:
+        raise HTTPException(status_code=403, detail="Нельзя передать событие другому пользователю")
     service = EventService(session)
-    return await service.update_event(event_id, event)
+    return await service.update_event(event_id, event, owner_id=current_user_id)
 
 @router.delete("/{event_id}")
-async def delete_event(event_id: int, session: AsyncSession = Depends(get_session)):
+async def delete_event(
+    event_id: int,
+    current_user_id: int = Depends(get_current_user_id),
+    session: AsyncSession = Depends(get_session)
+):
     service = EventService(session)
-    return await service.delete_event(event_id)
\ No newline at end of file
+    return await service.delete_event(event_id, owner_id=current_user_id)
\ No newline at end of file
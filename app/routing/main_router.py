@@ -2,6 +2,8 @@ from fastapi import FastAPI, APIRouter
 from app.routing.users.user_router import router as user_router
 from app.routing.platform.platform_router import router as platform_router
 from app.routing.events.events_router import router as event_router  # Импортируем роутер для событий
+from app.routing.search.search_router import router as search_router
+from app.routing.stats.stats_router import router as stats_router
 
 # Создаем главный роутер с префиксом /v1
 main_router = APIRouter(
@@ -15,4 +17,10 @@ main_router.include_router(user_router, tags=["Users"])
 main_router.include_router(platform_router, tags=["Platforms"])
 
 # Включаем роутер для событий
-main_router.include_router(event_router, tags=["Events"])  # Добавляем роутер для событий
\ No newline at end of file
+main_router.include_router(event_router, tags=["Events"])  # Добавляем роутер для событий
+
+# Включаем роутер поиска
+main_router.include_router(search_router, tags=["Search"])
+
+# Включаем роутер статистики
+main_router.include_router(stats_router, tags=["Stats"])
\ No newline at end of file
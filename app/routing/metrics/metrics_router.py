@@ -0,0 +1,62 @@
+import hmac
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import PlainTextResponse
+from app.database.database import get_engine
+from app.metrics.registry import registry
+from app.metrics.sql import pool_usage
+from app.security.hasher import get_rounds
+from app.security.current_user import token_cache
+from app.cache import user_cache
+from app.service.search_service.search_service import suggest_cache
+from app.service.platform_service.platform_catalog import platform_catalog
+from app.settings.settings import settings
+
+router = APIRouter()
+
+# charset добавляет PlainTextResponse
+CONTENT_TYPE = "text/plain; version=0.0.4"
+
+# Кэши, чья статистика (stats()) выдается в метриках
+CACHES = {
+    "token": token_cache,
+    "user": user_cache,
+    "search_suggest": suggest_cache,
+}
+
+
+def _cache_requests():
+    for name, cache in CACHES.items():
+        stats = cache.stats()
+        if "hits" in stats:
+            yield (name, "hit"), stats["hits"]
+            yield (name, "miss"), stats["misses"]
+
+
+def _cache_entries():
+    for name, cache in CACHES.items():
+        stats = cache.stats()
+        if "size" in stats:
+            yield (name,), stats["size"]
+
+
+registry.collected(
+    "db_pool_connections", "Соединения пула: занятые, свободные, сверх pool_size, pool_size",
+    lambda: pool_usage(get_engine()), ("state",)
+)
+registry.collected("bcrypt_rounds", "Текущая стоимость bcrypt", lambda: [((), get_rounds())])
+registry.collected("cache_requests_total", "Обращения к кэшам процесса", _cache_requests, ("cache", "result"), type="counter")
+registry.collected("cache_entries", "Записей в кэшах процесса", _cache_entries, ("cache",))
+registry.collected("platform_catalog_records", "Площадок в каталоге в памяти", lambda: [((), len(platform_catalog))])
+registry.collected(
+    "platform_catalog_age_seconds", "Время с последней сверки каталога площадок с БД (-1 - не было)",
+    lambda: [((), platform_catalog.stats()["age_seconds"])]
+)
+
+
+@router.get("/metrics", include_in_schema=False)
+async def metrics(request: Request):
+    if settings.METRICS_TOKEN:
+        expected = f"Bearer {settings.METRICS_TOKEN}"
+        if not hmac.compare_digest(request.headers.get("authorization", ""), expected):
+            raise HTTPException(status_code=401, detail="Нужен токен метрик")
+    return PlainTextResponse(registry.render(), media_type=CONTENT_TYPE)
@@ -1,12 +1,63 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Query, Request, Response
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.database.database import get_session
-from app.service.platform_service.platform_service import PlatformService
-from app.schemas.request.platform.platform_schemas import PlatformResponse, PlatformCreateRequest
-from typing import List, Optional
+from app.database.database import get_session, get_session_factory
+from app.models.models import Platform
+from app.service.platform_service.platform_service import PlatformService, PLATFORM_INCLUDES, platform_fields
+from app.service.events_service.events_service import EventService
+from app.security.current_user import get_current_user_id
+from app.schemas.request.platform.platform_schemas import PlatformResponse, PlatformCreateRequest, PlatformNearbyResponse, PlatformAvailability, PlatformWithEvents
+from app.utils.pagination import decode_cursor, set_next_cursor, DEFAULT_PAGE_LIMIT, MAX_PAGE_LIMIT
+from app.utils.streaming import wants_stream, ndjson_response
+from app.utils.conditional import make_etag, conditional_response, rows_version
+from app.utils.include import include_query
+from app.utils.intervals import merge_busy, free_intervals, slot_starts
+from app.utils.serialization import SchemaMapper, json_response
+from datetime import datetime, timedelta
+from typing import FrozenSet, List, Optional
 
 router = APIRouter(prefix="/platforms", tags=["Platforms"])
 
+# Наибольшая длина окна в запросах свободного времени
+AVAILABILITY_MAX_DAYS = 31
+
+
+def _to_response(p: Platform) -> PlatformResponse:
+    return PlatformResponse(**platform_fields(p))
+
+
+_platforms = SchemaMapper(PlatformResponse, prepare=platform_fields)
+_platforms_with_events = SchemaMapper(
+    PlatformWithEvents,
+    prepare=lambda p: dict(platform_fields(p), events=p.events)
+)
+_nearby = SchemaMapper(
+    PlatformNearbyResponse,
+    prepare=lambda found: dict(platform_fields(found[0]), DistanceKm=round(found[1], 3))
+)
+
+
+def _availability_window(start: datetime, end: datetime):
+    # Время событий хранится без часового пояса, как местное время площадки
+    start, end = start.replace(tzinfo=None), end.replace(tzinfo=None)
+    if end <= start:
+        raise HTTPException(status_code=400, detail="Параметр to должен быть позже from")
+    if end - start > timedelta(days=AVAILABILITY_MAX_DAYS):
+        raise HTTPException(status_code=400, detail=f"Окно не может быть длиннее {AVAILABILITY_MAX_DAYS} дней")
+    return start, end
+
+
+def _availability(platform_id: int, busy, start: datetime, end: datetime, slot: Optional[int]) -> PlatformAvailability:
+    busy = merge_busy(busy, start, end)
+    free = free_intervals(busy, start, end)
+    return PlatformAvailability(
+        PlatformID=platform_id,
+        IsFree=not busy,
+        Free=free,
+        Busy=busy,
+        Slots=slot_starts(free, start, timedelta(minutes=slot)) if slot else None
+    )
+
+
 @router.post("/", response_model=PlatformResponse)
 async def create_platform(
     name: str = Form(...),
@@ -15,6 +66,7 @@ async def create_platform(
     latitude: float = Form(...),
     longitude: float = Form(...),
     image: UploadFile = File(...),
+    current_user_id: int = Depends(get_current_user_id),
     session: AsyncSession = Depends(get_session)
 ):
     service = PlatformService(session)
@@ -26,49 +78,154 @@ async def create_platform(
         Longitude=longitude
     )
     platform = await service.create_platform(platform_data, image)
-    return PlatformResponse(
-        PlatformID=platform.PlatformID,
-        Name=platform.Name,
-        City=platform.City,
-        Address=platform.Address,
-        Latitude=platform.Latitude,
-        Longitude=platform.Longitude,
-        ImageUrl=f"http://212.20.53.169:13299/uploads/{platform.Image}" if platform.Image else None
-    )
+    return _to_response(platform)
+
+@router.get("/nearby", response_model=List[PlatformNearbyResponse])
+async def get_nearby_platforms(
+    lat: float = Query(..., ge=-90, le=90),
+    lon: float = Query(..., ge=-180, le=180),
+    radius_km: float = Query(10, gt=0, le=1000),
+    k: int = Query(10, ge=1, le=100),
+    session: AsyncSession = Depends(get_session)
+):
+    service = PlatformService(session)
+    found = await service.get_nearby_platforms(lat, lon, radius_km, k)
+    return json_response(_nearby.dump_json(_nearby.many(found)))
+
+@router.get("/availability", response_model=List[PlatformAvailability])
+async def get_platforms_availability(
+    request: Request,
+    response: Response,
+    start: datetime = Query(..., alias="from"),
+    end: datetime = Query(..., alias="to"),
+    slot: Optional[int] = Query(None, ge=5, le=1440, description="Длина слота в минутах"),
+    ids: Optional[str] = Query(None, description="ID площадок через запятую"),
+    city: Optional[str] = None,
+    free_only: bool = False,
+    limit: int = Query(MAX_PAGE_LIMIT, ge=1, le=MAX_PAGE_LIMIT),
+    cursor: Optional[str] = None,
+    session: AsyncSession = Depends(get_session)
+):
+    # Площадки идут по возрастанию ID страницами до limit, курсор следующей
+    # страницы - в заголовках, как у списков. free_only отбирает свободные
+    # внутри страницы, поэтому страница может быть короче limit
+    after_id = decode_cursor(cursor)
+    start, end = _availability_window(start, end)
+    platform_ids = None
+    if ids:
+        try:
+            platform_ids = [int(part) for part in ids.split(",") if part.strip()]
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Параметр ids должен быть списком чисел")
+    if platform_ids is None and city is None:
+        raise HTTPException(status_code=400, detail="Нужно указать ids или city")
+
+    # Два запроса на страницу: список площадок и события окна.
+    # Берем на одну площадку больше, чтобы понять, есть ли следующая страница
+    platform_ids = await PlatformService(session).get_platform_ids(platform_ids, city, limit + 1, after_id)
+    next_id = platform_ids[limit - 1] if len(platform_ids) > limit else None
+    platform_ids = platform_ids[:limit]
+    busy = await EventService(session).get_busy_intervals(platform_ids, start, end)
+    result = [_availability(pid, busy[pid], start, end, slot) for pid in platform_ids]
+    if free_only:
+        result = [item for item in result if item.IsFree]
+    set_next_cursor(request, response, next_id)
+    return result
+
+@router.get("/{platform_id}/availability", response_model=PlatformAvailability)
+async def get_platform_availability(
+    platform_id: int,
+    start: datetime = Query(..., alias="from"),
+    end: datetime = Query(..., alias="to"),
+    slot: Optional[int] = Query(None, ge=5, le=1440, description="Длина слота в минутах"),
+    session: AsyncSession = Depends(get_session)
+):
+    start, end = _availability_window(start, end)
+    await PlatformService(session).get_platform(platform_id)
+    busy = await EventService(session).get_busy_intervals([platform_id], start, end)
+    return _availability(platform_id, busy[platform_id], start, end, slot)
 
 @router.get("/{platform_id}", response_model=PlatformResponse)
 async def get_platform(
     platform_id: int,
+    request: Request,
+    response: Response,
+    include: FrozenSet[str] = Depends(include_query(*PLATFORM_INCLUDES)),
     session: AsyncSession = Depends(get_session)
 ):
     service = PlatformService(session)
-    platform = await service.get_platform(platform_id)
-    return PlatformResponse(
-        PlatformID=platform.PlatformID,
-        Name=platform.Name,
-        City=platform.City,
-        Address=platform.Address,
-        Latitude=platform.Latitude,
-        Longitude=platform.Longitude,
-        ImageUrl=f"http://212.20.53.169:13299/uploads/{platform.Image}" if platform.Image else None
-    )
+    platform = await service.get_platform(platform_id, include)
+    if include:
+        # Удаление события не меняет UpdatedAt, поэтому только ETag
+        etag = make_etag(
+            "platform", platform.PlatformID, platform.UpdatedAt.isoformat(),
+            "events", *rows_version(platform.events, "EventID")
+        )
+        not_modified = conditional_response(request, response, etag)
+        if not_modified:
+            return not_modified
+        items = _platforms_with_events.many([platform])
+        return json_response(items[0].model_dump_json(), response)
+    etag = make_etag("platform", platform.PlatformID, platform.UpdatedAt.isoformat())
+    not_modified = conditional_response(request, response, etag, platform.UpdatedAt)
+    if not_modified:
+        return not_modified
+    return _to_response(platform)
 
 @router.get("/", response_model=List[PlatformResponse])
-async def get_all_platforms(session: AsyncSession = Depends(get_session)):
+async def get_all_platforms(
+    request: Request,
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_LIMIT, ge=1, le=MAX_PAGE_LIMIT),
+    cursor: Optional[str] = None,
+    city: Optional[str] = None,
+    stream: bool = False,
+    include: FrozenSet[str] = Depends(include_query(*PLATFORM_INCLUDES)),
+    session: AsyncSession = Depends(get_session)
+):
+    after_id = decode_cursor(cursor)
+
+    if wants_stream(request, stream):
+        if include:
+            raise HTTPException(status_code=400, detail="include не поддерживается в потоковом режиме")
+        # Сессия зависимости закрывается до отправки тела ответа,
+        # поэтому поток читает площадки через собственную сессию
+        async def rows():
+            async with get_session_factory()() as stream_session:
+                async for platform in PlatformService(stream_session).stream_platforms(after_id, city):
+                    yield platform
+
+        return ndjson_response(rows(), lambda p: _to_response(p).model_dump_json().encode())
+
     service = PlatformService(session)
-    platforms = await service.get_all_platforms()
-    return [
-        PlatformResponse(
-            PlatformID=p.PlatformID,
-            Name=p.Name,
-            City=p.City,
-            Address=p.Address,
-            Latitude=p.Latitude,
-            Longitude=p.Longitude,
-            ImageUrl=f"http://212.20.53.169:13299/uploads/{p.Image}" if p.Image else None
+    if include:
+        # Площадки и их события - два запроса на всю страницу; версия
+        # считается по загруженным строкам, отдельного запроса версии нет
+        platforms, next_id = await service.get_all_platforms(limit, after_id=after_id, city=city, include=include)
+        etag = make_etag(
+            "platforms", limit, after_id, city, *rows_version(platforms, "PlatformID"),
+            "events", *rows_version((e for p in platforms for e in p.events), "EventID")
         )
-        for p in platforms
-    ]
+        not_modified = conditional_response(request, response, etag)
+        if not_modified:
+            return not_modified
+        set_next_cursor(request, response, next_id)
+        return json_response(_platforms_with_events.dump_json(_platforms_with_events.many(platforms)), response)
+
+    # Удаление не меняет max(UpdatedAt), поэтому у списка только ETag, без Last-Modified
+    count, last_update, id_sum = await service.get_page_version(limit, after_id=after_id, city=city)
+    etag = make_etag("platforms", limit, after_id, city, count, last_update and last_update.isoformat(), id_sum)
+    not_modified = conditional_response(request, response, etag)
+    if not_modified:
+        return not_modified
+
+    platforms, next_id = await service.get_all_platforms(
+        limit,
+        after_id=after_id,
+        city=city
+    )
+    set_next_cursor(request, response, next_id)
+    return json_response(_platforms.dump_json(_platforms.many(platforms)), response)
 
 @router.put("/{platform_id}", response_model=PlatformResponse)
 async def update_platform(
@@ -79,6 +236,7 @@ async def update_platform(
     latitude: Optional[float] = Form(None),
     longitude: Optional[float] = Form(None),
     image: Optional[UploadFile] = File(None),
+    current_user_id: int = Depends(get_current_user_id),
     session: AsyncSession = Depends(get_session)
 ):
     service = PlatformService(session)
@@ -90,19 +248,12 @@ async def update_platform(
         "Longitude": longitude
     }
     platform = await service.update_platform(platform_id, platform_data, image)
-    return PlatformResponse(
-        PlatformID=platform.PlatformID,
-        Name=platform.Name,
-        City=platform.City,
-        Address=platform.Address,
-        Latitude=platform.Latitude,
-        Longitude=platform.Longitude,
-        ImageUrl=f"http://212.20.53.169:13299/uploads/{platform.Image}" if platform.Image else None
-    )
+    return _to_response(platform)
 
 @router.delete("/{platform_id}")
 async def delete_platform(
     platform_id: int,
+    current_user_id: int = Depends(get_current_user_id),
     session: AsyncSession = Depends(get_session)
 ):
     service = PlatformService(session)
@@ -0,0 +1,37 @@
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database.database import get_session
+from app.service.search_service.search_service import SearchService
+from app.schemas.request.search.search_schemas import SearchResponse, SearchSuggestion, SearchType
+from typing import List, Optional
+
+router = APIRouter(prefix="/search", tags=["Search"])
+
+# Верхние границы limit для поиска и подсказок
+SEARCH_MAX_LIMIT = 100
+SUGGEST_MAX_LIMIT = 20
+
+
+@router.get("", response_model=SearchResponse)
+async def search(
+    q: str = Query(..., min_length=1, max_length=200, description="Слова для поиска, последнее может быть неполным"),
+    type: Optional[SearchType] = Query(None, description="Только площадки или только события"),
+    city: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=SEARCH_MAX_LIMIT),
+    session: AsyncSession = Depends(get_session)
+):
+    """Поиск площадок и событий по названию, городу, адресу и описанию."""
+    items, fuzzy = await SearchService(session).search(q, type, city, limit)
+    return SearchResponse(items=items, fuzzy=fuzzy)
+
+
+@router.get("/suggest", response_model=List[SearchSuggestion])
+async def suggest(
+    q: str = Query(..., min_length=1, max_length=100),
+    type: Optional[SearchType] = None,
+    city: Optional[str] = None,
+    limit: int = Query(10, ge=1, le=SUGGEST_MAX_LIMIT),
+    session: AsyncSession = Depends(get_session)
+):
+    """Подсказки по названию для автодополнения."""
+    return await SearchService(session).suggest(q, type, city, limit)
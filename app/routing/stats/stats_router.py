@@ -0,0 +1,82 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database.database import get_session
+from app.service.stats_service.stats_service import StatsService
+from app.schemas.request.stats.stats_schemas import StatsSummary, PlatformStats, CityStats, DayStats
+from datetime import date, timedelta
+from typing import List, Optional
+
+router = APIRouter(prefix="/stats", tags=["Stats"])
+
+# Наибольшее окно по дням и число площадок в рейтинге
+STATS_MAX_DAYS = 366
+STATS_MAX_PLATFORMS = 500
+# Окно по умолчанию: от сегодняшнего дня
+DEFAULT_DAYS = 30
+
+SINCE_DESCRIPTION = "С какой даты события считаются предстоящими (по умолчанию - еще не начавшиеся)"
+
+
+def _days_window(start: Optional[date], end: Optional[date]):
+    start = start or date.today()
+    end = end or start + timedelta(days=DEFAULT_DAYS - 1)
+    if end < start:
+        raise HTTPException(status_code=400, detail="Параметр to не может быть раньше from")
+    if (end - start).days >= STATS_MAX_DAYS:
+        raise HTTPException(status_code=400, detail=f"Окно не может быть длиннее {STATS_MAX_DAYS} дней")
+    return start, end
+
+
+@router.get("/summary", response_model=StatsSummary)
+async def get_summary(
+    since: Optional[date] = Query(None, description=SINCE_DESCRIPTION),
+    session: AsyncSession = Depends(get_session)
+):
+    return await StatsService(session).summary(since)
+
+
+@router.get("/platforms", response_model=List[PlatformStats])
+async def get_platforms_stats(
+    limit: int = Query(50, ge=1, le=STATS_MAX_PLATFORMS),
+    since: Optional[date] = Query(None, description=SINCE_DESCRIPTION),
+    session: AsyncSession = Depends(get_session)
+):
+    """Площадки с наибольшим числом событий."""
+    return await StatsService(session).platforms(since, limit)
+
+
+@router.get("/platforms/{platform_id}", response_model=PlatformStats)
+async def get_platform_stats(
+    platform_id: int,
+    since: Optional[date] = Query(None, description=SINCE_DESCRIPTION),
+    session: AsyncSession = Depends(get_session)
+):
+    return await StatsService(session).platform(platform_id, since)
+
+
+@router.get("/platforms/{platform_id}/days", response_model=List[DayStats])
+async def get_platform_days_stats(
+    platform_id: int,
+    start: Optional[date] = Query(None, alias="from"),
+    end: Optional[date] = Query(None, alias="to"),
+    session: AsyncSession = Depends(get_session)
+):
+    """События площадки по дням [from, to]; дни без событий пропущены."""
+    start, end = _days_window(start, end)
+    return await StatsService(session).days(start, end, platform_id)
+
+
+@router.get("/cities", response_model=List[CityStats])
+async def get_cities_stats(session: AsyncSession = Depends(get_session)):
+    return await StatsService(session).cities()
+
+
+@router.get("/days", response_model=List[DayStats])
+async def get_days_stats(
+    start: Optional[date] = Query(None, alias="from"),
+    end: Optional[date] = Query(None, alias="to"),
+    session: AsyncSession = Depends(get_session)
+):
+    """События по дням [from, to]; дни без событий пропущены."""
+    start, end = _days_window(start, end)
+    return await StatsService(session).days(start, end)
@@ -1,8 +1,9 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.database.database import get_session
-from app.service.user_service.user_service import UserService
-from app.security.jwtmanager import JWTManager
+from app.service.user_service.user_service import UserService, USER_INCLUDES
+from app.security.jwtmanager import jwt_manager
+from app.security.current_user import get_current_user
 from app.security.hasher import verify_password
 from app.models.models import User
 from app.security.jwttype import JWTType
@@ -13,21 +14,35 @@ from fastapi import UploadFile, File
 import os
 import uuid
 from fastapi.responses import JSONResponse
+from fastapi.encoders import jsonable_encoder
+from app.storage.static import media_url
+from app.storage.variants import variant_urls_for_url
+from app.utils.conditional import make_etag, conditional_response, rows_version
+from app.utils.include import include_query
+from app.utils.serialization import SchemaMapper
+from app.schemas.request.events.events_schemas import EventResponse
+from typing import FrozenSet
 
 
 router = APIRouter()
 
+
+_events = SchemaMapper(EventResponse)
+
+
+def _user_payload(user: User) -> dict:
+    # Хэш пароля в ответ не входит (у пользователя из кэша его и нет)
+    payload = jsonable_encoder(user, exclude={"events", "PasswordHash"})
+    payload["PhotoVariants"] = variant_urls_for_url(user.PhotoURL, user.PhotoVariantsReady)
+    return payload
+
 @router.post("/register")
 async def register(
     request: UserRegistration,
     session: AsyncSession = Depends(get_session)
 ):
     user_service = UserService(session)
-
-    existing_user = await user_service.get_user_by_login(request.Login)
-    if existing_user:
-        raise HTTPException(status_code=400, detail="Login already registered")
-
+    # Занятость логина и email проверяет сам INSERT
     user = await user_service.register(request)
     return {"message": "User created successfully", "user_id": user.UserID}
 
@@ -42,29 +57,48 @@ async def login(
     if isinstance(user, str):
         raise HTTPException(status_code=400, detail=user)
 
-    jwt_manager = JWTManager()
     access_token = jwt_manager.create_token(user.UserID, JWTType.ACCESS)
     return {"access_token": access_token, "token_type": "bearer"}
 
 @router.get("/users/{user_id}")
 async def get_user(
     user_id: int,
+    request: Request,
+    response: Response,
+    include: FrozenSet[str] = Depends(include_query(*USER_INCLUDES)),
     session: AsyncSession = Depends(get_session)
 ):
     user_service = UserService(session)
 
-    user = await user_service.get_user_by_id(user_id)
+    user = await user_service.get_user_by_id(user_id, include)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
-    return user
+    if include:
+        # Удаление события не меняет UpdatedAt, поэтому только ETag
+        etag = make_etag("user", user.UserID, user.UpdatedAt.isoformat(), "events", *rows_version(user.events, "EventID"))
+        not_modified = conditional_response(request, response, etag)
+        if not_modified:
+            return not_modified
+        payload = _user_payload(user)
+        payload["events"] = _events.many(user.events)
+        return payload
+    etag = make_etag("user", user.UserID, user.UpdatedAt.isoformat())
+    not_modified = conditional_response(request, response, etag, user.UpdatedAt)
+    if not_modified:
+        return not_modified
+    return _user_payload(user)
 
 @router.put("/users/{user_id}")
 async def update_user(
     user_id: int,
     request: UserUpdate = Depends(),
     photo_file: UploadFile = File(None),
+    current_user: User = Depends(get_current_user),
     session: AsyncSession = Depends(get_session)
 ):
+    if current_user.UserID != user_id:
+        raise HTTPException(status_code=403, detail="Можно изменять только свой профиль")
+
     user_service = UserService(session)
     
     update_data = request.dict(exclude_unset=True)
@@ -73,8 +107,10 @@ async def update_user(
         try:
             file_name = await UserService.save_uploaded_file(photo_file)
             # Сохраняем полный URL в базу данных
-            full_photo_url = f"http://212.20.53.169:13299/uploads/{file_name}"
+            full_photo_url = media_url(file_name)
             update_data["PhotoURL"] = full_photo_url
+        except HTTPException:
+            raise
         except Exception as e:
             return JSONResponse(
                 status_code=500,
@@ -87,5 +123,5 @@ async def update_user(
     
     return {
         "message": "User updated successfully",
-        "user": user
+        "user": _user_payload(user)
     }
\ No newline at end of file
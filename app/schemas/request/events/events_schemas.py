@@ -1,6 +1,8 @@
 from pydantic import BaseModel
+from typing import Any, List, Optional
 from datetime import datetime
 from datetime import datetime, time, date
+from app.schemas.request.platform.platform_schemas import PlatformResponse
 
 class EventCreate(BaseModel):
     UserID: int
@@ -37,4 +39,34 @@ class EventResponse(BaseModel):
     TimeStart: time  # Используем тип time
     TimeEnd: time    # Используем тип time
     Description: str
-    Address: str
\ No newline at end of file
+    Address: str
+
+    class Config:
+        from_attributes = True
+
+
+class EventUser(BaseModel):
+    """Организатор события в ?include=user: только публичные поля профиля"""
+    UserID: int
+    Login: str
+    Name: Optional[str] = None
+    Surname: Optional[str] = None
+    City: Optional[str] = None
+    PhotoURL: Optional[str] = None
+
+    class Config:
+        from_attributes = True
+
+class EventWithRelations(EventResponse):
+    """Событие со встроенными связями; поле есть, только если связь запрошена"""
+    platform: Optional[PlatformResponse] = None
+    user: Optional[EventUser] = None
+
+
+class EventBulkError(BaseModel):
+    index: int  # Позиция события во входном списке
+    detail: Any
+
+class EventBulkResponse(BaseModel):
+    created: List[EventResponse]
+    errors: List[EventBulkError]
@@ -1,5 +1,6 @@
 from pydantic import BaseModel
-from typing import Optional
+from datetime import date, datetime, time
+from typing import Dict, List, Optional, Tuple
 
 class PlatformBase(BaseModel):
     Name: str
@@ -26,6 +27,35 @@ class PlatformUpdate(BaseModel):
 class PlatformResponse(PlatformBase):
     PlatformID: int
     ImageUrl: Optional[str] = None  # Полный URL к изображению
+    ImageVariants: Optional[Dict[str, str]] = None  # URL миниатюр и перекодированных версий
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+class PlatformEvent(BaseModel):
+    """Событие в расписании площадки (?include=events), без полей самой площадки"""
+    EventID: int
+    UserID: int
+    Name: str
+    DateStart: date
+    DateEnd: date
+    TimeStart: time
+    TimeEnd: time
+    Description: Optional[str] = None
+
+    class Config:
+        from_attributes = True
+
+class PlatformWithEvents(PlatformResponse):
+    events: List[PlatformEvent]
+
+class PlatformNearbyResponse(PlatformResponse):
+    DistanceKm: float  # Расстояние от точки поиска
+
+
+class PlatformAvailability(BaseModel):
+    PlatformID: int
+    IsFree: bool  # Окно свободно целиком
+    Free: List[Tuple[datetime, datetime]]  # Свободные промежутки [начало, конец)
+    Busy: List[Tuple[datetime, datetime]]  # Занятые промежутки, пересекающиеся события склеены
+    Slots: Optional[List[datetime]] = None  # Начала свободных слотов, если задан slot
@@ -0,0 +1,26 @@
+from pydantic import BaseModel
+from typing import List, Literal, Optional
+
+# Что ищем: площадки, события или все сразу
+SearchType = Literal["platform", "event"]
+
+
+class SearchHit(BaseModel):
+    Type: SearchType
+    ID: int  # PlatformID или EventID
+    Name: str
+    City: Optional[str] = None
+    Address: Optional[str] = None
+    Rank: float  # Релевантность, сравнима только внутри одного ответа
+
+
+class SearchResponse(BaseModel):
+    items: List[SearchHit]
+    fuzzy: bool = False  # Точных совпадений нет, найдено по похожим названиям
+
+
+class SearchSuggestion(BaseModel):
+    Type: SearchType
+    ID: int
+    Name: str
+    City: Optional[str] = None
@@ -0,0 +1,23 @@
+from pydantic import BaseModel
+from datetime import date
+from typing import Optional
+
+class StatsSummary(BaseModel):
+    Events: int  # Всего событий
+    Upcoming: int  # Событий с датой начала от Since; без since в запросе - еще не начавшихся
+    Platforms: int  # Площадок, на которых есть события
+    Cities: int
+    Since: date
+
+class PlatformStats(BaseModel):
+    PlatformID: int
+    Events: int
+    Upcoming: int
+
+class CityStats(BaseModel):
+    City: Optional[str] = None  # None - события без города
+    Events: int
+
+class DayStats(BaseModel):
+    Day: date
+    Events: int
@@ -0,0 +1,99 @@
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from fastapi import Depends, HTTPException, status
+from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database.database import get_session
+from app.models.models import User
+from app.security.jwtmanager import jwt_manager
+from app.service.user_service.user_service import UserService
+from app.settings.settings import settings
+
+oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/v1/token")
+
+
+class TokenCache:
+    """LRU уже проверенных токенов.
+
+    Ключ - SHA-256 токена (сам токен в памяти не храним), значение - claims
+    и момент истечения. Повторный запрос с тем же токеном не проверяет
+    подпись и не разбирает claims заново. Просроченная запись удаляется
+    при первом обращении после exp.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries: "OrderedDict[bytes, Tuple[dict, float]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(token: str) -> bytes:
+        return hashlib.sha256(token.encode("utf-8")).digest()
+
+    def get(self, token: str) -> Optional[dict]:
+        key = self._key(token)
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        claims, expires_at = entry
+        if expires_at <= time.time():
+            del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return claims
+
+    def put(self, token: str, claims: dict):
+        expires_at = claims.get("exp")
+        if not isinstance(expires_at, (int, float)):
+            return
+        self._entries[self._key(token)] = (claims, float(expires_at))
+        self._entries.move_to_end(self._key(token))
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, int]:
+        return {"size": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+token_cache = TokenCache(settings.JWT_CACHE_SIZE)
+
+
+def _unauthorized(detail: str) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail=detail,
+        headers={"WWW-Authenticate": "Bearer"}
+    )
+
+
+async def get_current_user_id(token: str = Depends(oauth2_scheme)) -> int:
+    """ID пользователя из bearer-токена."""
+    claims = token_cache.get(token)
+    if claims is None:
+        claims = jwt_manager.decode_token(token)
+        if isinstance(claims, str):
+            raise _unauthorized(claims)
+        token_cache.put(token, claims)
+    try:
+        return int(claims["UserID"])
+    except (KeyError, TypeError, ValueError):
+        raise _unauthorized("Invalid token: no UserID")
+
+
+async def get_current_user(
+    user_id: int = Depends(get_current_user_id),
+    session: AsyncSession = Depends(get_session)
+) -> User:
+    """Текущий пользователь по bearer-токену."""
+    user = await UserService(session).get_user_by_id(user_id)
+    if not user:
+        raise _unauthorized("User not found")
+    return user
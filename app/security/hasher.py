@@ -1,10 +1,45 @@
+import asyncio
+import math
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
 import bcrypt
 
+from app.settings.settings import settings
+from app.metrics.registry import registry
+
+# bcrypt отпускает GIL на время хэширования, поэтому хватает пула потоков:
+# event loop не блокируется, а число одновременных хэшей ограничено размером пула.
+_executor = ThreadPoolExecutor(
+    max_workers=settings.BCRYPT_THREADS or os.cpu_count() or 1,
+    thread_name_prefix="bcrypt"
+)
+
+# Текущая стоимость хэширования. Уточняется calibrate_rounds() при старте приложения.
+_rounds: int = settings.BCRYPT_ROUNDS or settings.BCRYPT_MIN_ROUNDS
+
+HASH_SECONDS = registry.histogram(
+    "bcrypt_duration_seconds", "Время хэширования и проверки пароля в потоке bcrypt",
+    ("operation",), (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+)
+HASH_QUEUE_SECONDS = registry.histogram(
+    "bcrypt_queue_wait_seconds", "Ожидание свободного потока bcrypt",
+    buckets=(0.0001, 0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+)
+
+
+def get_rounds() -> int:
+    return _rounds
+
 
 def hash_password(password: str) -> str:
     password_bytes = password.encode('utf-8')
 
-    hashed_password = bcrypt.hashpw(password_bytes, bcrypt.gensalt(5))
+    started = time.perf_counter()
+    hashed_password = bcrypt.hashpw(password_bytes, bcrypt.gensalt(_rounds))
+    HASH_SECONDS.observe(time.perf_counter() - started, ("hash",))
 
     hashed_password_str = hashed_password.decode('utf-8')
 
@@ -14,4 +49,69 @@ def verify_password(password: str, hashed_password: str) -> bool:
     password_bytes = password.encode('utf-8')
     hashed_password_bytes = hashed_password.encode('utf-8')
 
-    return bcrypt.checkpw(password_bytes, hashed_password_bytes)
\ No newline at end of file
+    started = time.perf_counter()
+    result = bcrypt.checkpw(password_bytes, hashed_password_bytes)
+    HASH_SECONDS.observe(time.perf_counter() - started, ("verify",))
+    return result
+
+
+def _queued(func, *args):
+    """Оборачивает вызов для пула потоков, чтобы замерить ожидание в очереди."""
+    submitted = time.perf_counter()
+
+    def run():
+        HASH_QUEUE_SECONDS.observe(time.perf_counter() - submitted)
+        return func(*args)
+    return run
+
+
+async def hash_password_async(password: str) -> str:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, _queued(hash_password, password))
+
+
+async def verify_password_async(password: str, hashed_password: str) -> bool:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, _queued(verify_password, password, hashed_password))
+
+
+def hash_rounds(hashed_password: str) -> Optional[int]:
+    """Стоимость, с которой был получен хэш вида $2b$12$..."""
+    parts = hashed_password.split("$")
+    if len(parts) < 4 or not parts[2].isdigit():
+        return None
+    return int(parts[2])
+
+
+def needs_rehash(hashed_password: str) -> bool:
+    """Нужно ли пересчитать хэш с текущей стоимостью.
+
+    Хэш с большей стоимостью не понижается: калибровка в разных воркерах
+    дает немного разные значения, и вход не должен переписывать хэш туда-обратно.
+    """
+    rounds = hash_rounds(hashed_password)
+    return rounds is None or rounds < _rounds
+
+
+def calibrate_rounds() -> int:
+    """Подбирает наибольшую стоимость, при которой хэш считается не дольше
+    BCRYPT_TARGET_MS. Если стоимость задана явно (BCRYPT_ROUNDS), берется она."""
+    global _rounds
+    if settings.BCRYPT_ROUNDS:
+        _rounds = settings.BCRYPT_ROUNDS
+        return _rounds
+
+    min_rounds, max_rounds = settings.BCRYPT_MIN_ROUNDS, settings.BCRYPT_MAX_ROUNDS
+    salt = bcrypt.gensalt(min_rounds)
+    # bcrypt напрямую, а не hash_password: пробные хэши не должны попадать в bcrypt_duration_seconds
+    samples = []
+    for _ in range(3):
+        started = time.perf_counter()
+        bcrypt.hashpw(b"calibration", salt)
+        samples.append(time.perf_counter() - started)
+    base_ms = max(sorted(samples)[1] * 1000, 1e-3)
+
+    # Каждый следующий раунд удваивает время хэширования
+    extra = int(math.floor(math.log2(settings.BCRYPT_TARGET_MS / base_ms))) if base_ms < settings.BCRYPT_TARGET_MS else 0
+    _rounds = max(min_rounds, min(max_rounds, min_rounds + extra))
+    return _rounds
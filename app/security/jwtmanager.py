@@ -23,4 +23,7 @@ class JWTManager:
         try:
             return decode(token, self.SECRET_KEY, algorithms=[self.ALGORITHM])
         except Exception as e:
-            return f"Invalid token: {str(e)}"
\ No newline at end of file
+            return f"Invalid token: {str(e)}"
+
+
+jwt_manager = JWTManager()
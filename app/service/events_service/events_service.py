@@ -1,34 +1,261 @@
-from typing import Dict, Union, Optional
-from sqlalchemy import select, insert, update, delete
+from typing import Any, AsyncIterator, Dict, FrozenSet, Union, Optional, Tuple
+from sqlalchemy.orm import joinedload
+from sqlalchemy import select, insert, update, delete, func, text, literal_column, literal, cast, false, Date
 from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import HTTPException, status
-from app.models.models import Event
+from app.models.models import Event, Platform
+from pydantic import TypeAdapter, ValidationError
 from app.schemas.request.events.events_schemas import EventCreate, EventUpdate, EventResponse
+from app.utils.streaming import STREAM_CHUNK_ROWS
 from typing import List
+from datetime import datetime, date, time
+
+# Верхняя граница числа событий в одном запросе POST /events/bulk
+BULK_MAX_EVENTS = 5000
+
+_event_create_adapter = TypeAdapter(EventCreate)
+
+# Связи, которые можно встроить в ответ (?include=). Обе - "к одному",
+# поэтому грузятся JOIN в том же запросе, без запроса на каждую строку
+EVENT_INCLUDES = ("platform", "user")
+_EVENT_LOADERS = {"platform": joinedload(Event.platform), "user": joinedload(Event.user)}
+
+# SQLSTATE exclusion_violation: сработал констрейнт ex_Events_PlatformID_Slot
+EXCLUSION_VIOLATION = "23P01"
+
+# Генерируемый столбец tsrange из миграции 5d2a7c41e8b3, в модели не описан
+_slot = literal_column('"Events"."Slot"')
+
+# Пересечения пачки новых интервалов с уже записанными событиями:
+# каждый интервал проверяется по GiST-индексу констрейнта
+_BATCH_OVERLAPS = text("""
+    SELECT v.idx, e."EventID"
+    FROM unnest(CAST(:idx AS int[]), CAST(:pid AS int[]),
+                CAST(:start AS timestamp[]), CAST(:end AS timestamp[])) AS v(idx, pid, s, e)
+    JOIN "Events" e ON e."PlatformID" = v.pid AND e."Slot" && tsrange(v.s, v.e, '[)')
+    ORDER BY v.idx, e."EventID"
+""")
+
+
+def _as_date(value) -> date:
+    return value.date() if isinstance(value, datetime) else value
+
+
+def event_slot(date_start, date_end, time_start: time, time_end: time) -> Optional[Tuple[datetime, datetime]]:
+    """Интервал [начало, конец) события или None, если даты заданы не полностью."""
+    if None in (date_start, date_end, time_start, time_end):
+        return None
+    start = datetime.combine(_as_date(date_start), time_start)
+    end = datetime.combine(_as_date(date_end), time_end)
+    if end <= start:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Окончание события должно быть позже начала"
+        )
+    return start, end
+
+
+# Поля, из которых складывается интервал события, в порядке аргументов event_slot
+SLOT_FIELDS = ("DateStart", "DateEnd", "TimeStart", "TimeEnd")
+
+
+def _slot_is_valid(values: Dict[str, Any]):
+    """Условие "конец позже начала" для UPDATE: новые значения берутся из values,
+    остальные из строки. Если границ не хватает (NULL), условие не мешает."""
+    columns = Event.__table__.c
+
+    def bound(date_field: str, time_field: str):
+        parts = [
+            literal(values[field], columns[field].type) if field in values else columns[field]
+            for field in (date_field, time_field)
+        ]
+        return cast(parts[0], Date).op("+")(parts[1])
+
+    return (bound("DateStart", "TimeStart") < bound("DateEnd", "TimeEnd")).is_not(false())
+
+
+def _is_overlap(error: Exception) -> bool:
+    return getattr(getattr(error, "orig", None), "sqlstate", None) == EXCLUSION_VIOLATION
+
+
+def _overlap_detail(event_ids: List[int]) -> str:
+    detail = "Площадка уже занята в это время"
+    if event_ids:
+        detail += f" (события: {', '.join(map(str, event_ids))})"
+    return detail
 
 class EventService:
     def __init__(self, session: AsyncSession):
         self.session = session
 
-    async def get_event_by_id(self, event_id: int) -> Union[Event, None]:
+    @staticmethod
+    def _check_owner(event: Event, owner_id: Optional[int]):
+        """Изменять событие может только его организатор."""
+        if owner_id is not None and event.UserID != owner_id:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Нет прав на изменение события"
+            )
+
+    async def find_overlaps(
+        self,
+        platform_id: int,
+        slot: Tuple[datetime, datetime],
+        exclude_id: Optional[int] = None
+    ) -> List[int]:
         """
-        Получить событие по ID.
+        ID событий площадки, пересекающихся с интервалом slot.
         """
-        query = select(Event).where(Event.EventID == event_id)
+        query = select(Event.EventID).where(
+            Event.PlatformID == platform_id,
+            _slot.op("&&")(func.tsrange(slot[0], slot[1], "[)"))
+        ).order_by(Event.EventID)
+        if exclude_id is not None:
+            query = query.where(Event.EventID != exclude_id)
+        result = await self.session.execute(query)
+        return list(result.scalars().all())
+
+    async def _overlap_error(
+        self,
+        platform_id: int,
+        slot: Tuple[datetime, datetime],
+        exclude_id: Optional[int] = None
+    ) -> HTTPException:
+        # Пересечение находит сам констрейнт при записи, здесь только
+        # выясняем, с какими событиями, чтобы сообщить клиенту
+        event_ids = await self.find_overlaps(platform_id, slot, exclude_id)
+        return HTTPException(status_code=status.HTTP_409_CONFLICT, detail=_overlap_detail(event_ids))
+
+    async def get_busy_intervals(
+        self,
+        platform_ids: List[int],
+        start: datetime,
+        end: datetime
+    ) -> Dict[int, List[Tuple[datetime, datetime]]]:
+        """
+        Занятые интервалы площадок, пересекающие окно [start, end), одним запросом.
+        Интервалы каждой площадки отсортированы по началу.
+        """
+        busy: Dict[int, List[Tuple[datetime, datetime]]] = {platform_id: [] for platform_id in platform_ids}
+        if not platform_ids:
+            return busy
+        # Условие по int4range совпадает с первым столбцом GiST-индекса
+        # констрейнта, так что читаются только события окна нужных площадок
+        platform_range = func.int4range(Event.PlatformID, Event.PlatformID, "[]")
+        query = (
+            select(Event.PlatformID, func.lower(_slot), func.upper(_slot))
+            .where(
+                platform_range.op("&&")(func.int4range(min(platform_ids), max(platform_ids), "[]")),
+                _slot.op("&&")(func.tsrange(start, end, "[)")),
+                Event.PlatformID.in_(platform_ids)
+            )
+            .order_by(Event.PlatformID, func.lower(_slot))
+        )
+        result = await self.session.execute(query)
+        for platform_id, lo, hi in result.all():
+            busy[platform_id].append((lo, hi))
+        return busy
+
+    @staticmethod
+    def _loaders(include: FrozenSet[str]) -> list:
+        return [_EVENT_LOADERS[name] for name in sorted(include)]
+
+    async def get_event_by_id(self, event_id: int, include: FrozenSet[str] = frozenset()) -> Union[Event, None]:
+        """
+        Получить событие по ID (со связями из include).
+        """
+        query = select(Event).options(*self._loaders(include)).where(Event.EventID == event_id)
         result = await self.session.execute(query)
         return result.scalars().first()
 
-    async def get_all_events(self) -> List[Event]:
+    def _events_query(
+        self,
+        after_id: Optional[int] = None,
+        city: Optional[str] = None,
+        platform_id: Optional[int] = None,
+        user_id: Optional[int] = None
+    ):
+        query = select(Event)
+        if after_id is not None:
+            query = query.where(Event.EventID > after_id)
+        if city is not None:
+            query = query.where(Event.City == city)
+        if platform_id is not None:
+            query = query.where(Event.PlatformID == platform_id)
+        if user_id is not None:
+            query = query.where(Event.UserID == user_id)
+        return query.order_by(Event.EventID)
+
+    async def get_all_events(
+        self,
+        limit: int,
+        after_id: Optional[int] = None,
+        city: Optional[str] = None,
+        platform_id: Optional[int] = None,
+        user_id: Optional[int] = None,
+        include: FrozenSet[str] = frozenset()
+    ) -> Tuple[List[Event], Optional[int]]:
         """
-        Получение всех событий
+        Получение страницы событий (keyset-пагинация по EventID).
+        Возвращает события и ID, после которого начинается следующая страница.
         """
-        result = await self.session.execute(select(Event))
-        return result.scalars().all()
+        query = self._events_query(after_id, city, platform_id, user_id).options(*self._loaders(include))
+        # Берем на одну запись больше, чтобы понять, есть ли следующая страница
+        query = query.limit(limit + 1)
+
+        result = await self.session.execute(query)
+        events = result.scalars().all()
+        if len(events) > limit:
+            events = events[:limit]
+            return events, events[-1].EventID
+        return events, None
+
+    async def get_page_version(
+        self,
+        limit: int,
+        after_id: Optional[int] = None,
+        city: Optional[str] = None,
+        platform_id: Optional[int] = None,
+        user_id: Optional[int] = None
+    ) -> Tuple[int, Optional[datetime], int]:
+        """
+        Версия страницы без загрузки строк: их число, max(UpdatedAt) и сумма ID.
+        Число и сумма ID меняются при удалении и сдвиге границ страницы.
+        """
+        page = (
+            self._events_query(after_id, city, platform_id, user_id)
+            .with_only_columns(Event.EventID, Event.UpdatedAt)
+            .limit(limit + 1)
+            .subquery()
+        )
+        result = await self.session.execute(
+            select(func.count(), func.max(page.c.UpdatedAt), func.coalesce(func.sum(page.c.EventID), 0))
+        )
+        return tuple(result.one())
+
+    async def stream_events(
+        self,
+        after_id: Optional[int] = None,
+        city: Optional[str] = None,
+        platform_id: Optional[int] = None,
+        user_id: Optional[int] = None
+    ) -> AsyncIterator[Event]:
+        """
+        Построчное чтение событий через серверный курсор.
+        """
+        query = self._events_query(after_id, city, platform_id, user_id)
+        result = await self.session.stream_scalars(
+            query.execution_options(yield_per=STREAM_CHUNK_ROWS)
+        )
+        async for event in result:
+            yield event
 
     async def create_event(self, request: EventCreate) -> Event:
         """
         Создание нового события.
+        Пересечение с другими событиями площадки отклоняется с кодом 409.
         """
+        slot = event_slot(request.DateStart, request.DateEnd, request.TimeStart, request.TimeEnd)
         try:
             query = (
                 insert(Event)
@@ -51,61 +278,209 @@ class EventService:
             return result.scalars().first()
         except Exception as e:
             await self.session.rollback()
+            if _is_overlap(e):
+                raise await self._overlap_error(request.PlatformID, slot)
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail=f"Ошибка при создании события: {str(e)}"
             )
 
-    async def update_event(self, event_id: int, data: EventUpdate) -> Optional[Event]:
+    async def create_events(
+        self,
+        items: List[Dict[str, Any]],
+        owner_id: Optional[int] = None
+    ) -> Tuple[List[Event], List[Dict[str, Any]]]:
+        """
+        Массовое создание событий.
+        Каждый элемент проверяется отдельно. Ошибки возвращаются списком
+        {index, detail}, а корректные события вставляются в одной транзакции
+        многострочным INSERT ... RETURNING.
+        """
+        errors = []
+        valid: List[Tuple[int, EventCreate]] = []
+        for index, item in enumerate(items):
+            try:
+                event = _event_create_adapter.validate_python(item)
+            except ValidationError as e:
+                errors.append({"index": index, "detail": e.errors(include_url=False, include_context=False)})
+                continue
+            if owner_id is not None and event.UserID != owner_id:
+                errors.append({"index": index, "detail": "Событие можно создать только от своего имени"})
+                continue
+            valid.append((index, event))
+
+        # Существование площадок проверяем одним запросом на весь пакет
+        platform_ids = {event.PlatformID for _, event in valid}
+        known = set()
+        if platform_ids:
+            result = await self.session.execute(
+                select(Platform.PlatformID).where(Platform.PlatformID.in_(platform_ids))
+            )
+            known = set(result.scalars().all())
+        slotted = []
+        for index, event in valid:
+            if event.PlatformID not in known:
+                errors.append({"index": index, "detail": "Площадка не найдена"})
+                continue
+            try:
+                slot = event_slot(event.DateStart, event.DateEnd, event.TimeStart, event.TimeEnd)
+            except HTTPException as e:
+                errors.append({"index": index, "detail": e.detail})
+                continue
+            slotted.append((index, event, slot))
+
+        overlapping = self._batch_overlaps(slotted)
+        overlapping.update(await self._stored_overlaps(slotted))
+        rows = []
+        for index, event, slot in slotted:
+            if index in overlapping:
+                errors.append({"index": index, "detail": overlapping[index]})
+            else:
+                rows.append(event.model_dump())
+        errors.sort(key=lambda error: error["index"])
+
+        if not rows:
+            return [], errors
+        try:
+            # SQLAlchemy собирает строки в многострочные INSERT пачками
+            # (insertmanyvalues), порядок RETURNING совпадает с порядком rows
+            result = await self.session.scalars(
+                insert(Event).returning(Event, sort_by_parameter_order=True),
+                rows
+            )
+            created = result.all()
+            await self.session.commit()
+            return created, errors
+        except Exception as e:
+            await self.session.rollback()
+            if _is_overlap(e):
+                # Пересекающееся событие записали параллельно, уже после проверки
+                raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=_overlap_detail([]))
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Ошибка при создании событий: {str(e)}"
+            )
+
+    @staticmethod
+    def _batch_overlaps(slotted) -> Dict[int, str]:
         """
-        Обновление информации о событии.
+        Пересечения внутри самого пакета: сортировка по началу и проход
+        с запоминанием события, которое заканчивается позже всех.
+        """
+        overlapping = {}
+        by_platform: Dict[int, list] = {}
+        for index, event, slot in slotted:
+            by_platform.setdefault(event.PlatformID, []).append((slot[0], slot[1], index))
+        for slots in by_platform.values():
+            slots.sort()
+            latest_end, latest_index = None, None
+            for start, end, index in slots:
+                if latest_end is not None and start < latest_end:
+                    overlapping[index] = f"Пересекается с событием #{latest_index} из этого запроса"
+                    continue
+                if latest_end is None or end > latest_end:
+                    latest_end, latest_index = end, index
+        return overlapping
+
+    async def _stored_overlaps(self, slotted) -> Dict[int, str]:
+        """
+        Пересечения пакета с уже сохраненными событиями, одним запросом.
+        """
+        if not slotted:
+            return {}
+        result = await self.session.execute(_BATCH_OVERLAPS, {
+            "idx": [index for index, _, _ in slotted],
+            "pid": [event.PlatformID for _, event, _ in slotted],
+            "start": [slot[0] for _, _, slot in slotted],
+            "end": [slot[1] for _, _, slot in slotted],
+        })
+        conflicts: Dict[int, List[int]] = {}
+        for index, event_id in result.all():
+            conflicts.setdefault(index, []).append(event_id)
+        return {index: _overlap_detail(event_ids) for index, event_ids in conflicts.items()}
+
+    async def _not_updated(self, event_id: int, owner_id: Optional[int]) -> HTTPException:
+        """
+        Причина, по которой UPDATE/DELETE не затронул строку. Запрос
+        выполняется только на этом, редком, пути.
         """
         existing_event = await self.get_event_by_id(event_id)
         if not existing_event:
-            raise HTTPException(
+            return HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Событие не найдено"
             )
+        self._check_owner(existing_event, owner_id)
+        return HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Окончание события должно быть позже начала"
+        )
 
+    async def update_event(self, event_id: int, data: EventUpdate, owner_id: Optional[int] = None) -> Optional[Event]:
+        """
+        Обновление информации о событии одним UPDATE ... RETURNING.
+        Владелец и порядок начала и конца проверяются в WHERE, причину
+        пустого результата (404/403/400) выясняет _not_updated.
+        """
         data_dict = data.dict(exclude_unset=True)
         if not data_dict:
-            return None
+            existing_event = await self.get_event_by_id(event_id)
+            if not existing_event:
+                raise await self._not_updated(event_id, owner_id)
+            self._check_owner(existing_event, owner_id)
+            return existing_event
 
-        query = (
-            update(Event)
-            .where(Event.EventID == event_id)
-            .values(**data_dict)
-            .returning(Event)
-        )
+        query = update(Event).where(Event.EventID == event_id)
+        if owner_id is not None:
+            query = query.where(Event.UserID == owner_id)
+        if any(field in data_dict for field in SLOT_FIELDS):
+            if all(data_dict.get(field) is not None for field in SLOT_FIELDS):
+                event_slot(*(data_dict[field] for field in SLOT_FIELDS))
+            else:
+                # Часть границ берется из текущей строки, сравниваем в самом запросе
+                query = query.where(_slot_is_valid(data_dict))
+        query = query.values(**data_dict).returning(Event)
 
         try:
-            result = await self.session.execute(query)
+            event = (await self.session.execute(query)).scalars().first()
+            if event is None:
+                await self.session.rollback()
+                raise await self._not_updated(event_id, owner_id)
             await self.session.commit()
-            return result.scalars().first()
+            return event
+        except HTTPException:
+            raise
         except Exception as e:
             await self.session.rollback()
+            if _is_overlap(e):
+                existing_event = await self.get_event_by_id(event_id)
+                merged = {field: data_dict.get(field, getattr(existing_event, field)) for field in SLOT_FIELDS}
+                slot = event_slot(*merged.values())
+                platform_id = data_dict.get("PlatformID", existing_event.PlatformID)
+                raise await self._overlap_error(platform_id, slot, exclude_id=event_id)
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail=f"Ошибка при обновлении события: {str(e)}"
             )
 
-    async def delete_event(self, event_id: int) -> Dict[str, str]:
+    async def delete_event(self, event_id: int, owner_id: Optional[int] = None) -> Dict[str, str]:
         """
-        Удаление события.
+        Удаление события одним DELETE ... RETURNING.
         """
-        existing_event = await self.get_event_by_id(event_id)
-        if not existing_event:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Событие не найдено"
-            )
-
         query = delete(Event).where(Event.EventID == event_id)
+        if owner_id is not None:
+            query = query.where(Event.UserID == owner_id)
+        query = query.returning(Event.EventID)
 
         try:
-            await self.session.execute(query)
+            deleted = (await self.session.execute(query)).scalar()
+            if deleted is None:
+                await self.session.rollback()
+                raise await self._not_updated(event_id, owner_id)
             await self.session.commit()
             return {"message": "Событие успешно удалено"}
+        except HTTPException:
+            raise
         except Exception as e:
             await self.session.rollback()
             raise HTTPException(
@@ -0,0 +1,137 @@
+from typing import Iterable, Optional, Set
+from sqlalchemy import select, update, delete, func, union_all
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.models import StoredImage, Platform, User
+from app.storage.uploads import image_name_from_url
+from app.storage.static import media_url
+
+
+class ImageService:
+    """Учет ссылок на файлы изображений.
+
+    Запросы выполняются в транзакции вызывающего сервиса и фиксируются
+    вместе с изменением площадки или пользователя.
+    """
+
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def acquire(self, file_name: Optional[str]):
+        """Увеличивает счетчик ссылок на файл."""
+        if not file_name:
+            return
+        query = (
+            insert(StoredImage)
+            .values(FileName=file_name, RefCount=1)
+            .on_conflict_do_update(
+                index_elements=[StoredImage.FileName],
+                set_={"RefCount": StoredImage.RefCount + 1}
+            )
+        )
+        await self.session.execute(query)
+
+    async def release(self, file_name: Optional[str]):
+        """Уменьшает счетчик ссылок. Сам файл удаляет сборщик мусора."""
+        if not file_name:
+            return
+        await self.session.execute(self.release_statement(file_name))
+
+    @staticmethod
+    def release_statement(file_name):
+        """UPDATE, снимающий ссылку, для использования внутри CTE.
+        file_name - значение или столбец другого CTE."""
+        return (
+            update(StoredImage)
+            .where(StoredImage.FileName == file_name, StoredImage.RefCount > 0)
+            .values(RefCount=StoredImage.RefCount - 1)
+        )
+
+    async def replace(self, old_name: Optional[str], new_name: Optional[str]):
+        """Переносит ссылку со старого файла на новый одним запросом."""
+        if old_name == new_name:
+            return
+        if not old_name:
+            return await self.acquire(new_name)
+        if not new_name:
+            return await self.release(old_name)
+        released = self.release_statement(old_name).cte("released")
+        query = (
+            insert(StoredImage)
+            .values(FileName=new_name, RefCount=1)
+            .on_conflict_do_update(
+                index_elements=[StoredImage.FileName],
+                set_={"RefCount": StoredImage.RefCount + 1}
+            )
+            .add_cte(released)
+        )
+        await self.session.execute(query)
+
+    async def acquire_url(self, url: Optional[str]):
+        await self.acquire(image_name_from_url(url))
+
+    async def release_url(self, url: Optional[str]):
+        await self.release(image_name_from_url(url))
+
+    async def replace_url(self, old_url: Optional[str], new_url: Optional[str]):
+        await self.replace(image_name_from_url(old_url), image_name_from_url(new_url))
+
+    async def mark_variants_ready(self, file_names: Iterable[str]) -> list:
+        """Ставит отметку готовности вариантов строкам с этими файлами.
+        Возвращает (UserID, Login) отмеченных пользователей для сброса кэша."""
+        file_names = list(file_names)
+        if not file_names:
+            return []
+        await self.session.execute(
+            update(Platform)
+            .where(Platform.Image.in_(file_names), Platform.ImageVariantsReady.is_(False))
+            .values(ImageVariantsReady=True)
+            .execution_options(synchronize_session=False)
+        )
+        result = await self.session.execute(
+            update(User)
+            .where(User.PhotoURL.in_([media_url(name) for name in file_names]), User.PhotoVariantsReady.is_(False))
+            .values(PhotoVariantsReady=True)
+            .returning(User.UserID, User.Login)
+            .execution_options(synchronize_session=False)
+        )
+        return result.all()
+
+    async def get_referenced(self, file_names: Iterable[str]) -> Set[str]:
+        """Какие из переданных файлов еще используются."""
+        file_names = list(file_names)
+        if not file_names:
+            return set()
+        query = select(StoredImage.FileName).where(
+            StoredImage.FileName.in_(file_names),
+            StoredImage.RefCount > 0
+        )
+        result = await self.session.execute(query)
+        return set(result.scalars().all())
+
+    async def forget(self, file_names: Iterable[str]):
+        """Удаляет записи о файлах, на которые больше нет ссылок."""
+        file_names = list(file_names)
+        if not file_names:
+            return
+        await self.session.execute(
+            delete(StoredImage).where(
+                StoredImage.FileName.in_(file_names),
+                StoredImage.RefCount <= 0
+            )
+        )
+
+    async def rebuild(self) -> int:
+        """Пересчитывает все счетчики по Platform.Image и User.PhotoURL."""
+        photo_name = func.regexp_replace(User.PhotoURL, "^.*/", "")
+        refs = union_all(
+            select(Platform.Image.label("FileName")).where(Platform.Image.is_not(None)),
+            select(photo_name.label("FileName")).where(User.PhotoURL.like("%/uploads/%"))
+        ).subquery()
+        counts = select(refs.c.FileName, func.count().label("RefCount")).group_by(refs.c.FileName)
+
+        await self.session.execute(delete(StoredImage))
+        result = await self.session.execute(
+            insert(StoredImage).from_select(["FileName", "RefCount"], counts)
+        )
+        return result.rowcount
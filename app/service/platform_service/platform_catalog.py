@@ -0,0 +1,338 @@
+"""Каталог площадок в памяти воркера.
+
+Таблица площадок небольшая и почти не меняется, поэтому каждый воркер держит
+ее копию: записи PlatformRecord со __slots__, индекс по ID и отсортированные
+списки ID (общий и по городам) для keyset-пагинации. Чтение из каталога не
+берет соединение из пула.
+
+Свежесть:
+- запись в этом воркере сразу применяется к каталогу (PlatformService);
+- триггер на "Platforms" шлет NOTIFY с ID измененной площадки (миграция
+  b4d8f2a6c913), каталог слушает канал через отдельное соединение asyncpg
+  вне пула и перечитывает только эти площадки;
+- раз в PLATFORM_CATALOG_REFRESH_SECONDS - инкрементальная сверка по
+  UpdatedAt и по списку ID (удаления, пропущенные уведомления, не Postgres).
+
+Снимок каталога сохраняется в PLATFORM_CATALOG_SNAPSHOT, и перезапущенный
+воркер отвечает из него еще до первого запроса к БД. Снимок старше
+PLATFORM_CATALOG_REFRESH_SECONDS (по времени последней сверки с БД) не
+загружается, поэтому данные не старше, чем в работающем воркере. При
+остановке каталог сверяется и сохраняется, так что быстрый перезапуск
+подхватывает снимок.
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+from bisect import bisect_right, insort
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import select, func
+from app.database.database import get_engine, get_session_factory
+from app.models.models import Platform
+from app.settings.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# Канал NOTIFY, в который пишет триггер "Platforms"
+CHANNEL = "platforms_changed"
+# Транзакция получает now() при старте, а видна после commit: строки с UpdatedAt
+# чуть старше последней прочитанной перечитываются повторно
+REFRESH_OVERLAP = timedelta(minutes=5)
+SNAPSHOT_VERSION = 3
+
+FIELDS = (
+    "PlatformID", "Name", "City", "Address", "Image", "ImageVariantsReady",
+    "Latitude", "Longitude", "GeoHash", "UpdatedAt",
+)
+_COLUMNS = [getattr(Platform, field) for field in FIELDS]
+
+
+class PlatformRecord:
+    """Площадка в каталоге. Атрибуты те же, что у модели Platform."""
+    __slots__ = FIELDS
+
+    def __init__(self, *values):
+        for field, value in zip(FIELDS, values):
+            setattr(self, field, value)
+
+    @classmethod
+    def from_platform(cls, platform) -> "PlatformRecord":
+        return cls(*(getattr(platform, field) for field in FIELDS))
+
+    def to_row(self) -> list:
+        row = [getattr(self, field) for field in FIELDS]
+        row[-1] = row[-1].isoformat()
+        return row
+
+    @classmethod
+    def from_row(cls, row: list) -> "PlatformRecord":
+        return cls(*row[:-1], datetime.fromisoformat(row[-1]))
+
+
+class PlatformCatalog:
+    def __init__(self):
+        self._records: Dict[int, PlatformRecord] = {}
+        self._ids: List[int] = []
+        self._by_city: Dict[Optional[str], List[int]] = {}
+        self._last_update: Optional[datetime] = None
+        self._pending: set = set()
+        self._changed = asyncio.Event()
+        self._listener = None
+        self._dirty = False
+        self._saved_at = 0.0
+        self.ready = False
+        self.refreshed_at: Optional[float] = None
+        # time.time() последней сверки с БД (refresh); хранится в снимке
+        self.verified_at: Optional[float] = None
+        self.refreshes = 0
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    # Чтение
+
+    def get(self, platform_id: int) -> Optional[PlatformRecord]:
+        return self._records.get(platform_id)
+
+    def _ordered_ids(self, city: Optional[str]) -> List[int]:
+        return self._ids if city is None else self._by_city.get(city, [])
+
+    def page(self, limit: int, after_id: Optional[int] = None, city: Optional[str] = None) -> List[PlatformRecord]:
+        """До limit записей после after_id в порядке PlatformID."""
+        ids = self._ordered_ids(city)
+        start = bisect_right(ids, after_id) if after_id is not None else 0
+        return [self._records[platform_id] for platform_id in ids[start:start + limit]]
+
+    def ids(
+        self,
+        ids: Optional[Iterable[int]] = None,
+        city: Optional[str] = None,
+        limit: Optional[int] = None,
+        after_id: Optional[int] = None
+    ) -> List[int]:
+        result = self._ordered_ids(city)
+        if after_id is not None:
+            result = result[bisect_right(result, after_id):]
+        if ids is not None:
+            wanted = set(ids)
+            result = [platform_id for platform_id in result if platform_id in wanted]
+        return list(result[:limit] if limit is not None else result)
+
+    # Изменения
+
+    def put(self, record: PlatformRecord, keep_newer: bool = False):
+        """Добавляет или заменяет запись.
+
+        keep_newer - запись этого воркера: она не затирает версию с большим
+        UpdatedAt, уже прочитанную из БД. Строки, перечитанные из БД, всегда
+        заменяют запись: UpdatedAt - время начала транзакции, и строка,
+        закоммиченная последней, может оказаться "старше" предыдущей.
+        """
+        old = self._records.get(record.PlatformID)
+        if keep_newer and old is not None and old.UpdatedAt > record.UpdatedAt:
+            return
+        if old is None:
+            insort(self._ids, record.PlatformID)
+        elif old.City != record.City:
+            self._by_city[old.City].remove(record.PlatformID)
+        if old is None or old.City != record.City:
+            insort(self._by_city.setdefault(record.City, []), record.PlatformID)
+        self._records[record.PlatformID] = record
+        if self._last_update is None or record.UpdatedAt > self._last_update:
+            self._last_update = record.UpdatedAt
+        self._dirty = True
+
+    def discard(self, platform_id: int):
+        old = self._records.pop(platform_id, None)
+        if old is None:
+            return
+        self._ids.remove(platform_id)
+        self._by_city[old.City].remove(platform_id)
+        self._dirty = True
+
+    def _replace_all(self, records: List[PlatformRecord]):
+        self._records = {record.PlatformID: record for record in records}
+        self._ids = sorted(self._records)
+        self._by_city = {}
+        for platform_id in self._ids:
+            self._by_city.setdefault(self._records[platform_id].City, []).append(platform_id)
+        self._last_update = max((record.UpdatedAt for record in records), default=None)
+        self._dirty = True
+
+    # Синхронизация с БД
+
+    async def refresh(self):
+        """Полная загрузка при первом вызове, затем только изменения."""
+        async with get_session_factory()() as session:
+            if not self.ready:
+                result = await session.execute(select(*_COLUMNS))
+                self._replace_all([PlatformRecord(*row) for row in result])
+            else:
+                query = select(*_COLUMNS)
+                if self._last_update is not None:
+                    query = query.where(Platform.UpdatedAt > self._last_update - REFRESH_OVERLAP)
+                for row in await session.execute(query):
+                    self.put(PlatformRecord(*row))
+                # Удаления и строки, закоммиченные позже окна перекрытия, видны по списку ID
+                count = (await session.execute(select(func.count()).select_from(Platform))).scalar_one()
+                if count != len(self._records):
+                    db_ids = set((await session.execute(select(Platform.PlatformID))).scalars())
+                    for platform_id in set(self._records) - db_ids:
+                        self.discard(platform_id)
+                    await self._load_ids(session, db_ids - set(self._records))
+        self.ready = True
+        self.refreshed_at = time.monotonic()
+        self.verified_at = time.time()
+        self.refreshes += 1
+
+    async def _load_ids(self, session, ids):
+        if not ids:
+            return
+        result = await session.execute(select(*_COLUMNS).where(Platform.PlatformID.in_(ids)))
+        found = set()
+        for row in result:
+            self.put(PlatformRecord(*row))
+            found.add(row[0])
+        for platform_id in set(ids) - found:
+            self.discard(platform_id)
+
+    async def refresh_ids(self, ids: Iterable[int]):
+        """Перечитывает площадки по ID из уведомлений; пропавшие удаляются."""
+        async with get_session_factory()() as session:
+            await self._load_ids(session, list(ids))
+        self.refreshed_at = time.monotonic()
+
+    def _on_notify(self, connection, pid, channel, payload):
+        try:
+            self._pending.add(int(payload))
+        except ValueError:
+            return
+        self._changed.set()
+
+    async def _listen(self) -> bool:
+        """LISTEN через отдельное соединение asyncpg. Для других БД - только сверка по таймеру."""
+        engine = get_engine()
+        if engine.dialect.name != "postgresql":
+            return False
+        import asyncpg
+        try:
+            dsn = engine.url.set(drivername="postgresql").render_as_string(hide_password=False)
+            self._listener = await asyncpg.connect(dsn)
+            await self._listener.add_listener(CHANNEL, self._on_notify)
+        except Exception:
+            logger.exception("LISTEN %s недоступен, каталог площадок обновляется по таймеру", CHANNEL)
+            await self._close_listener()
+            return False
+        return True
+
+    async def _close_listener(self):
+        if self._listener is not None:
+            try:
+                await self._listener.close()
+            except Exception:
+                pass
+            self._listener = None
+
+    async def run(self):
+        """Фоновая задача воркера (запускается в lifespan)."""
+        resync = True
+        while True:
+            if self._listener is None or self._listener.is_closed():
+                await self._close_listener()
+                # Уведомления без соединения теряются, после переподключения нужна сверка
+                resync = await self._listen() or resync
+            try:
+                if self._pending and not resync:
+                    pending, self._pending = self._pending, set()
+                    await self.refresh_ids(pending)
+                else:
+                    await self.refresh()
+                    resync = False
+                await self._save_if_due()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Не удалось обновить каталог площадок")
+            self._changed.clear()
+            if self._pending:
+                continue
+            try:
+                await asyncio.wait_for(self._changed.wait(), settings.PLATFORM_CATALOG_REFRESH_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+
+    async def close(self):
+        await self._close_listener()
+        if self.ready:
+            try:
+                # Снимок подтвержден на момент остановки
+                await self.refresh()
+            except Exception:
+                logger.exception("Не удалось сверить каталог площадок перед сохранением")
+        await self._save_if_due(force=True)
+
+    # Снимок на диске
+
+    def load_snapshot(self) -> bool:
+        path = settings.PLATFORM_CATALOG_SNAPSHOT
+        if not path:
+            return False
+        try:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") != SNAPSHOT_VERSION:
+                return False
+            # Время сверки - по часам сервера, а не time.monotonic(): снимок переживает процесс
+            age = time.time() - data["verified_at"]
+            if not 0 <= age <= settings.PLATFORM_CATALOG_REFRESH_SECONDS:
+                logger.info("Снимок каталога площадок устарел (%.0f с), загрузка из БД", age)
+                return False
+            self._replace_all([PlatformRecord.from_row(row) for row in data["rows"]])
+        except FileNotFoundError:
+            return False
+        except Exception:
+            logger.exception("Снимок каталога площадок поврежден, загрузка из БД")
+            return False
+        self._dirty = False
+        self.verified_at = data["verified_at"]
+        self.ready = True
+        return True
+
+    def _write_snapshot(self, rows: List[list], verified_at: float):
+        path = settings.PLATFORM_CATALOG_SNAPSHOT
+        # У каждого воркера свой временный файл, замена атомарная
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        snapshot = {"version": SNAPSHOT_VERSION, "verified_at": verified_at, "rows": rows}
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(snapshot, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp_path, path)
+
+    async def _save_if_due(self, force: bool = False):
+        # force (остановка) пишет и без изменений: в снимке обновится verified_at
+        if not settings.PLATFORM_CATALOG_SNAPSHOT or not self.ready or not (self._dirty or force):
+            return
+        if not force and time.monotonic() - self._saved_at < settings.PLATFORM_CATALOG_SNAPSHOT_SECONDS:
+            return
+        rows = [self._records[platform_id].to_row() for platform_id in self._ids]
+        self._dirty = False
+        self._saved_at = time.monotonic()
+        try:
+            await asyncio.to_thread(self._write_snapshot, rows, self.verified_at)
+        except Exception:
+            self._dirty = True
+            logger.exception("Не удалось сохранить снимок каталога площадок")
+
+    def stats(self) -> Dict[str, float]:
+        age = time.monotonic() - self.refreshed_at if self.refreshed_at is not None else -1
+        return {"size": len(self._records), "refreshes": self.refreshes, "age_seconds": age}
+
+    def page_version(self, records: List[PlatformRecord]) -> Tuple[int, Optional[datetime], int]:
+        """То же, что PlatformService.get_page_version, по уже выбранной странице."""
+        last_update = max((record.UpdatedAt for record in records), default=None)
+        return len(records), last_update, sum(record.PlatformID for record in records)
+
+
+platform_catalog = PlatformCatalog()
@@ -1,57 +1,68 @@
 import os
-import uuid
 from fastapi import UploadFile, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, insert, update, delete, or_, func
+from sqlalchemy.orm import selectinload
 from app.models.models import Platform
-from typing import Optional
+from datetime import datetime
+from typing import AsyncIterator, FrozenSet, Optional, Tuple
 from app.schemas.request.platform.platform_schemas import PlatformCreateRequest
+from app.utils.geo import encode_geohash, covering_ranges, haversine_km
+from app.utils.streaming import STREAM_CHUNK_ROWS
+from app.storage.uploads import save_upload
+from app.storage.variants import schedule_variants, variant_urls
+from app.storage.static import media_url
+from app.service.image_service.image_service import ImageService
+from app.service.platform_service.platform_catalog import platform_catalog, PlatformRecord
+from app.settings.settings import settings
+
+# Связи, которые можно встроить в ответ (?include=). События площадки
+# грузятся вторым запросом по IN для всей страницы (selectinload); каталог
+# в памяти событий не хранит, поэтому такие чтения идут в БД
+PLATFORM_INCLUDES = ("events",)
+
+
+def platform_fields(p) -> dict:
+    """Поля PlatformResponse: строка БД или запись каталога плюс URL изображений."""
+    return {
+        "PlatformID": p.PlatformID,
+        "Name": p.Name,
+        "City": p.City,
+        "Address": p.Address,
+        "Latitude": p.Latitude,
+        "Longitude": p.Longitude,
+        "ImageUrl": media_url(p.Image),
+        "ImageVariants": variant_urls(p.Image, p.ImageVariantsReady)
+    }
+
 
 class PlatformService:
     def __init__(self, session: AsyncSession):
         self.session = session
-        self.upload_dir = "uploads"
+        self.upload_dir = settings.UPLOAD_DIR
         os.makedirs(self.upload_dir, exist_ok=True)
+        # Файлы изображений общие для одинакового содержимого,
+        # поэтому вместо удаления файла снимаем ссылку на него
+        self.images = ImageService(session)
 
     async def _save_image(self, file: UploadFile) -> str:
         """Сохраняет изображение на сервере и возвращает имя файла"""
-        if not file.content_type.startswith("image/"):
+        if not file.content_type or not file.content_type.startswith("image/"):
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Поддерживаются только изображения"
             )
 
         try:
-            # Генерируем уникальное имя файла
-            file_ext = os.path.splitext(file.filename)[-1]
-            filename = f"{uuid.uuid4()}{file_ext}"
-            file_path = os.path.join(self.upload_dir, filename)
-
-            # Сохраняем файл
-            with open(file_path, "wb") as buffer:
-                content = await file.read()
-                buffer.write(content)
-
-            return filename
+            return await save_upload(file, upload_dir=self.upload_dir)
+        except HTTPException:
+            raise
         except Exception as e:
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail=f"Ошибка при сохранении изображения: {str(e)}"
             )
 
-    async def _delete_image(self, filename: str):
-        """Удаляет файл изображения"""
-        if filename:
-            try:
-                file_path = os.path.join(self.upload_dir, filename)
-                if os.path.exists(file_path):
-                    os.remove(file_path)
-            except Exception as e:
-                raise HTTPException(
-                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                    detail=f"Ошибка при удалении изображения: {str(e)}"
-                )
-
     async def create_platform(
         self,
         platform_data: PlatformCreateRequest,
@@ -61,18 +72,26 @@ class PlatformService:
         try:
             image_filename = await self._save_image(image)
 
-            platform = Platform(
-                Name=platform_data.Name,
-                City=platform_data.City,
-                Address=platform_data.Address,
-                Latitude=platform_data.Latitude,
-                Longitude=platform_data.Longitude,
-                Image=image_filename
+            query = (
+                insert(Platform)
+                .values(
+                    Name=platform_data.Name,
+                    City=platform_data.City,
+                    Address=platform_data.Address,
+                    Latitude=platform_data.Latitude,
+                    Longitude=platform_data.Longitude,
+                    GeoHash=encode_geohash(platform_data.Latitude, platform_data.Longitude),
+                    Image=image_filename
+                )
+                .returning(Platform)
             )
-
-            self.session.add(platform)
+            platform = (await self.session.execute(query)).scalar_one()
+            # Запись каталога - из данных RETURNING, до следующих запросов сессии
+            record = PlatformRecord.from_platform(platform)
+            await self.images.acquire(image_filename)
             await self.session.commit()
-            await self.session.refresh(platform)
+            self._catalog_put(record)
+            schedule_variants(image_filename)
             return platform
         except HTTPException:
             raise
@@ -83,10 +102,45 @@ class PlatformService:
                 detail=f"Ошибка при создании площадки: {str(e)}"
             )
 
-    async def get_platform(self, platform_id: int) -> Platform:
-        """Получает площадку по ID"""
+    async def _update_returning_old(self, platform_id: int, values: dict):
+        """UPDATE ... RETURNING площадки вместе с прежним Image.
+
+        В Postgres прежнее значение читает CTE того же запроса. SQLite в
+        RETURNING видит только изменяемую таблицу, уже с новыми значениями,
+        поэтому там прежнее значение читается SELECT перед UPDATE.
+        """
+        old = (
+            select(Platform.PlatformID, Platform.Image)
+            .where(Platform.PlatformID == platform_id)
+            .with_for_update()
+        )
+        query = update(Platform).values(**values)
+        if self.session.bind.dialect.name == "postgresql":
+            old = old.cte("old")
+            query = query.where(Platform.PlatformID == old.c.PlatformID).returning(Platform, old.c.Image)
+            return (await self.session.execute(query)).first()
+        prior = (await self.session.execute(old)).first()
+        if prior is None:
+            return None
+        query = query.where(Platform.PlatformID == platform_id).returning(Platform)
+        return (await self.session.execute(query)).scalar_one(), prior.Image
+
+    @staticmethod
+    def _catalog_put(record: PlatformRecord):
+        """Запись этого воркера видна в каталоге сразу, не дожидаясь NOTIFY."""
+        if platform_catalog.ready:
+            platform_catalog.put(record, keep_newer=True)
+
+    async def get_platform(self, platform_id: int, include: FrozenSet[str] = frozenset()) -> Platform:
+        """Получает площадку по ID (из каталога в памяти, если он загружен и связи не нужны)"""
         try:
-            platform = await self.session.get(Platform, platform_id)
+            if include:
+                query = select(Platform).options(selectinload(Platform.events)).where(Platform.PlatformID == platform_id)
+                platform = (await self.session.execute(query)).scalars().first()
+            elif platform_catalog.ready:
+                platform = platform_catalog.get(platform_id)
+            else:
+                platform = await self.session.get(Platform, platform_id)
             if not platform:
                 raise HTTPException(
                     status_code=status.HTTP_404_NOT_FOUND,
@@ -101,46 +155,186 @@ class PlatformService:
                 detail=f"Ошибка при получении площадки: {str(e)}"
             )
 
-    async def get_all_platforms(self) -> list[Platform]:
-        """Получает все площадки"""
+    def _platforms_query(self, after_id: Optional[int] = None, city: Optional[str] = None):
+        query = select(Platform)
+        if after_id is not None:
+            query = query.where(Platform.PlatformID > after_id)
+        if city is not None:
+            query = query.where(Platform.City == city)
+        return query.order_by(Platform.PlatformID)
+
+    async def get_all_platforms(
+        self,
+        limit: int,
+        after_id: Optional[int] = None,
+        city: Optional[str] = None,
+        include: FrozenSet[str] = frozenset()
+    ) -> Tuple[list[Platform], Optional[int]]:
+        """Получает страницу площадок (keyset-пагинация по PlatformID)"""
         try:
-            result = await self.session.execute(select(Platform))
-            return result.scalars().all()
+            if platform_catalog.ready and not include:
+                platforms = platform_catalog.page(limit + 1, after_id, city)
+            else:
+                query = self._platforms_query(after_id, city).limit(limit + 1)
+                if include:
+                    query = query.options(selectinload(Platform.events))
+                result = await self.session.execute(query)
+                platforms = result.scalars().all()
+            if len(platforms) > limit:
+                platforms = platforms[:limit]
+                return platforms, platforms[-1].PlatformID
+            return platforms, None
         except Exception as e:
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail=f"Ошибка при получении списка площадок: {str(e)}"
             )
 
+    async def get_platform_ids(
+        self,
+        ids: Optional[list[int]] = None,
+        city: Optional[str] = None,
+        limit: Optional[int] = None,
+        after_id: Optional[int] = None
+    ) -> list[int]:
+        """ID существующих площадок из списка ids и/или города по возрастанию, после after_id"""
+        if platform_catalog.ready:
+            return platform_catalog.ids(ids, city, limit, after_id)
+        query = select(Platform.PlatformID).order_by(Platform.PlatformID)
+        if after_id is not None:
+            query = query.where(Platform.PlatformID > after_id)
+        if ids is not None:
+            query = query.where(Platform.PlatformID.in_(ids))
+        if city is not None:
+            query = query.where(Platform.City == city)
+        if limit is not None:
+            query = query.limit(limit)
+        result = await self.session.execute(query)
+        return list(result.scalars().all())
+
+    async def get_page_version(
+        self,
+        limit: int,
+        after_id: Optional[int] = None,
+        city: Optional[str] = None
+    ) -> Tuple[int, Optional[datetime], int]:
+        """Версия страницы без загрузки строк: их число, max(UpdatedAt) и сумма ID.
+        Число и сумма ID меняются при удалении и сдвиге границ страницы."""
+        if platform_catalog.ready:
+            return platform_catalog.page_version(platform_catalog.page(limit + 1, after_id, city))
+        page = (
+            self._platforms_query(after_id, city)
+            .with_only_columns(Platform.PlatformID, Platform.UpdatedAt)
+            .limit(limit + 1)
+            .subquery()
+        )
+        result = await self.session.execute(
+            select(func.count(), func.max(page.c.UpdatedAt), func.coalesce(func.sum(page.c.PlatformID), 0))
+        )
+        return tuple(result.one())
+
+    async def stream_platforms(
+        self,
+        after_id: Optional[int] = None,
+        city: Optional[str] = None
+    ) -> AsyncIterator[Platform]:
+        """Построчно читает площадки через серверный курсор"""
+        query = self._platforms_query(after_id, city)
+        result = await self.session.stream_scalars(
+            query.execution_options(yield_per=STREAM_CHUNK_ROWS)
+        )
+        async for platform in result:
+            yield platform
+
+    async def get_nearby_platforms(
+        self,
+        latitude: float,
+        longitude: float,
+        radius_km: float,
+        k: int
+    ) -> list[Tuple[Platform, float]]:
+        """Возвращает до k ближайших площадок в радиусе radius_km вместе с расстоянием"""
+        try:
+            # Индекс по GeoHash отбирает кандидатов из нескольких ячеек вокруг точки,
+            # точное расстояние считается уже по небольшой выборке
+            ranges = covering_ranges(latitude, longitude, radius_km)
+            query = select(Platform).where(
+                or_(*[Platform.GeoHash.between(lo, hi - 1) for lo, hi in ranges])
+            )
+            result = await self.session.execute(query)
+
+            found = []
+            for platform in result.scalars().all():
+                distance = haversine_km(latitude, longitude, platform.Latitude, platform.Longitude)
+                if distance <= radius_km:
+                    found.append((platform, distance))
+            found.sort(key=lambda item: (item[1], item[0].PlatformID))
+            return found[:k]
+        except Exception as e:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Ошибка при поиске ближайших площадок: {str(e)}"
+            )
+
     async def update_platform(
         self,
         platform_id: int,
         platform_data: dict,
         image: Optional[UploadFile] = None
     ) -> Platform:
-        """Обновляет информацию о площадке"""
+        """Обновляет информацию о площадке одним UPDATE ... RETURNING.
+        Прежнее изображение для счетчика ссылок читает CTE того же запроса
+        (см. _update_returning_old)."""
+        values = {
+            field: platform_data[field]
+            for field in ("Name", "City", "Address", "Latitude", "Longitude")
+            if platform_data.get(field) is not None
+        }
+        if image:
+            values["Image"] = await self._save_image(image)
+            # Варианты нового файла отметит schedule_variants после построения
+            values["ImageVariantsReady"] = False
+        if not values:
+            return await self.get_platform(platform_id)
+
         try:
-            platform = await self.get_platform(platform_id)
-
-            # Обновляем изображение если нужно
-            if image:
-                await self._delete_image(platform.Image)
-                platform.Image = await self._save_image(image)
-
-            # Обновляем остальные поля
-            if platform_data.get("Name") is not None:
-                platform.Name = platform_data["Name"]
-            if platform_data.get("City") is not None:
-                platform.City = platform_data["City"]
-            if platform_data.get("Address") is not None:
-                platform.Address = platform_data["Address"]
-            if platform_data.get("Latitude") is not None:
-                platform.Latitude = platform_data["Latitude"]
-            if platform_data.get("Longitude") is not None:
-                platform.Longitude = platform_data["Longitude"]
+            # GeoHash считается в Python по обеим координатам. Если пришла одна,
+            # вторая читается под блокировкой строки, и запись остается одним UPDATE
+            has_lat, has_lon = "Latitude" in values, "Longitude" in values
+            if has_lat or has_lon:
+                if has_lat and has_lon:
+                    latitude, longitude = values["Latitude"], values["Longitude"]
+                else:
+                    current = (await self.session.execute(
+                        select(Platform.Latitude, Platform.Longitude)
+                        .where(Platform.PlatformID == platform_id)
+                        .with_for_update()
+                    )).first()
+                    if current is None:
+                        await self.session.rollback()
+                        raise HTTPException(
+                            status_code=status.HTTP_404_NOT_FOUND,
+                            detail="Площадка не найдена"
+                        )
+                    latitude = values.get("Latitude", current.Latitude)
+                    longitude = values.get("Longitude", current.Longitude)
+                values["GeoHash"] = encode_geohash(latitude, longitude)
 
+            row = await self._update_returning_old(platform_id, values)
+            if row is None:
+                await self.session.rollback()
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="Площадка не найдена"
+                )
+            platform, old_image = row
+            record = PlatformRecord.from_platform(platform)
+            if "Image" in values:
+                await self.images.replace(old_image, values["Image"])
             await self.session.commit()
-            await self.session.refresh(platform)
+            self._catalog_put(record)
+            if "Image" in values:
+                schedule_variants(values["Image"])
             return platform
         except HTTPException:
             raise
@@ -152,12 +346,25 @@ class PlatformService:
             )
 
     async def delete_platform(self, platform_id: int):
-        """Удаляет площадку"""
+        """Удаляет площадку и снимает ссылку на ее изображение одним запросом"""
+        deleted = (
+            delete(Platform)
+            .where(Platform.PlatformID == platform_id)
+            .returning(Platform.Image)
+            .cte("deleted")
+        )
+        released = ImageService.release_statement(deleted.c.Image).cte("released")
+        query = select(func.count()).select_from(deleted).add_cte(released)
         try:
-            platform = await self.get_platform(platform_id)
-            await self._delete_image(platform.Image)
-            await self.session.delete(platform)
+            count = (await self.session.execute(query)).scalar_one()
+            if not count:
+                await self.session.rollback()
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="Площадка не найдена"
+                )
             await self.session.commit()
+            platform_catalog.discard(platform_id)
         except HTTPException:
             raise
         except Exception as e:
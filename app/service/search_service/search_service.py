@@ -0,0 +1,208 @@
+import asyncio
+import time
+from typing import Dict, List, NamedTuple, Optional, Tuple
+from sqlalchemy import select, func, literal, literal_column, union_all, text, String
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.models import Platform, Event
+from app.cache.backends import MISSING, MemoryCache
+from app.utils.text_index import TextIndex, tokenize, prefix_tsquery
+from app.settings.settings import settings
+
+# Конфигурация полнотекстового поиска, та же, что в генерируемых столбцах "SearchVector"
+# (миграция 9e3b5a1c7d20)
+SEARCH_CONFIG = "russian"
+_config = literal_column(f"'{SEARCH_CONFIG}'::regconfig")
+
+
+class _Source(NamedTuple):
+    model: type
+    id: object
+    vector: object  # генерируемый столбец tsvector, в моделях не описан
+    fields: Tuple[Tuple[str, object], ...]  # (вес, столбец) - как в setweight миграции
+
+
+SOURCES: Dict[str, _Source] = {
+    "platform": _Source(
+        Platform, Platform.PlatformID, literal_column('"Platforms"."SearchVector"'),
+        (("A", Platform.Name), ("B", Platform.City), ("B", Platform.Address))
+    ),
+    "event": _Source(
+        Event, Event.EventID, literal_column('"Events"."SearchVector"'),
+        (("A", Event.Name), ("B", Event.City), ("B", Event.Address), ("C", Event.Description))
+    ),
+}
+
+# Подсказки запрашиваются на каждое нажатие клавиши, одинаковые префиксы
+# от разных пользователей отдаются из памяти процесса
+suggest_cache = MemoryCache(settings.SEARCH_SUGGEST_CACHE_SIZE)
+
+# Установлено ли в базе расширение pg_trgm (проверяется один раз на процесс)
+_trigram: Optional[bool] = None
+
+
+class _LocalIndex:
+    """Индекс в памяти для баз без tsvector (SQLite) и версия данных, по которой он построен."""
+
+    def __init__(self):
+        self.index = TextIndex(SEARCH_CONFIG)
+        self.version = None
+        self.checked_at = float("-inf")
+        self.lock = asyncio.Lock()
+
+
+_local = _LocalIndex()
+
+
+class SearchService:
+    """Поиск площадок и событий по названию, городу, адресу и описанию.
+
+    В Postgres используется tsvector с GIN-индексом и русским стеммингом,
+    если точных совпадений нет и установлен pg_trgm - поиск по похожим
+    названиям. Для других баз строится инвертированный индекс в памяти
+    процесса, он перестраивается при изменении данных.
+    """
+
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    def _is_postgres(self) -> bool:
+        return self.session.bind.dialect.name == "postgresql"
+
+    @staticmethod
+    def _kinds(kind: Optional[str]) -> List[str]:
+        return [kind] if kind else list(SOURCES)
+
+    async def search(self, q: str, kind: Optional[str] = None, city: Optional[str] = None, limit: int = 20) -> Tuple[List[dict], bool]:
+        """Результаты по убыванию релевантности и признак нечеткого поиска."""
+        words = tokenize(q)
+        if not words:
+            return [], False
+        if not self._is_postgres():
+            return await self._local_search(words, "", kind, city, limit), False
+
+        tsquery = func.to_tsquery(_config, prefix_tsquery(words))
+        queries = []
+        for name in self._kinds(kind):
+            source = SOURCES[name]
+            rank = func.ts_rank_cd(source.vector, tsquery)
+            query = self._hits(name, rank, city).where(source.vector.op("@@")(tsquery))
+            queries.append(query.order_by(rank.desc(), source.id))
+        hits = await self._run(queries, limit)
+        if hits or not await self._has_trigram():
+            return hits, False
+
+        queries = []
+        for name in self._kinds(kind):
+            source = SOURCES[name]
+            rank = func.similarity(source.model.Name, q)
+            query = self._hits(name, rank, city).where(source.model.Name.op("%")(q))
+            queries.append(query.order_by(rank.desc(), source.id))
+        return await self._run(queries, limit), True
+
+    async def suggest(self, q: str, kind: Optional[str] = None, city: Optional[str] = None, limit: int = 10) -> List[dict]:
+        """Названия, в которых есть все слова запроса, последнее - как начало слова."""
+        words = tokenize(q)
+        if not words:
+            return []
+        key = f"{kind or ''}|{city or ''}|{limit}|{' '.join(words)}"
+        cached = await suggest_cache.get(key)
+        if cached is not MISSING:
+            return cached
+
+        if self._is_postgres():
+            tsquery = func.to_tsquery(_config, prefix_tsquery(words, "A"))
+            queries = []
+            for name in self._kinds(kind):
+                source = SOURCES[name]
+                rank = func.ts_rank_cd(source.vector, tsquery)
+                query = self._hits(name, rank, city).where(source.vector.op("@@")(tsquery))
+                queries.append(query.order_by(rank.desc(), func.length(source.model.Name), source.id))
+            hits = await self._run(queries, limit)
+        else:
+            hits = await self._local_search(words, "A", kind, city, limit)
+            hits.sort(key=lambda hit: (-hit["Rank"], len(hit["Name"]), hit["ID"]))
+        suggestions = [{k: hit[k] for k in ("Type", "ID", "Name", "City")} for hit in hits]
+        await suggest_cache.set(key, suggestions, settings.SEARCH_SUGGEST_CACHE_TTL)
+        return suggestions
+
+    @staticmethod
+    def _hits(kind: str, rank, city: Optional[str]):
+        source = SOURCES[kind]
+        query = select(
+            literal(kind, String).label("Type"),
+            source.id.label("ID"),
+            source.model.Name.label("Name"),
+            source.model.City.label("City"),
+            source.model.Address.label("Address"),
+            rank.label("Rank")
+        )
+        if city:
+            query = query.where(source.model.City == city)
+        return query
+
+    async def _run(self, queries, limit: int) -> List[dict]:
+        """Лучшие limit строк каждого источника, затем общий порядок по Rank, одним запросом."""
+        queries = [query.limit(limit) for query in queries]
+        if len(queries) == 1:
+            combined = queries[0]
+        else:
+            union = union_all(*queries).subquery()
+            combined = select(union).order_by(union.c.Rank.desc(), union.c.ID).limit(limit)
+        result = await self.session.execute(combined)
+        return [dict(row._mapping) for row in result]
+
+    async def _has_trigram(self) -> bool:
+        global _trigram
+        if _trigram is None:
+            _trigram = bool(await self.session.scalar(
+                text("SELECT EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm')")
+            ))
+        return _trigram
+
+    async def _local_search(self, words: List[str], weights: str, kind: Optional[str], city: Optional[str], limit: int) -> List[dict]:
+        index = await self._local_index()
+        hits = []
+        for key, score in index.search(words, weights):
+            payload = index.documents[key]
+            if (kind and payload["Type"] != kind) or (city and payload["City"] != city):
+                continue
+            hits.append(dict(payload, Rank=score))
+            if len(hits) >= limit:
+                break
+        return hits
+
+    async def _data_version(self):
+        versions = []
+        for source in SOURCES.values():
+            result = await self.session.execute(select(func.count(), func.max(source.model.UpdatedAt)))
+            versions.append(tuple(result.one()))
+        return tuple(versions)
+
+    async def _local_index(self) -> TextIndex:
+        """Индекс в памяти; не чаще раза в SEARCH_INDEX_REFRESH_SECONDS проверяет,
+        изменились ли таблицы (число строк и последний UpdatedAt), и перестраивает его."""
+        if time.monotonic() - _local.checked_at < settings.SEARCH_INDEX_REFRESH_SECONDS:
+            return _local.index
+        async with _local.lock:
+            if time.monotonic() - _local.checked_at >= settings.SEARCH_INDEX_REFRESH_SECONDS:
+                version = await self._data_version()
+                if version != _local.version:
+                    _local.index = await self._build_index()
+                    _local.version = version
+                _local.checked_at = time.monotonic()
+        return _local.index
+
+    async def _build_index(self) -> TextIndex:
+        index = TextIndex(SEARCH_CONFIG)
+        for kind, source in SOURCES.items():
+            columns = [column for _, column in source.fields]
+            result = await self.session.execute(select(source.id, *columns))
+            for row in result:
+                item_id, values = row[0], row[1:]
+                fields = [(weight, value) for (weight, _), value in zip(source.fields, values)]
+                payload = {
+                    "Type": kind, "ID": item_id, "Name": values[0],
+                    "City": values[1], "Address": values[2]
+                }
+                index.add((kind, item_id), fields, payload)
+        return index
@@ -0,0 +1,42 @@
+"""Пересчет сводных таблиц статистики событий с нуля.
+
+Запуск: python -m app.service.stats_service.rebuild [--check]
+
+Нужен после восстановления из резервной копии, ручных правок "Events" при
+отключенных триггерах и т.п. С --check только сообщает, сколько строк
+каждой таблицы расходится с пересчетом, и завершается с кодом 1, если
+расхождения есть.
+"""
+import argparse
+import asyncio
+import sys
+import time
+
+from app.database.database import get_session_factory, dispose_engine
+from app.service.stats_service.stats_service import StatsService
+
+
+async def main(args: argparse.Namespace) -> int:
+    try:
+        async with get_session_factory()() as session:
+            service = StatsService(session)
+            if args.check:
+                drift = await service.drift()
+                for table, rows in drift.items():
+                    print(f"{table}: расходится строк: {rows}")
+                return 1 if any(drift.values()) else 0
+            started = time.perf_counter()
+            rows = await service.rebuild()
+            await session.commit()
+            for table, count in rows.items():
+                print(f"{table}: {count} строк")
+            print(f"Статистика пересчитана за {time.perf_counter() - started:.1f} с")
+            return 0
+    finally:
+        await dispose_engine()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Пересчет сводной статистики событий")
+    parser.add_argument("--check", action="store_true", help="только сравнить с пересчетом, ничего не меняя")
+    sys.exit(asyncio.run(main(parser.parse_args())))
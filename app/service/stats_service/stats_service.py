@@ -0,0 +1,184 @@
+from datetime import date, datetime, time, timedelta
+from typing import Dict, List, Optional
+from sqlalchemy import select, insert, delete, func, text, except_, cast, BigInteger, Date
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.models import Event, EventStatsPlatform, EventStatsCity, EventStatsDay, EventStatsPlatformDay
+
+STATS_MODELS = (EventStatsPlatform, EventStatsCity, EventStatsDay, EventStatsPlatformDay)
+
+# date() вместо CAST: в SQLite CAST(... AS DATE) дает число
+_DAY = func.date(Event.DateStart, type_=Date)
+_KEYS = {
+    EventStatsPlatform: (Event.PlatformID.label("PlatformID"),),
+    EventStatsCity: (func.coalesce(Event.City, "").label("City"),),
+    EventStatsDay: (_DAY.label("Day"),),
+    EventStatsPlatformDay: (Event.PlatformID.label("PlatformID"), _DAY.label("Day")),
+}
+
+
+def _aggregate(model):
+    """Содержимое сводной таблицы, посчитанное заново по "Events"."""
+    keys = _KEYS[model]
+    query = select(*keys, func.count().label("Events")).group_by(*keys)
+    if model in (EventStatsDay, EventStatsPlatformDay):
+        query = query.where(Event.DateStart.is_not(None))
+    return query
+
+
+def _shards_summed(model):
+    """Сводная таблица Postgres со сложенными шардами: ключ и Events."""
+    table = model.__table__
+    keys = [column for column in table.primary_key.columns if column.name != "Shard"]
+    return select(*keys, cast(func.sum(table.c.Events), BigInteger).label("Events")).group_by(*keys)
+
+
+class StatsService:
+    """Статистика событий для /v1/stats.
+
+    В Postgres читаются сводные таблицы, которые триггеры на "Events"
+    обновляют вместе с каждым INSERT/UPDATE/DELETE, поэтому время ответа
+    зависит от числа площадок, городов и дней, но не событий. Счетчик
+    ключа - сумма его шардов (не больше 16 строк). В других базах
+    триггеров нет, и те же запросы идут к агрегатам по "Events".
+    """
+
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    def _is_postgres(self) -> bool:
+        return self.session.bind.dialect.name == "postgresql"
+
+    def _source(self, model):
+        if self._is_postgres():
+            return _shards_summed(model).subquery(model.__tablename__)
+        return _aggregate(model).subquery(model.__tablename__)
+
+    def _upcoming(self, since: Optional[date], platform_id=None):
+        """Предстоящие события, всего или по площадке.
+
+        С since считаются все события с этой даты, по дневным счетчикам.
+        Без since - еще не начавшиеся: дни после сегодняшнего по счетчикам
+        плюс сегодняшние события с DateStart от текущего момента, отдельным
+        запросом по "Events" (ix_Events_DateStart). Время событий хранится
+        без часового пояса, "сейчас" - местное время сервера.
+        """
+        now = datetime.now() if since is None else None
+        first_day = since if now is None else now.date() + timedelta(days=1)
+        if platform_id is None:
+            days = self._source(EventStatsDay)
+            query = select(func.coalesce(func.sum(days.c.Events), 0)).where(days.c.Day >= first_day)
+        else:
+            days = self._source(EventStatsPlatformDay)
+            query = select(func.coalesce(func.sum(days.c.Events), 0)).where(
+                days.c.PlatformID == platform_id, days.c.Day >= first_day
+            )
+        if now is None:
+            return query.scalar_subquery()
+        today = select(func.count()).select_from(Event).where(
+            Event.DateStart >= now, Event.DateStart < datetime.combine(first_day, time.min)
+        )
+        if platform_id is not None:
+            today = today.where(Event.PlatformID == platform_id)
+        return query.scalar_subquery() + today.scalar_subquery()
+
+    async def summary(self, since: Optional[date] = None) -> dict:
+        """Всего событий, предстоящих (см. _upcoming), площадок и городов с событиями."""
+        cities = self._source(EventStatsCity)
+        platforms = self._source(EventStatsPlatform)
+        query = select(
+            select(func.coalesce(func.sum(cities.c.Events), 0)).scalar_subquery(),
+            self._upcoming(since),
+            select(func.count()).select_from(platforms).where(platforms.c.Events > 0).scalar_subquery(),
+            select(func.count()).select_from(cities).where(cities.c.Events > 0).scalar_subquery(),
+        )
+        total, upcoming, platform_count, city_count = (await self.session.execute(query)).one()
+        return {
+            "Events": total,
+            "Upcoming": upcoming,
+            "Platforms": platform_count,
+            "Cities": city_count,
+            "Since": since or date.today(),
+        }
+
+    async def platforms(self, since: Optional[date], limit: int) -> List[dict]:
+        """Площадки с наибольшим числом событий."""
+        platforms = self._source(EventStatsPlatform)
+        query = (
+            select(platforms.c.PlatformID, platforms.c.Events)
+            .where(platforms.c.Events > 0)
+            .order_by(platforms.c.Events.desc(), platforms.c.PlatformID)
+            .limit(limit)
+            .subquery("top")
+        )
+        # Предстоящие считаются только для попавших в ответ площадок
+        result = await self.session.execute(
+            select(query.c.PlatformID, query.c.Events, self._upcoming(since, query.c.PlatformID))
+            .order_by(query.c.Events.desc(), query.c.PlatformID)
+        )
+        return [
+            {"PlatformID": platform_id, "Events": events, "Upcoming": upcoming}
+            for platform_id, events, upcoming in result.all()
+        ]
+
+    async def platform(self, platform_id: int, since: Optional[date] = None) -> dict:
+        platforms = self._source(EventStatsPlatform)
+        events = select(platforms.c.Events).where(platforms.c.PlatformID == platform_id).scalar_subquery()
+        query = select(func.coalesce(events, 0), self._upcoming(since, platform_id))
+        events, upcoming = (await self.session.execute(query)).one()
+        return {"PlatformID": platform_id, "Events": events, "Upcoming": upcoming}
+
+    async def cities(self) -> List[dict]:
+        """Города по убыванию числа событий; события без города - City = null."""
+        cities = self._source(EventStatsCity)
+        result = await self.session.execute(
+            select(cities.c.City, cities.c.Events)
+            .where(cities.c.Events > 0)
+            .order_by(cities.c.Events.desc(), cities.c.City)
+        )
+        return [{"City": city or None, "Events": events} for city, events in result.all()]
+
+    async def days(self, start: date, end: date, platform_id: Optional[int] = None) -> List[dict]:
+        """Число событий по дням [start, end], всего или по площадке. Дни без событий пропущены."""
+        if platform_id is None:
+            days = self._source(EventStatsDay)
+            query = select(days.c.Day, days.c.Events)
+        else:
+            days = self._source(EventStatsPlatformDay)
+            query = select(days.c.Day, days.c.Events).where(days.c.PlatformID == platform_id)
+        result = await self.session.execute(
+            query.where(days.c.Day >= start, days.c.Day <= end, days.c.Events > 0).order_by(days.c.Day)
+        )
+        return [{"Day": day, "Events": events} for day, events in result.all()]
+
+    async def rebuild(self) -> Dict[str, int]:
+        """Пересчитывает все сводные таблицы по "Events" в транзакции вызывающего.
+
+        На время пересчета запись событий блокируется (SHARE), чтобы триггеры
+        не изменили счетчики между удалением и заполнением. Чтение не ждет.
+        """
+        if self._is_postgres():
+            await self.session.execute(text('LOCK TABLE "Events" IN SHARE MODE'))
+        rows = {}
+        for model in STATS_MODELS:
+            query = _aggregate(model)
+            await self.session.execute(delete(model))
+            result = await self.session.execute(
+                insert(model).from_select([column.name for column in query.selected_columns], query)
+            )
+            rows[model.__tablename__] = result.rowcount
+        return rows
+
+    async def drift(self) -> Dict[str, int]:
+        """Число расходящихся со свежим пересчетом строк в каждой сводной таблице."""
+        drift = {}
+        for model in STATS_MODELS:
+            stored = _shards_summed(model).having(func.sum(model.__table__.c.Events) != 0)
+            fresh = _aggregate(model)
+            missing = except_(fresh, stored).subquery()
+            extra = except_(stored, fresh).subquery()
+            query = select(
+                select(func.count()).select_from(missing).scalar_subquery()
+                + select(func.count()).select_from(extra).scalar_subquery()
+            )
+            drift[model.__tablename__] = (await self.session.execute(query)).scalar_one()
+        return drift
@@ -1,17 +1,67 @@
-from typing import Union, Dict, Any
+from typing import Union, Dict, Any, FrozenSet
 from app.models.models import User
 from app.schemas.request.users.user_auth_schema import UserAuth
 from app.schemas.request.users.user_registration_schema import UserRegistration
 from app.schemas.request.users.user_update_schema import UserUpdate
 from app.database.database import *
-from app.security.hasher import hash_password
-from app.security.hasher import verify_password
-from sqlalchemy import select, insert, update
+from app.security.hasher import hash_password_async
+from app.security.hasher import verify_password_async
+from app.security.hasher import needs_rehash
+from app.storage.uploads import save_upload
+from app.storage.static import media_url
+from app.storage.variants import schedule_variants_for_url
+from app.service.image_service.image_service import ImageService
+from app.cache import MISSING, user_cache
+from app.settings.settings import settings
+from sqlalchemy import select, insert, update, func
+from sqlalchemy.orm import selectinload
 from fastapi import HTTPException, UploadFile, status
 import os
-import uuid
+from datetime import datetime
 from fastapi.responses import JSONResponse
-from pathlib import Path
+
+USER_FIELDS = tuple(column.key for column in User.__table__.columns)
+# Хэш пароля в кэш (и в Redis) не попадает: вход всегда проверяется по БД
+CACHED_FIELDS = tuple(field for field in USER_FIELDS if field != "PasswordHash")
+# Связи, которые можно встроить в ответ (?include=)
+USER_INCLUDES = ("events",)
+
+# SQLSTATE unique_violation и тексты ошибок для занятых логина и email
+UNIQUE_VIOLATION = "23505"
+LOGIN_TAKEN = "Login already registered"
+EMAIL_TAKEN = "Пользователь с таким email уже существует"
+
+
+def _unique_error(error: Exception) -> Union[HTTPException, None]:
+    """Переводит нарушение уникальности логина или email в ответ 400."""
+    orig = getattr(error, "orig", None)
+    if getattr(orig, "sqlstate", None) != UNIQUE_VIOLATION:
+        return None
+    constraint = getattr(orig.__cause__, "constraint_name", None)
+    if constraint == "Users_Email_key":
+        return HTTPException(status_code=400, detail=EMAIL_TAKEN)
+    # Users_Login_key или ux_Users_lower_Login (тот же логин в другом регистре)
+    return HTTPException(status_code=400, detail=LOGIN_TAKEN)
+
+
+def _to_cache(user: User) -> dict:
+    data = {field: getattr(user, field) for field in CACHED_FIELDS}
+    data["UpdatedAt"] = data["UpdatedAt"].isoformat()
+    return data
+
+
+def _from_cache(data: dict) -> User:
+    data = dict(data, UpdatedAt=datetime.fromisoformat(data["UpdatedAt"]))
+    return User(**data)
+
+
+def _id_key(user_id: int) -> str:
+    return f"id:{user_id}"
+
+
+def _login_key(login: str) -> str:
+    return f"login:{login.lower()}"
+
 
 class UserService:
     def __init__(self, session: AsyncSession):
@@ -22,34 +72,70 @@ class UserService:
         result = await self.session.execute(query)
         return result.scalars().first()
 
-    async def get_user_by_login(self, login: str) -> Union[User, None]:
-        """Получить пользователя по логину."""
-        query = select(User).where(User.Login == login)
+    async def _cached(self, key: str, query) -> Union[User, None]:
+        """Читает пользователя через кэш.
+
+        Из кэша возвращается отсоединенный от сессии объект User без
+        PasswordHash: его можно читать, но изменения нужно делать запросами.
+        Отсутствие пользователя тоже кэшируется, на короткий USER_CACHE_NEGATIVE_TTL.
+        """
+        cached = await user_cache.get(key)
+        if cached is not MISSING:
+            return _from_cache(cached) if cached is not None else None
+
         result = await self.session.execute(query)
-        return result.scalars().first()
+        user = result.scalars().first()
+        if user is None:
+            await user_cache.set(key, None, settings.USER_CACHE_NEGATIVE_TTL)
+        else:
+            data = _to_cache(user)
+            await user_cache.set(_id_key(user.UserID), data, settings.USER_CACHE_TTL)
+            await user_cache.set(_login_key(user.Login), data, settings.USER_CACHE_TTL)
+        return user
+
+    @staticmethod
+    async def invalidate(*users: User, logins=()):
+        """Сбрасывает записи кэша по ID и логинам. Вызывается после commit.
+
+        Бэкенд memory сбрасывается только в этом воркере, в остальных запись
+        живет до USER_CACHE_TTL; для нескольких воркеров нужен бэкенд redis.
+        """
+        keys = [_login_key(login) for login in logins if login]
+        for user in users:
+            if user is not None:
+                keys += [_id_key(user.UserID), _login_key(user.Login)]
+        await user_cache.delete(*keys)
+
+    async def get_user_by_login(self, login: str) -> Union[User, None]:
+        """Получить пользователя по логину (без учета регистра, ux_Users_lower_Login уникален)."""
+        query = select(User).where(func.lower(User.Login) == login.lower())
+        return await self._cached(_login_key(login), query)
+
+    async def get_user_by_id(self, user_id: int, include: FrozenSet[str] = frozenset()) -> Union[User, None]:
+        """Получить пользователя по ID.
 
-    async def get_user_by_id(self, user_id: int) -> Union[User, None]:
-        """Получить пользователя по ID."""
+        Со связями (include={"events"}) - мимо кэша: события грузятся вторым
+        запросом (selectinload) и в кэш пользователя не входят.
+        """
         query = select(User).where(User.UserID == user_id)
-        result = await self.session.execute(query)
-        return result.scalars().first()
+        if include:
+            result = await self.session.execute(query.options(selectinload(User.events)))
+            return result.scalars().first()
+        return await self._cached(_id_key(user_id), query)
 
     async def register(self, request: UserRegistration):
-        """Регистрация нового пользователя."""
-        existing_user_by_login = await self.get_user_by_login(request.Login)
-        if existing_user_by_login:
-            raise HTTPException(status_code=400, detail="Пользователь с таким логином уже существует")
-
-        existing_user_by_email = await self.get_profile(Email=request.Email)
-        if existing_user_by_email:
-            raise HTTPException(status_code=400, detail="Пользователь с таким email уже существует")
+        """Регистрация нового пользователя.
 
+        Один запрос INSERT ... RETURNING: занятые логин (уникальный индекс
+        ux_Users_lower_Login, без учета регистра) и email дают нарушение
+        уникальности, отдельные проверки перед вставкой не нужны.
+        """
         query = (
             insert(User)
             .values(
                 Login=request.Login,
                 Email=request.Email,
-                PasswordHash=hash_password(request.PasswordHash),
+                PasswordHash=await hash_password_async(request.PasswordHash),
                 Name=request.Name,
                 Surname=request.Surname,
                 Patronymic=request.Patronymic,
@@ -62,24 +148,32 @@ class UserService:
 
         try:
             result = await self.session.execute(query)
+            user = result.scalars().one()
+            await ImageService(self.session).acquire_url(request.PhotoURL)
             await self.session.commit()
-            return result.scalars().first()
+        except HTTPException:
+            await self.session.rollback()
+            raise
         except Exception as e:
             await self.session.rollback()
-            raise HTTPException(status_code=500, detail=f"Ошибка при регистрации пользователя: {str(e)}")
+            raise _unique_error(e) or HTTPException(status_code=500, detail=f"Ошибка при регистрации пользователя: {str(e)}")
+        # Снимаем отрицательные записи кэша по этому логину
+        await self.invalidate(user)
+        schedule_variants_for_url(user.PhotoURL)
+        return user
 
     async def update_profile(self, UserID: int, data: Dict[str, Any], photo_file: UploadFile = None):
-        """Обновление профиля пользователя с возможной загрузкой фото."""
-        existing_user = await self.get_user_by_id(UserID)
-        if not existing_user:
-            raise HTTPException(status_code=404, detail="Пользователь не найден")
+        """Обновление профиля пользователя с возможной загрузкой фото.
 
+        Прежние PhotoURL и Login (для счетчика ссылок и кэша) читаются CTE
+        в том же UPDATE ... RETURNING (см. _update_returning_old).
+        """
         # Обработка загружаемого файла
         if photo_file:
             try:
                 file_name = await self.save_uploaded_file(photo_file)
                 # Сохраняем полный URL в базу данных
-                full_photo_url = f"http://212.20.53.169:13299/uploads/{file_name}"
+                full_photo_url = media_url(file_name)
                 data['PhotoURL'] = full_photo_url
             except HTTPException as e:
                 raise e
@@ -91,27 +185,65 @@ class UserService:
 
         # Если передается пароль, хэшируем его
         if 'Password' in data and data['Password'] is not None:
-            data['PasswordHash'] = hash_password(data['Password'])
+            data['PasswordHash'] = await hash_password_async(data['Password'])
             del data['Password']
 
         update_fields = {k: v for k, v in data.items() if v is not None}
+        if "PhotoURL" in update_fields:
+            # Варианты нового фото отметит schedule_variants после построения
+            update_fields["PhotoVariantsReady"] = False
 
         if not update_fields:
-            return existing_user  # Возвращаем неизмененного пользователя
+            # Возвращаем неизмененного пользователя
+            existing_user = await self.get_user_by_id(UserID)
+            if not existing_user:
+                raise HTTPException(status_code=404, detail="Пользователь не найден")
+            return existing_user
 
-        query = update(User).where(User.UserID == UserID).values(**update_fields).returning(User)
-        
         try:
-            result = await self.session.execute(query)
+            row = await self._update_returning_old(UserID, update_fields)
+            if row is None:
+                raise HTTPException(status_code=404, detail="Пользователь не найден")
+            updated_user, old_photo_url, old_login = row
+            if "PhotoURL" in update_fields:
+                await ImageService(self.session).replace_url(old_photo_url, update_fields["PhotoURL"])
             await self.session.commit()
-            updated_user = result.scalars().first()
-            return updated_user
+        except HTTPException:
+            await self.session.rollback()
+            raise
         except Exception as e:
             await self.session.rollback()
-            raise HTTPException(
+            raise _unique_error(e) or HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail=f"Ошибка при обновлении профиля: {str(e)}"
             )
+        await self.invalidate(updated_user, logins=(old_login,))
+        if "PhotoURL" in update_fields:
+            schedule_variants_for_url(update_fields["PhotoURL"])
+        return updated_user
+
+    async def _update_returning_old(self, user_id: int, values: Dict[str, Any]):
+        """UPDATE ... RETURNING пользователя вместе с прежними PhotoURL и Login.
+
+        В Postgres прежние значения читает CTE того же запроса. SQLite в
+        RETURNING видит только изменяемую таблицу, уже с новыми значениями,
+        поэтому там прежние значения читаются SELECT перед UPDATE.
+        """
+        old = (
+            select(User.UserID, User.PhotoURL, User.Login)
+            .where(User.UserID == user_id)
+            .with_for_update()
+        )
+        query = update(User).values(**values)
+        if self.session.bind.dialect.name == "postgresql":
+            old = old.cte("old")
+            query = query.where(User.UserID == old.c.UserID).returning(User, old.c.PhotoURL, old.c.Login)
+            return (await self.session.execute(query)).first()
+        prior = (await self.session.execute(old)).first()
+        if prior is None:
+            return None
+        query = query.where(User.UserID == user_id).returning(User)
+        return (await self.session.execute(query)).scalar_one(), prior.PhotoURL, prior.Login
 
     async def authorize(self, Login: str, PasswordHash: str):
         """Авторизация пользователя."""
@@ -124,44 +256,45 @@ class UserService:
         return authenticated
 
     async def authenticate_user(self, Login: str, PasswordHash: str) -> Union[User, str]:
-        """Аутентификация пользователя."""
-        user = await self.get_user_by_login(Login)
+        """Аутентификация пользователя.
+
+        Пользователь с хэшем читается из БД мимо кэша: в кэше хэша нет, а
+        устаревшая запись другого воркера не должна пускать со старым паролем.
+        """
+        result = await self.session.execute(
+            select(User).where(func.lower(User.Login) == Login.lower())
+        )
+        user = result.scalars().first()
         if not user:
             return "User not found"
-        if not verify_password(PasswordHash, user.PasswordHash):
+        if not await verify_password_async(PasswordHash, user.PasswordHash):
             return "Invalid password"
+        if needs_rehash(user.PasswordHash):
+            await self._upgrade_password_hash(user, PasswordHash)
         return user
+
+    async def _upgrade_password_hash(self, user: User, password: str):
+        """Пересчитывает хэш с текущей стоимостью после успешного входа."""
+        new_hash = await hash_password_async(password)
+        try:
+            await self.session.execute(
+                update(User).where(User.UserID == user.UserID).values(PasswordHash=new_hash)
+            )
+            await self.session.commit()
+            user.PasswordHash = new_hash
+        except Exception:
+            # Старый хэш остается рабочим, вход не должен падать из-за обновления
+            await self.session.rollback()
+            return
+        await self.invalidate(user)
     
     @staticmethod
-    async def save_uploaded_file(file: UploadFile, upload_dir: str = "uploads") -> str:
+    async def save_uploaded_file(file: UploadFile, upload_dir: str = None) -> str:
         """Сохраняет загруженный файл в указанную директорию."""
-        # Проверяем и создаем директорию при необходимости
-        upload_path = Path(upload_dir)
-        upload_path.mkdir(parents=True, exist_ok=True)
-        
-        # Генерируем уникальное имя файла с сохранением расширения
-        if not file.filename:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Имя файла отсутствует"
-            )
-        
-        file_ext = Path(file.filename).suffix.lower()
-        if file_ext not in ['.png', '.jpg', '.jpeg', '.gif']:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Неподдерживаемый формат файла"
-            )
-        
-        file_name = f"{uuid.uuid4()}{file_ext}"
-        file_path = upload_path / file_name
-        
-        # Сохраняем файл
         try:
-            with open(file_path, "wb") as buffer:
-                content = await file.read()
-                buffer.write(content)
-            return file_name
+            return await save_upload(file, allowed=(".png", ".jpg", ".gif"), upload_dir=upload_dir)
+        except HTTPException:
+            raise
         except Exception as e:
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -1,4 +1,5 @@
 from pydantic_settings import BaseSettings
+from typing import Dict, Optional
 from yarl import URL
 class Settings(BaseSettings):
     POSTGRES_HOST: str
@@ -12,6 +13,92 @@ class Settings(BaseSettings):
     JWT_ACCESS_TOKEN_LIFETIME_HOURS: int
     JWT_ACCESS_TOKEN_LIFETIME_MINUTES: int
     JWT_REFRESH_TOKEN_LIFETIME_HOURS: int
+    # Сколько проверенных токенов держать в памяти процесса
+    JWT_CACHE_SIZE: int = 10000
+
+    # Кэш пользователей: memory (в процессе), redis (общий для воркеров) или none
+    USER_CACHE_BACKEND: str = "memory"
+    USER_CACHE_URL: str = "redis://localhost:6379/0"
+    USER_CACHE_SIZE: int = 10000
+    USER_CACHE_TTL: float = 60.0
+    # Сколько помнить, что пользователя нет (повторные проверки логина при регистрации)
+    USER_CACHE_NEGATIVE_TTL: float = 5.0
+
+    # Ответы через orjson (если пакет установлен)
+    FAST_JSON: bool = True
+
+    # Полнотекстовый поиск: кэш подсказок в процессе и, для баз кроме Postgres,
+    # период проверки изменений для индекса в памяти
+    SEARCH_SUGGEST_CACHE_SIZE: int = 10000
+    SEARCH_SUGGEST_CACHE_TTL: float = 10.0
+    SEARCH_INDEX_REFRESH_SECONDS: float = 5.0
+
+    # Каталог площадок в памяти воркера: период сверки с БД и снимок для быстрого старта
+    PLATFORM_CATALOG_ENABLED: bool = True
+    PLATFORM_CATALOG_REFRESH_SECONDS: float = 30.0
+    # "" - без снимка
+    PLATFORM_CATALOG_SNAPSHOT: str = ".platform_catalog.json"
+    PLATFORM_CATALOG_SNAPSHOT_SECONDS: float = 60.0
+
+    # Метрики в формате Prometheus на /metrics; если задан METRICS_TOKEN,
+    # нужен заголовок Authorization: Bearer <токен>. Выключены по умолчанию:
+    # без токена маршруты, пул, кэши и стоимость bcrypt видны любому клиенту
+    METRICS_ENABLED: bool = False
+    METRICS_TOKEN: Optional[str] = None
+
+    # Профилировщик SQL по запросу: для всех запросов (PROFILER_ENABLED) или для
+    # запросов с заголовком X-Debug-Profile, подписанным PROFILER_SECRET
+    PROFILER_ENABLED: bool = False
+    PROFILER_SECRET: Optional[str] = None
+    PROFILER_SIGNATURE_TTL: int = 300
+    PROFILER_SLOWEST: int = 3
+    # Сколько одинаковых по форме SELECT за запрос считать вероятным N+1
+    PROFILER_REPEAT_THRESHOLD: int = 5
+    # План самого медленного выражения (только Postgres), пишется в лог: EXPLAIN ANALYZE
+    # для SELECT без изменений и блокировок, EXPLAIN без выполнения для остальных
+    PROFILER_EXPLAIN: bool = False
+
+    # Строка подключения целиком, вместо POSTGRES_* (например, sqlite+aiosqlite:///./kurs.db)
+    DATABASE_URL: Optional[str] = None
+    # Пул соединений с БД
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    DB_POOL_TIMEOUT: float = 30.0
+    # Режим работы за PgBouncer (pool_mode = transaction)
+    DB_TRANSACTION_POOLING: bool = False
+
+    # Хэширование паролей: стоимость подбирается при старте под целевое время,
+    # если не задана явно в BCRYPT_ROUNDS
+    BCRYPT_ROUNDS: Optional[int] = None
+    BCRYPT_TARGET_MS: float = 100.0
+    BCRYPT_MIN_ROUNDS: int = 8
+    BCRYPT_MAX_ROUNDS: int = 14
+    BCRYPT_THREADS: Optional[int] = None
+
+    # Загрузка файлов
+    UPLOAD_DIR: str = "uploads"
+    UPLOAD_MAX_BYTES: int = 10 * 1024 * 1024
+    UPLOAD_CHUNK_SIZE: int = 256 * 1024
+    # Сборка мусора в каталоге загрузок (python -m app.storage.gc)
+    UPLOAD_GC_GRACE_SECONDS: int = 3600
+    UPLOAD_GC_STATE_FILE: str = ".uploads_gc_state"
+
+    # Раздача загруженных файлов
+    MEDIA_BASE_URL: str = "http://212.20.53.169:13299/uploads/"
+    MEDIA_CACHE_MAX_AGE: int = 365 * 24 * 3600
+    # "" - файлы отдает приложение, "x-accel-redirect" - nginx, "x-sendfile" - Apache/lighttpd
+    MEDIA_OFFLOAD: str = ""
+    # internal location nginx для режима x-accel-redirect
+    MEDIA_OFFLOAD_PREFIX: str = "/protected-uploads/"
+
+    # Варианты изображений: имя -> наибольшая сторона в пикселях (0 - без уменьшения)
+    IMAGE_VARIANTS_ENABLED: bool = True
+    IMAGE_VARIANTS: Dict[str, int] = {"thumb": 160, "medium": 640, "full": 0}
+    IMAGE_VARIANT_FORMAT: str = "webp"
+    IMAGE_VARIANT_QUALITY: int = 80
+    IMAGE_VARIANT_WORKERS: int = 2
     
     class Config:
         env_file = ".env"
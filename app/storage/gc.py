@@ -0,0 +1,142 @@
+"""Инкрементальная сборка мусора в каталоге загрузок.
+
+Запуск: python -m app.storage.gc [--batch-size N] [--max-batches N] [--rebuild]
+
+За один проход обрабатывается не больше batch-size * max-batches файлов,
+позиция сохраняется в UPLOAD_GC_STATE_FILE, и следующий запуск продолжает
+с того же места. Удаляются файлы без ссылок в таблице Images, которые не
+менялись дольше UPLOAD_GC_GRACE_SECONDS (так не пострадают только что
+загруженные файлы, ссылка на которые еще не записана), их варианты и
+брошенные временные файлы незавершенных загрузок.
+"""
+import argparse
+import asyncio
+import os
+import time
+from typing import Iterator, List, Optional
+
+from app.database.database import get_session_factory, dispose_engine
+from app.service.image_service.image_service import ImageService
+from app.settings.settings import settings
+from app.storage.uploads import TEMP_PREFIX, IMAGE_EXTENSIONS
+from app.storage.variants import is_variant, original_stem
+
+
+def _load_position() -> str:
+    try:
+        with open(settings.UPLOAD_GC_STATE_FILE, encoding="utf-8") as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        return ""
+
+
+def _save_position(position: str):
+    with open(settings.UPLOAD_GC_STATE_FILE, "w", encoding="utf-8") as f:
+        f.write(position)
+
+
+def _listing(after: str) -> List[str]:
+    """Имена файлов каталога после позиции after, по возрастанию."""
+    with os.scandir(settings.UPLOAD_DIR) as entries:
+        return sorted(entry.name for entry in entries if entry.is_file() and entry.name > after)
+
+
+def _batches(names: List[str], batch_size: int) -> Iterator[List[str]]:
+    for start in range(0, len(names), batch_size):
+        yield names[start:start + batch_size]
+
+
+def _is_stale(name: str, now: float) -> bool:
+    try:
+        mtime = os.stat(os.path.join(settings.UPLOAD_DIR, name)).st_mtime
+    except FileNotFoundError:
+        return False
+    return now - mtime > settings.UPLOAD_GC_GRACE_SECONDS
+
+
+def _has_original(name: str) -> bool:
+    stem = os.path.join(settings.UPLOAD_DIR, original_stem(name))
+    return any(os.path.exists(stem + ext) for ext in IMAGE_EXTENSIONS)
+
+
+def _remove(name: str):
+    try:
+        os.remove(os.path.join(settings.UPLOAD_DIR, name))
+    except FileNotFoundError:
+        pass
+
+
+async def collect_garbage(batch_size: int = 500, max_batches: Optional[int] = 20) -> int:
+    """Удаляет неиспользуемые файлы, возвращает число удаленных."""
+    position = _load_position()
+    removed = 0
+    batches = 0
+
+    # Каталог читается и сортируется один раз за запуск. Файлы, появившиеся
+    # позже, попадут в следующий проход
+    batches_left = _batches(await asyncio.to_thread(_listing, position), batch_size)
+
+    async with get_session_factory()() as session:
+        images = ImageService(session)
+        while max_batches is None or batches < max_batches:
+            names = next(batches_left, None)
+            if names is None:
+                # Дошли до конца каталога: следующий проход начнется сначала
+                position = ""
+                break
+            batches += 1
+            position = names[-1]
+
+            now = time.time()
+            originals = [
+                name for name in names
+                if not name.startswith(TEMP_PREFIX) and not is_variant(name)
+            ]
+            referenced = await images.get_referenced(originals)
+            garbage = [
+                name for name in originals
+                if name not in referenced and _is_stale(name, now)
+            ]
+            for name in garbage:
+                await asyncio.to_thread(_remove, name)
+            await images.forget(garbage)
+
+            # Варианты живут, пока существует оригинал. Оригинал <hash>.png идет
+            # в сортировке раньше <hash>_thumb.webp, поэтому к этому моменту он уже
+            # удален, если был мусором.
+            for name in names:
+                if name.startswith(TEMP_PREFIX):
+                    stale = _is_stale(name, now)
+                elif is_variant(name):
+                    stale = not await asyncio.to_thread(_has_original, name)
+                else:
+                    continue
+                if stale:
+                    await asyncio.to_thread(_remove, name)
+                    removed += 1
+            await session.commit()
+            removed += len(garbage)
+
+    _save_position(position)
+    return removed
+
+
+async def main(args: argparse.Namespace):
+    try:
+        if args.rebuild:
+            async with get_session_factory()() as session:
+                count = await ImageService(session).rebuild()
+                await session.commit()
+                print(f"Счетчики ссылок пересчитаны: {count} файлов")
+        removed = await collect_garbage(args.batch_size, args.max_batches or None)
+        print(f"Удалено файлов: {removed}")
+    finally:
+        await dispose_engine()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Сборка мусора в каталоге загрузок")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--max-batches", type=int, default=20, help="0 - весь каталог за один запуск")
+    parser.add_argument("--rebuild", action="store_true", help="пересчитать счетчики ссылок перед сборкой")
+    asyncio.run(main(parser.parse_args()))
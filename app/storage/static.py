@@ -0,0 +1,176 @@
+"""Раздача загруженных файлов (/uploads).
+
+Имена файлов уникальны и не переиспользуются (содержимое адресуется хэшем),
+поэтому ответы кэшируются навсегда: Cache-Control immutable и сильный ETag.
+Поддерживаются условные запросы (304), диапазоны (206) и передача файла
+без копирования через ASGI-расширения pathsend / zerocopysend. В режиме
+MEDIA_OFFLOAD байты отдает nginx или другой фронтовой сервер по заголовку
+X-Accel-Redirect / X-Sendfile.
+"""
+import mimetypes
+import os
+import re
+from email.utils import formatdate
+from typing import Optional, Tuple
+
+import anyio
+from fastapi.staticfiles import StaticFiles
+from starlette.datastructures import Headers
+from starlette.responses import Response
+from starlette.types import Receive, Scope, Send
+
+from app.settings.settings import settings
+
+READ_CHUNK_SIZE = 64 * 1024
+_HASH_NAME = re.compile(r"^[0-9a-f]{64}")
+_RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def media_url(file_name: Optional[str]) -> Optional[str]:
+    """Публичный URL загруженного файла."""
+    if not file_name:
+        return None
+    return f"{settings.MEDIA_BASE_URL}{file_name}"
+
+
+def _etag(file_name: str, stat_result: os.stat_result) -> str:
+    # Для файлов с хэшем содержимого в имени ETag не зависит от mtime,
+    # поэтому совпадает на всех серверах
+    if _HASH_NAME.match(file_name):
+        return f'"{file_name}"'
+    return f'"{stat_result.st_mtime_ns:x}-{stat_result.st_size:x}"'
+
+
+def _parse_range(value: str, size: int) -> Optional[Tuple[int, int]]:
+    """Один диапазон bytes=a-b -> (start, end) включительно.
+    Несколько диапазонов не поддерживаются: вернется None и весь файл."""
+    match = _RANGE.match(value.strip())
+    if not match:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        length = int(last)
+        if length == 0:
+            raise ValueError("empty suffix range")
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise ValueError("unsatisfiable range")
+    return start, end
+
+
+class MediaFileResponse(Response):
+    def __init__(
+        self,
+        path: str,
+        stat_result: os.stat_result,
+        headers: dict,
+        byte_range: Optional[Tuple[int, int]] = None,
+        method: str = "GET"
+    ):
+        size = stat_result.st_size
+        self.path = path
+        self.send_body = method != "HEAD"
+        if byte_range is None:
+            self.offset, self.count = 0, size
+            status_code = 200
+        else:
+            start, end = byte_range
+            self.offset, self.count = start, end - start + 1
+            status_code = 206
+            headers["content-range"] = f"bytes {start}-{end}/{size}"
+        headers["content-length"] = str(self.count)
+        super().__init__(status_code=status_code, headers=headers)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await send({
+            "type": "http.response.start",
+            "status": self.status_code,
+            "headers": self.raw_headers,
+        })
+        if not self.send_body:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+
+        extensions = scope.get("extensions") or {}
+        if "http.response.zerocopysend" in extensions:
+            with open(self.path, "rb") as file:
+                await send({
+                    "type": "http.response.zerocopysend",
+                    "file": file.fileno(),
+                    "offset": self.offset,
+                    "count": self.count,
+                })
+            return
+        if "http.response.pathsend" in extensions and self.offset == 0:
+            await send({"type": "http.response.pathsend", "path": self.path})
+            return
+
+        async with await anyio.open_file(self.path, mode="rb") as file:
+            await file.seek(self.offset)
+            remaining = self.count
+            while remaining > 0:
+                chunk = await file.read(min(READ_CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                await send({
+                    "type": "http.response.body",
+                    "body": chunk,
+                    "more_body": remaining > 0,
+                })
+        if remaining > 0 or self.count == 0:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+
+class MediaFiles(StaticFiles):
+    """StaticFiles с долгим кэшированием, диапазонами и выгрузкой на nginx."""
+
+    def file_response(
+        self,
+        full_path,
+        stat_result: os.stat_result,
+        scope: Scope,
+        status_code: int = 200,
+    ) -> Response:
+        full_path = str(full_path)
+        file_name = os.path.basename(full_path)
+        request_headers = Headers(scope=scope)
+        media_type = mimetypes.guess_type(file_name)[0] or "application/octet-stream"
+
+        etag = _etag(file_name, stat_result)
+        headers = {
+            "etag": etag,
+            "last-modified": formatdate(stat_result.st_mtime, usegmt=True),
+            "cache-control": f"public, max-age={settings.MEDIA_CACHE_MAX_AGE}, immutable",
+            "accept-ranges": "bytes",
+        }
+
+        if self.is_not_modified(Headers(headers), request_headers):
+            return Response(status_code=304, headers=headers)
+
+        offload = settings.MEDIA_OFFLOAD.lower()
+        if offload == "x-accel-redirect":
+            relative = os.path.relpath(full_path, os.path.realpath(self.directory))
+            headers["x-accel-redirect"] = settings.MEDIA_OFFLOAD_PREFIX + relative.replace(os.sep, "/")
+            return Response(headers=headers, media_type=media_type)
+        if offload == "x-sendfile":
+            headers["x-sendfile"] = full_path
+            return Response(headers=headers, media_type=media_type)
+
+        headers["content-type"] = media_type
+        byte_range = None
+        range_header = request_headers.get("range")
+        if_range = request_headers.get("if-range")
+        if range_header and (if_range is None or if_range == etag):
+            try:
+                byte_range = _parse_range(range_header, stat_result.st_size)
+            except ValueError:
+                return Response(
+                    status_code=416,
+                    headers={"content-range": f"bytes */{stat_result.st_size}"}
+                )
+        return MediaFileResponse(full_path, stat_result, headers, byte_range, scope["method"])
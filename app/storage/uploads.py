@@ -0,0 +1,125 @@
+import hashlib
+import os
+import tempfile
+from typing import Iterable, Optional
+from urllib.parse import urlparse
+from fastapi import UploadFile, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
+
+from app.settings.settings import settings
+
+# Расширения файлов по сигнатурам (magic bytes) первых байт содержимого
+IMAGE_EXTENSIONS = (".png", ".jpg", ".gif", ".webp")
+# Префикс временных файлов незавершенных загрузок
+TEMP_PREFIX = ".upload-"
+
+
+def _file_mode() -> int:
+    # os.umask можно только установить, поэтому читаем его один раз при импорте,
+    # пока не запущены потоки
+    umask = os.umask(0)
+    os.umask(umask)
+    return 0o644 & ~umask
+
+
+# mkstemp создает файл с правами 0600, а файлы отдает и веб-сервер (MEDIA_OFFLOAD),
+# который может работать от другого пользователя
+FILE_MODE = _file_mode()
+
+
+def detect_image_type(head: bytes) -> Optional[str]:
+    """Определяет формат изображения по первым байтам файла."""
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return ".png"
+    if head.startswith(b"\xff\xd8\xff"):
+        return ".jpg"
+    if head.startswith((b"GIF87a", b"GIF89a")):
+        return ".gif"
+    if len(head) >= 12 and head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return ".webp"
+    return None
+
+
+def image_name_from_url(url: Optional[str]) -> Optional[str]:
+    """Имя файла в каталоге загрузок для URL вида .../uploads/<имя>."""
+    if not url:
+        return None
+    if url.startswith(settings.MEDIA_BASE_URL):
+        return url[len(settings.MEDIA_BASE_URL):] or None
+    path = urlparse(url).path
+    if "/uploads/" not in path:
+        return None
+    return path.rsplit("/", 1)[-1] or None
+
+
+def _discard(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def _publish(tmp_path: str, final_path: str):
+    if os.path.exists(final_path):
+        # Такое содержимое уже хранится. Обновляем mtime, чтобы сборщик мусора
+        # не удалил файл, пока на него еще не записана ссылка в БД.
+        os.utime(final_path)
+        _discard(tmp_path)
+    else:
+        os.replace(tmp_path, final_path)
+
+
+async def save_upload(
+    file: UploadFile,
+    allowed: Iterable[str] = IMAGE_EXTENSIONS,
+    upload_dir: Optional[str] = None,
+    max_bytes: Optional[int] = None
+) -> str:
+    """Потоково сохраняет загруженное изображение и возвращает имя файла.
+
+    Файл читается кусками по UPLOAD_CHUNK_SIZE и пишется во временный файл
+    в потоке пула, так что в памяти держится не больше одного куска.
+    Размер проверяется по ходу записи, формат - по сигнатуре первого куска.
+    Имя файла - SHA-256 содержимого: повторная загрузка того же изображения
+    не создает копию, а готовый файл атомарно переименовывается в каталог загрузок.
+    """
+    upload_dir = upload_dir or settings.UPLOAD_DIR
+    max_bytes = max_bytes or settings.UPLOAD_MAX_BYTES
+    chunk_size = settings.UPLOAD_CHUNK_SIZE
+    os.makedirs(upload_dir, exist_ok=True)
+
+    chunk = await file.read(chunk_size)
+    file_ext = detect_image_type(chunk)
+    if file_ext is None or file_ext not in allowed:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Неподдерживаемый формат файла"
+        )
+
+    digest = hashlib.sha256()
+
+    def write(buffer, data: bytes):
+        buffer.write(data)
+        digest.update(data)
+
+    fd, tmp_path = tempfile.mkstemp(dir=upload_dir, prefix=TEMP_PREFIX, suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as buffer:
+            os.fchmod(buffer.fileno(), FILE_MODE)
+            written = 0
+            while chunk:
+                written += len(chunk)
+                if written > max_bytes:
+                    raise HTTPException(
+                        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                        detail=f"Файл больше {max_bytes} байт"
+                    )
+                await run_in_threadpool(write, buffer, chunk)
+                chunk = await file.read(chunk_size)
+
+        file_name = f"{digest.hexdigest()}{file_ext}"
+        await run_in_threadpool(_publish, tmp_path, os.path.join(upload_dir, file_name))
+        return file_name
+    except BaseException:
+        await run_in_threadpool(_discard, tmp_path)
+        raise
@@ -0,0 +1,214 @@
+"""Уменьшенные копии изображений (миниатюры и перекодированные версии).
+
+Варианты строятся в отдельном пуле процессов после сохранения строки с
+файлом, запрос их не ждет. Имя варианта выводится из имени оригинала:
+<hash>.png -> <hash>_thumb.webp, в БД хранится только отметка готовности
+(Platform.ImageVariantsReady, User.PhotoVariantsReady).
+
+Для уже загруженных файлов: python -m app.storage.variants
+"""
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional
+
+from app.settings.settings import settings
+from app.storage.uploads import IMAGE_EXTENSIONS, TEMP_PREFIX, image_name_from_url
+
+logger = logging.getLogger(__name__)
+
+_pool: Optional[ProcessPoolExecutor] = None
+# Ссылки на фоновые задачи, чтобы их не собрал сборщик мусора до завершения
+_tasks: set = set()
+
+
+def variant_name(file_name: str, variant: str) -> str:
+    stem = os.path.splitext(file_name)[0]
+    return f"{stem}_{variant}.{settings.IMAGE_VARIANT_FORMAT}"
+
+
+def is_variant(file_name: str) -> bool:
+    stem, ext = os.path.splitext(file_name)
+    return ext == f".{settings.IMAGE_VARIANT_FORMAT}" and any(
+        stem.endswith(f"_{variant}") for variant in settings.IMAGE_VARIANTS
+    )
+
+
+def original_stem(file_name: str) -> str:
+    """Имя оригинала без расширения для файла варианта."""
+    return os.path.splitext(file_name)[0].rsplit("_", 1)[0]
+
+
+def variant_urls(file_name: Optional[str], ready: bool, base_url: Optional[str] = None) -> Optional[Dict[str, str]]:
+    """URL всех вариантов изображения.
+
+    ready - отметка строки (Platform.ImageVariantsReady, User.PhotoVariantsReady),
+    которую ставит mark_ready после построения. Пока вариантов нет, каждый
+    вариант указывает на оригинал. Файлы при ответе не проверяются.
+    """
+    if not file_name or not settings.IMAGE_VARIANTS_ENABLED:
+        return None
+    base_url = base_url or settings.MEDIA_BASE_URL
+    if not ready:
+        original = f"{base_url}{file_name}"
+        return {variant: original for variant in settings.IMAGE_VARIANTS}
+    # Вызывается на каждую строку списков, поэтому имя разбирается один раз
+    prefix = f"{base_url}{os.path.splitext(file_name)[0]}_"
+    suffix = f".{settings.IMAGE_VARIANT_FORMAT}"
+    return {variant: f"{prefix}{variant}{suffix}" for variant in settings.IMAGE_VARIANTS}
+
+
+def variant_urls_for_url(url: Optional[str], ready: bool) -> Optional[Dict[str, str]]:
+    """URL вариантов для полного URL оригинала (User.PhotoURL)."""
+    file_name = image_name_from_url(url)
+    if not file_name:
+        return None
+    return variant_urls(file_name, ready, url[:url.rfind("/") + 1])
+
+
+def render_variants(path: str, variants: Dict[str, int], fmt: str, quality: int) -> List[str]:
+    """Строит недостающие варианты файла. Выполняется в дочернем процессе."""
+    from PIL import Image, ImageOps
+
+    out_dir, file_name = os.path.split(path)
+    stem = os.path.splitext(file_name)[0]
+    targets = {
+        variant: os.path.join(out_dir, f"{stem}_{variant}.{fmt}")
+        for variant in variants
+    }
+    missing = {variant: target for variant, target in targets.items() if not os.path.exists(target)}
+    if not missing:
+        return []
+
+    created = []
+    with Image.open(path) as source:
+        source = ImageOps.exif_transpose(source)
+        mode = "RGBA" if fmt == "webp" and source.mode in ("RGBA", "LA", "P") else "RGB"
+        source = source.convert(mode)
+        for variant, target in missing.items():
+            image = source.copy()
+            size = variants[variant]
+            if size:
+                image.thumbnail((size, size))
+            tmp_target = os.path.join(out_dir, f"{TEMP_PREFIX}{stem}_{variant}.part")
+            image.save(tmp_target, format="WEBP" if fmt == "webp" else "JPEG", quality=quality)
+            os.replace(tmp_target, target)
+            created.append(os.path.basename(target))
+    return created
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        # spawn вместо fork: в родительском процессе уже работают пулы потоков
+        _pool = ProcessPoolExecutor(
+            max_workers=settings.IMAGE_VARIANT_WORKERS,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    return _pool
+
+
+async def build_variants(file_name: str) -> List[str]:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        _get_pool(),
+        render_variants,
+        os.path.join(settings.UPLOAD_DIR, file_name),
+        settings.IMAGE_VARIANTS,
+        settings.IMAGE_VARIANT_FORMAT,
+        settings.IMAGE_VARIANT_QUALITY,
+    )
+
+
+async def mark_ready(file_names: List[str]):
+    """Отмечает площадки и пользователей с этими файлами: варианты построены.
+
+    UPDATE меняет и UpdatedAt, поэтому у строк меняются ETag, а каталог
+    площадок перечитывает их по NOTIFY или при сверке.
+    """
+    from app.database.database import get_session_factory
+    from app.service.image_service.image_service import ImageService
+    from app.service.user_service.user_service import UserService
+
+    async with get_session_factory()() as session:
+        users = await ImageService(session).mark_variants_ready(file_names)
+        await session.commit()
+    await UserService.invalidate(*users)
+
+
+def schedule_variants(file_name: str):
+    """Запускает построение вариантов в фоне, не дожидаясь результата.
+
+    Вызывается после commit строки, ссылающейся на файл: иначе отметка
+    готовности может опередить саму строку.
+    """
+    if not settings.IMAGE_VARIANTS_ENABLED:
+        return
+
+    async def run():
+        try:
+            await build_variants(file_name)
+            await mark_ready([file_name])
+        except Exception:
+            logger.exception("Не удалось построить варианты для %s", file_name)
+
+    task = asyncio.get_running_loop().create_task(run())
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
+
+
+def schedule_variants_for_url(url: Optional[str]):
+    """schedule_variants для полного URL; внешние URL пропускаются."""
+    if url and url.startswith(settings.MEDIA_BASE_URL):
+        schedule_variants(url[len(settings.MEDIA_BASE_URL):])
+
+
+def shutdown_variant_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+    _pool = None
+
+
+async def backfill() -> int:
+    """Строит варианты для всех оригиналов в каталоге загрузок и отмечает их готовность."""
+    names = [
+        entry.name for entry in os.scandir(settings.UPLOAD_DIR)
+        if entry.is_file()
+        and not entry.name.startswith(TEMP_PREFIX)
+        and os.path.splitext(entry.name)[1] in IMAGE_EXTENSIONS
+        and not is_variant(entry.name)
+    ]
+    created = 0
+    ready = []
+    try:
+        results = await asyncio.gather(
+            *(build_variants(name) for name in names), return_exceptions=True
+        )
+        for name, result in zip(names, results):
+            if isinstance(result, Exception):
+                logger.error("Не удалось построить варианты для %s: %s", name, result)
+            else:
+                created += len(result)
+                ready.append(name)
+        await mark_ready(ready)
+    finally:
+        shutdown_variant_pool()
+    return created
+
+
+async def main() -> int:
+    from app.database.database import dispose_engine
+
+    try:
+        return await backfill()
+    finally:
+        await dispose_engine()
+
+
+if __name__ == "__main__":
+    argparse.ArgumentParser(description="Построение вариантов для загруженных изображений").parse_args()
+    print(f"Создано вариантов: {asyncio.run(main())}")
@@ -0,0 +1,89 @@
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any, Iterable, Optional, Tuple
+from fastapi import Request, Response
+
+# Клиент может хранить ответ, но перед использованием обязан перепроверить его
+CACHE_CONTROL = "no-cache"
+
+
+def make_etag(*parts: Any) -> str:
+    """Слабый ETag из версии данных.
+
+    Слабый, потому что тело зависит еще и от настроек (URL медиа и т.п.),
+    а сравнивается только версия строк.
+    """
+    digest = hashlib.sha1("|".join(map(str, parts)).encode("utf-8")).hexdigest()
+    return f'W/"{digest}"'
+
+
+def rows_version(rows: Iterable[Any], id_field: str) -> Tuple[int, int, float]:
+    """Версия набора строк для ETag: число, сумма ID и сумма UpdatedAt.
+
+    Для встроенных связей (?include=): изменение любой строки меняет сумму
+    времени, удаление или добавление - число и сумму ID.
+    """
+    count, id_sum, updated_sum = 0, 0, 0.0
+    for row in rows:
+        count += 1
+        id_sum += getattr(row, id_field)
+        updated_sum += row.UpdatedAt.timestamp()
+    return count, id_sum, round(updated_sum, 6)
+
+
+def http_date(value: datetime) -> str:
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return format_datetime(value.astimezone(timezone.utc), usegmt=True)
+
+
+def _opaque(tag: str) -> str:
+    tag = tag.strip()
+    return tag[2:] if tag.startswith("W/") else tag
+
+
+def is_not_modified(request: Request, etag: str, last_modified: Optional[datetime] = None) -> bool:
+    """Проверка If-None-Match / If-Modified-Since (RFC 9110, 13.1.2-13.1.3).
+
+    If-None-Match сравнивается слабо и имеет приоритет: If-Modified-Since
+    учитывается, только если его нет.
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        if if_none_match.strip() == "*":
+            return True
+        return _opaque(etag) in {_opaque(tag) for tag in if_none_match.split(",")}
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        if last_modified.tzinfo is None:
+            last_modified = last_modified.replace(tzinfo=timezone.utc)
+        # В HTTP-дате нет долей секунды
+        return last_modified.replace(microsecond=0) <= since
+    return False
+
+
+def conditional_response(
+    request: Request,
+    response: Response,
+    etag: str,
+    last_modified: Optional[datetime] = None
+) -> Optional[Response]:
+    """Проставляет валидаторы в ответ и возвращает 304, если у клиента актуальная копия.
+
+    Если вернулся None, обработчик формирует тело как обычно.
+    """
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+    if last_modified is not None:
+        headers["Last-Modified"] = http_date(last_modified)
+    if is_not_modified(request, etag, last_modified):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
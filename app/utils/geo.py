@@ -0,0 +1,97 @@
+import math
+from typing import List, Optional, Tuple
+
+EARTH_RADIUS_KM = 6371.0088
+
+# Число бит на ось в ячейке GeoHash: 26 + 26 бит дают точность около 30 см
+GEOHASH_BITS = 26
+# Сколько ячеек одного уровня максимум покрывают область поиска
+MAX_COVER_CELLS = 16
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Расстояние между двумя точками по большому кругу, км."""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlmb = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlmb / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def _lat_index(lat: float, bits: int) -> int:
+    n = 1 << bits
+    return min(n - 1, max(0, int((lat + 90.0) / 180.0 * n)))
+
+
+def _lon_index(lon: float, bits: int) -> int:
+    n = 1 << bits
+    return min(n - 1, max(0, int((lon + 180.0) / 360.0 * n)))
+
+
+def _interleave(lat_idx: int, lon_idx: int, bits: int) -> int:
+    # Порядок бит как у geohash: сначала долгота, затем широта
+    code = 0
+    for i in range(bits - 1, -1, -1):
+        code = (code << 2) | (((lon_idx >> i) & 1) << 1) | ((lat_idx >> i) & 1)
+    return code
+
+
+def encode_geohash(lat: Optional[float], lon: Optional[float]) -> Optional[int]:
+    """Целочисленный geohash (Z-order) точки. Соседние точки имеют близкие коды,
+    а любая ячейка уровня L занимает непрерывный диапазон кодов."""
+    if lat is None or lon is None:
+        return None
+    return _interleave(_lat_index(lat, GEOHASH_BITS), _lon_index(lon, GEOHASH_BITS), GEOHASH_BITS)
+
+
+def _bounding_box(lat: float, lon: float, radius_km: float) -> Tuple[float, float, List[Tuple[float, float]]]:
+    """Границы области, гарантированно содержащей круг радиуса radius_km.
+    Долгота может распадаться на два отрезка при переходе через 180-й меридиан."""
+    r = radius_km / EARTH_RADIUS_KM
+    dlat = math.degrees(r)
+    lat_min, lat_max = lat - dlat, lat + dlat
+    if lat_min <= -90.0 or lat_max >= 90.0 or math.sin(r) >= math.cos(math.radians(lat)):
+        # В круг попадает полюс: подходит любая долгота
+        return max(lat_min, -90.0), min(lat_max, 90.0), [(-180.0, 180.0)]
+
+    dlon = math.degrees(math.asin(math.sin(r) / math.cos(math.radians(lat))))
+    # Небольшой запас на погрешность вычислений с плавающей точкой
+    dlon += 1e-9
+    lon_min, lon_max = lon - dlon, lon + dlon
+    if lon_min < -180.0:
+        return lat_min, lat_max, [(lon_min + 360.0, 180.0), (-180.0, lon_max)]
+    if lon_max > 180.0:
+        return lat_min, lat_max, [(lon_min, 180.0), (-180.0, lon_max - 360.0)]
+    return lat_min, lat_max, [(lon_min, lon_max)]
+
+
+def covering_ranges(lat: float, lon: float, radius_km: float) -> List[Tuple[int, int]]:
+    """Диапазоны кодов [lo, hi), которые покрывают круг поиска.
+    Уровень ячеек выбирается самым мелким, при котором ячеек не больше MAX_COVER_CELLS."""
+    lat_min, lat_max, lon_spans = _bounding_box(lat, lon, radius_km)
+
+    for level in range(GEOHASH_BITS, -1, -1):
+        lat_cells = range(_lat_index(lat_min, level), _lat_index(lat_max, level) + 1)
+        lon_spans_idx = [(_lon_index(lo, level), _lon_index(hi, level)) for lo, hi in lon_spans]
+        # Ячейки считаем по длинам отрезков, не перечисляя их: на мелких уровнях их миллионы
+        lon_count = sum(hi - lo + 1 for lo, hi in lon_spans_idx)
+        if len(lat_cells) * lon_count <= MAX_COVER_CELLS or level == 0:
+            break
+
+    lon_cells = set()
+    for lo, hi in lon_spans_idx:
+        lon_cells.update(range(lo, hi + 1))
+
+    shift = 2 * (GEOHASH_BITS - level)
+    prefixes = sorted(
+        _interleave(lat_idx, lon_idx, level) for lat_idx in lat_cells for lon_idx in lon_cells
+    )
+
+    ranges: List[Tuple[int, int]] = []
+    for prefix in prefixes:
+        lo, hi = prefix << shift, (prefix + 1) << shift
+        if ranges and ranges[-1][1] == lo:
+            ranges[-1] = (ranges[-1][0], hi)
+        else:
+            ranges.append((lo, hi))
+    return ranges
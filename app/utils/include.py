@@ -0,0 +1,29 @@
+from typing import FrozenSet, Iterable, Optional
+from fastapi import HTTPException, Query, status
+
+# Описание параметра для OpenAPI, допустимые значения перечисляет обработчик
+INCLUDE_DESCRIPTION = "Связанные объекты, встраиваемые в ответ, через запятую"
+
+
+def include_query(*allowed: str):
+    """Параметр ?include= для Depends: множество имен связей из allowed."""
+    description = f"{INCLUDE_DESCRIPTION}: {', '.join(allowed)}"
+
+    def dependency(include: Optional[str] = Query(None, description=description)) -> FrozenSet[str]:
+        return parse_include(include, allowed)
+
+    return dependency
+
+
+def parse_include(value: Optional[str], allowed: Iterable[str]) -> FrozenSet[str]:
+    """Разбирает "a,b" в множество имен; неизвестное имя - ответ 400."""
+    if not value:
+        return frozenset()
+    names = frozenset(name.strip() for name in value.split(",") if name.strip())
+    unknown = names - set(allowed)
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Нельзя встроить: {', '.join(sorted(unknown))}. Доступно: {', '.join(allowed)}"
+        )
+    return names
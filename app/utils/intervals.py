@@ -0,0 +1,46 @@
+from datetime import datetime, timedelta
+from typing import Iterable, List, Tuple
+
+Interval = Tuple[datetime, datetime]
+
+
+def merge_busy(intervals: Iterable[Interval], start: datetime, end: datetime) -> List[Interval]:
+    """Склеивает занятые интервалы, отсортированные по началу, и обрезает их по окну.
+    Один проход по списку."""
+    merged: List[Interval] = []
+    for lo, hi in intervals:
+        lo, hi = max(lo, start), min(hi, end)
+        if lo >= hi:
+            continue
+        if merged and lo <= merged[-1][1]:
+            if hi > merged[-1][1]:
+                merged[-1] = (merged[-1][0], hi)
+        else:
+            merged.append((lo, hi))
+    return merged
+
+
+def free_intervals(busy: List[Interval], start: datetime, end: datetime) -> List[Interval]:
+    """Промежутки окна [start, end) между склеенными занятыми интервалами."""
+    free: List[Interval] = []
+    cursor = start
+    for lo, hi in busy:
+        if lo > cursor:
+            free.append((cursor, lo))
+        cursor = max(cursor, hi)
+    if cursor < end:
+        free.append((cursor, end))
+    return free
+
+
+def slot_starts(free: List[Interval], start: datetime, step: timedelta) -> List[datetime]:
+    """Начала слотов длиной step по сетке от начала окна, целиком попадающих в свободные промежутки."""
+    starts: List[datetime] = []
+    for lo, hi in free:
+        # Первая точка сетки не раньше начала промежутка
+        offset = -((start - lo) // step)
+        moment = start + offset * step
+        while moment + step <= hi:
+            starts.append(moment)
+            moment += step
+    return starts
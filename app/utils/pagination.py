@@ -0,0 +1,44 @@
+import base64
+import json
+from typing import Optional
+from fastapi import HTTPException, Request, Response, status
+
+# Размер страницы по умолчанию и верхняя граница для параметра limit
+DEFAULT_PAGE_LIMIT = 50
+MAX_PAGE_LIMIT = 500
+# Тело списка - JSON-массив, как до постраничного вывода; курсор следующей
+# страницы передается заголовками (нет заголовков - страниц больше нет)
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(last_id: int) -> str:
+    """Упаковывает ID последней записи страницы в непрозрачный курсор."""
+    raw = json.dumps({"id": last_id}, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[int]:
+    """Возвращает ID, после которого начинается следующая страница."""
+    if not cursor:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        last_id = data["id"]
+        if not isinstance(last_id, int):
+            raise ValueError(last_id)
+        return last_id
+    except Exception:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Некорректный курсор"
+        )
+
+
+def set_next_cursor(request: Request, response: Response, next_id: Optional[int]):
+    """Курсор следующей страницы в X-Next-Cursor и Link: <url>; rel="next"."""
+    if next_id is None:
+        return
+    cursor = encode_cursor(next_id)
+    response.headers[NEXT_CURSOR_HEADER] = cursor
+    response.headers["Link"] = f'<{request.url.include_query_params(cursor=cursor)}>; rel="next"'
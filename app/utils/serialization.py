@@ -0,0 +1,58 @@
+from typing import Any, Callable, Generic, Iterable, List, Optional, Type, TypeVar
+from fastapi import Response
+from fastapi.responses import JSONResponse, ORJSONResponse
+from pydantic import BaseModel, TypeAdapter
+from app.settings.settings import settings
+
+try:
+    import orjson
+except ImportError:
+    # Без orjson остается стандартный JSONResponse
+    orjson = None
+
+JSON_MEDIA_TYPE = "application/json"
+
+Schema = TypeVar("Schema", bound=BaseModel)
+
+
+def default_response_class() -> type:
+    """Класс ответа по умолчанию для приложения: orjson, если включен и установлен."""
+    if settings.FAST_JSON and orjson is not None:
+        return ORJSONResponse
+    return JSONResponse
+
+
+class SchemaMapper(Generic[Schema]):
+    """Преобразование строк ORM в схемы ответа пачкой.
+
+    Весь список проверяется одним вызовом TypeAdapter(List[schema]) с
+    from_attributes, а не моделью на каждую строку. prepare превращает
+    строку в dict, если часть полей вычисляется (URL изображений и т.п.).
+    """
+
+    def __init__(self, schema: Type[Schema], prepare: Optional[Callable[[Any], Any]] = None):
+        self.schema = schema
+        self.prepare = prepare
+        self._list = TypeAdapter(List[schema])
+
+    def many(self, rows: Iterable[Any]) -> List[Schema]:
+        if self.prepare is not None:
+            rows = map(self.prepare, rows)
+        return self._list.validate_python(list(rows), from_attributes=True)
+
+    def dump_json(self, items: List[Schema], **options) -> bytes:
+        return self._list.dump_json(items, **options)
+
+
+def json_response(content: bytes, response: Optional[Response] = None) -> Response:
+    """Ответ из уже проверенных и сериализованных данных.
+
+    FastAPI не прогоняет такой ответ через response_model второй раз.
+    Заголовки, выставленные обработчиком через параметр response (ETag и т.п.),
+    переносятся в ответ.
+    """
+    result = Response(content=content, media_type=JSON_MEDIA_TYPE)
+    if response is not None:
+        for name, value in response.headers.items():
+            result.headers[name] = value
+    return result
@@ -0,0 +1,29 @@
+from typing import Any, AsyncIterator, Callable
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+# Сколько строк читается с серверного курсора и отправляется клиенту за раз
+STREAM_CHUNK_ROWS = 500
+
+
+def wants_stream(request: Request, stream: bool) -> bool:
+    """Потоковый режим включается параметром ?stream=1 или заголовком Accept."""
+    return stream or NDJSON_MEDIA_TYPE in request.headers.get("accept", "")
+
+
+def ndjson_response(rows: AsyncIterator[Any], serialize: Callable[[Any], bytes]) -> StreamingResponse:
+    """Отдает строки по мере чтения, по одному JSON-объекту на строку.
+    В памяти одновременно находится не больше STREAM_CHUNK_ROWS записей."""
+    async def body():
+        chunk = []
+        async for row in rows:
+            chunk.append(serialize(row))
+            chunk.append(b"\n")
+            if len(chunk) >= 2 * STREAM_CHUNK_ROWS:
+                yield b"".join(chunk)
+                chunk = []
+        if chunk:
+            yield b"".join(chunk)
+
+    return StreamingResponse(body(), media_type=NDJSON_MEDIA_TYPE)
@@ -0,0 +1,95 @@
+import re
+from bisect import bisect_left
+from collections import defaultdict
+from typing import Dict, Hashable, Iterable, List, Optional, Tuple
+
+try:
+    import snowballstemmer
+except ImportError:  # без стеммера слова сравниваются как есть, с поиском по префиксу
+    snowballstemmer = None
+
+# Веса полей как у setweight в Postgres: A - название, B - город и адрес, C - описание
+WEIGHTS = {"A": 1.0, "B": 0.4, "C": 0.2}
+
+_WORD = re.compile(r"\w+")
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    """Слова строки в нижнем регистре, ё приводится к е."""
+    if not text:
+        return []
+    return _WORD.findall(text.lower().replace("ё", "е"))
+
+
+def prefix_tsquery(words: List[str], weights: str = "") -> str:
+    """Строка для to_tsquery: все слова обязательны, последнее - префикс.
+
+    Слова берутся из tokenize, служебных символов tsquery в них нет.
+    weights ограничивает поиск частями документа ("A" - только название).
+    """
+    terms = [f"{word}:{weights}" if weights else word for word in words[:-1]]
+    terms.append(f"{words[-1]}:*{weights}")
+    return " & ".join(terms)
+
+
+class TextIndex:
+    """Инвертированный индекс в памяти процесса.
+
+    Используется вместо tsvector, когда база не Postgres. Документ - набор
+    полей с весами A/B/C, ключ документа - любой hashable (например, ("platform", 7)).
+    Поиск повторяет prefix_tsquery: все слова запроса обязательны, последнее
+    ищется как префикс основы. Список основ отсортирован, префикс находится
+    бинарным поиском.
+    """
+
+    def __init__(self, language: str = "russian"):
+        self._stem = snowballstemmer.stemmer(language).stemWord if snowballstemmer else (lambda word: word)
+        self._postings: Dict[str, Dict[Hashable, Dict[str, float]]] = defaultdict(dict)
+        self._terms: Optional[List[str]] = None
+        self.documents: Dict[Hashable, dict] = {}
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+    def add(self, key: Hashable, fields: Iterable[Tuple[str, Optional[str]]], payload: dict):
+        """fields - пары (вес, текст), payload возвращается в результатах поиска."""
+        self.documents[key] = payload
+        for weight, text in fields:
+            for word in tokenize(text):
+                scores = self._postings[self._stem(word)].setdefault(key, {})
+                scores[weight] = scores.get(weight, 0.0) + WEIGHTS[weight]
+        self._terms = None
+
+    def _matches(self, term: str, weights: str, prefix: bool) -> Dict[Hashable, float]:
+        if prefix:
+            if self._terms is None:
+                self._terms = sorted(self._postings)
+            stems = []
+            i = bisect_left(self._terms, term)
+            while i < len(self._terms) and self._terms[i].startswith(term):
+                stems.append(self._terms[i])
+                i += 1
+        else:
+            stems = [term] if term in self._postings else []
+        found: Dict[Hashable, float] = {}
+        for stem in stems:
+            for key, scores in self._postings[stem].items():
+                score = sum(value for weight, value in scores.items() if not weights or weight in weights)
+                if score:
+                    found[key] = max(found.get(key, 0.0), score)
+        return found
+
+    def search(self, words: List[str], weights: str = "") -> List[Tuple[Hashable, float]]:
+        """Документы со всеми словами, по убыванию суммарного веса."""
+        if not words:
+            return []
+        result: Optional[Dict[Hashable, float]] = None
+        for i, word in enumerate(words):
+            found = self._matches(self._stem(word), weights, prefix=i == len(words) - 1)
+            if result is None:
+                result = found
+            else:
+                result = {key: score + found[key] for key, score in result.items() if key in found}
+            if not result:
+                return []
+        return sorted(result.items(), key=lambda item: -item[1])
@@ -0,0 +1,236 @@
+"""Синтетические данные для нагрузочных тестов.
+
+Запуск: python -m benchmarks.datagen [--users N] [--platforms N] [--events N] [--seed N] [--clean]
+
+Заполняет базу из настроек (Postgres или, через DATABASE_URL, SQLite; для
+SQLite схема создается по моделям). Площадки разбросаны вокруг центров
+реальных городов, у каждой адрес и geohash. События раскладываются по
+площадкам слотами по полтора часа с 8 до 22, без пересечений, поэтому
+exclusion-констрейнт не мешает и при миллионах событий. В Postgres события
+генерируются на стороне сервера (generate_series), в других базах - пачками.
+
+Все пользователи получают пароль PASSWORD, логины TAG_<n>. Сгенерированные
+строки помечены TAG (логин пользователя, префикс названия площадки), --clean
+удаляет их вместе с событиями. Одинаковый --seed дает одинаковые данные.
+"""
+import argparse
+import asyncio
+import math
+import random
+import sys
+import time
+from datetime import date, datetime, time as dtime, timedelta
+from typing import List, Tuple
+
+from sqlalchemy import insert, select, delete, func, or_, text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from app.database.database import get_engine, dispose_engine
+from app.models.models import Base, User, Platform, Event
+from app.security.hasher import hash_password, calibrate_rounds
+from app.utils.geo import encode_geohash
+
+TAG = "loadtest"
+PASSWORD = "loadtest-password"
+PLATFORM_PREFIX = f"[{TAG}] "
+EVENTS_START = date(2030, 1, 1)
+# Слоты дня: начало в 8:00, шаг 2 часа, длительность 1,5 часа
+SLOT_START_HOUR = 8
+SLOTS_PER_DAY = 7
+BATCH_ROWS = 10000
+
+# Город, широта и долгота центра, примерная доля площадок
+CITIES = (
+    ("Москва", 55.7558, 37.6173, 30), ("Санкт-Петербург", 59.9343, 30.3351, 15),
+    ("Новосибирск", 55.0084, 82.9357, 6), ("Екатеринбург", 56.8389, 60.6057, 6),
+    ("Казань", 55.7961, 49.1064, 5), ("Нижний Новгород", 56.2965, 43.9361, 5),
+    ("Челябинск", 55.1644, 61.4368, 4), ("Самара", 53.1959, 50.1002, 4),
+    ("Омск", 54.9885, 73.3242, 4), ("Ростов-на-Дону", 47.2357, 39.7015, 4),
+    ("Уфа", 54.7388, 55.9721, 4), ("Красноярск", 56.0153, 92.8932, 4),
+    ("Воронеж", 51.6615, 39.2003, 3), ("Пермь", 58.0105, 56.2502, 3),
+    ("Волгоград", 48.7080, 44.5133, 3),
+)
+STREETS = (
+    "ул. Ленина", "ул. Гагарина", "ул. Мира", "пр. Победы", "ул. Советская", "ул. Садовая",
+    "ул. Молодежная", "ул. Школьная", "Спортивная ул.", "наб. Реки", "ул. Лесная", "Парковая ул.",
+)
+PLATFORM_KINDS = (
+    "Футбольное поле", "Баскетбольная площадка", "Теннисный корт", "Волейбольная площадка",
+    "Хоккейная коробка", "Стадион", "Спортивный комплекс", "Воркаут-площадка",
+)
+PLATFORM_NAMES = ("Спартак", "Динамо", "Олимп", "Факел", "Юность", "Заря", "Чайка", "Звезда", "Торпедо", "Локомотив")
+EVENT_NAMES = ("Турнир", "Тренировка", "Товарищеский матч", "Открытая игра", "Мастер-класс", "Кубок района", "Лига выходного дня")
+FIRST_NAMES = ("Александр", "Мария", "Дмитрий", "Анна", "Иван", "Елена", "Сергей", "Ольга", "Никита", "Дарья")
+SURNAMES = ("Иванов", "Смирнов", "Кузнецов", "Попов", "Васильев", "Петров", "Соколов", "Михайлов")
+
+
+def _city_weights() -> Tuple[List[str], List[float]]:
+    return [city[0] for city in CITIES], [city[3] for city in CITIES]
+
+
+def user_rows(count: int, rng: random.Random, password_hash: str) -> List[dict]:
+    names, weights = _city_weights()
+    cities = rng.choices(names, weights, k=count)
+    return [
+        {
+            "Login": f"{TAG}_{i}", "Email": f"{TAG}_{i}@example.com", "PasswordHash": password_hash,
+            "Name": rng.choice(FIRST_NAMES), "Surname": rng.choice(SURNAMES), "City": cities[i],
+            "Phone": f"+79{rng.randrange(10 ** 9):09d}",
+        }
+        for i in range(count)
+    ]
+
+
+def platform_rows(count: int, rng: random.Random) -> List[dict]:
+    rows = []
+    for i in range(count):
+        city, lat0, lon0, _ = rng.choices(CITIES, [c[3] for c in CITIES])[0]
+        # До ~10 км от центра, плотнее к центру
+        distance_km = abs(rng.gauss(0, 4))
+        bearing = rng.uniform(0, 2 * math.pi)
+        lat = lat0 + distance_km / 111.0 * math.cos(bearing)
+        lon = lon0 + distance_km / (111.0 * math.cos(math.radians(lat0))) * math.sin(bearing)
+        rows.append({
+            "Name": f"{PLATFORM_PREFIX}{rng.choice(PLATFORM_KINDS)} {rng.choice(PLATFORM_NAMES)}",
+            "City": city, "Address": f"{rng.choice(STREETS)}, {rng.randint(1, 150)}",
+            "Latitude": round(lat, 6), "Longitude": round(lon, 6), "GeoHash": encode_geohash(lat, lon),
+        })
+    return rows
+
+
+def event_row(g: int, platforms: List[Tuple[int, str, str]], user_ids: List[int]) -> dict:
+    """g-е событие: площадка g % P, затем по слотам дня подряд, без пересечений."""
+    platform_id, city, address = platforms[g % len(platforms)]
+    k = g // len(platforms)
+    day = datetime.combine(EVENTS_START + timedelta(days=k // SLOTS_PER_DAY), dtime())
+    hour = SLOT_START_HOUR + 2 * (k % SLOTS_PER_DAY)
+    return {
+        "UserID": user_ids[(g * 7919) % len(user_ids)], "PlatformID": platform_id,
+        "Name": EVENT_NAMES[g % len(EVENT_NAMES)], "City": city, "Address": address,
+        "DateStart": day, "DateEnd": day,
+        "TimeStart": dtime(hour, 0), "TimeEnd": dtime(hour + 1, 30),
+        "Description": f"{EVENT_NAMES[g % len(EVENT_NAMES)]} на площадке №{platform_id}",
+    }
+
+
+# Тот же расклад, что в event_row, одним INSERT ... SELECT
+_EVENTS_SQL = """
+    INSERT INTO "Events" ("UserID", "PlatformID", "Name", "City", "Address",
+                          "DateStart", "DateEnd", "TimeStart", "TimeEnd", "Description")
+    WITH params AS (
+        SELECT CAST(:slots AS integer) slots, CAST(:first_hour AS integer) first_hour
+    )
+    SELECT u.ids[(g::bigint * 7919) % cardinality(u.ids) + 1],
+           p.ids[g % cardinality(p.ids) + 1],
+           n.names[g % cardinality(n.names) + 1],
+           p.cities[g % cardinality(p.ids) + 1],
+           p.addresses[g % cardinality(p.ids) + 1],
+           CAST(:start AS timestamp) + ((g / cardinality(p.ids)) / params.slots) * interval '1 day',
+           CAST(:start AS timestamp) + ((g / cardinality(p.ids)) / params.slots) * interval '1 day',
+           time '00:00' + (params.first_hour + 2 * ((g / cardinality(p.ids)) % params.slots)) * interval '1 hour',
+           time '00:00' + (params.first_hour + 2 * ((g / cardinality(p.ids)) % params.slots)) * interval '1 hour' + interval '90 minutes',
+           n.names[g % cardinality(n.names) + 1] || ' на площадке №' || p.ids[g % cardinality(p.ids) + 1]
+    FROM generate_series(CAST(:first AS integer), CAST(:last AS integer)) g, params,
+         (SELECT array_agg("PlatformID" ORDER BY "PlatformID") ids,
+                 array_agg("City" ORDER BY "PlatformID") cities,
+                 array_agg("Address" ORDER BY "PlatformID") addresses
+          FROM "Platforms" WHERE "Name" LIKE :prefix) p,
+         (SELECT array_agg("UserID" ORDER BY "UserID") ids FROM "Users" WHERE "Login" LIKE :login) u,
+         (SELECT CAST(:names AS text[]) names) n
+"""
+
+
+def _tagged_users():
+    return User.Login.startswith(f"{TAG}_", autoescape=True)
+
+
+def _tagged_platforms():
+    return Platform.Name.startswith(PLATFORM_PREFIX, autoescape=True)
+
+
+async def clean(conn: AsyncConnection):
+    user_ids = select(User.UserID).where(_tagged_users()).scalar_subquery()
+    platform_ids = select(Platform.PlatformID).where(_tagged_platforms()).scalar_subquery()
+    await conn.execute(delete(Event).where(or_(Event.UserID.in_(user_ids), Event.PlatformID.in_(platform_ids))))
+    await conn.execute(delete(Platform).where(_tagged_platforms()))
+    await conn.execute(delete(User).where(_tagged_users()))
+
+
+async def _insert_batches(conn: AsyncConnection, table, rows: List[dict]):
+    for start in range(0, len(rows), BATCH_ROWS):
+        await conn.execute(insert(table), rows[start:start + BATCH_ROWS])
+
+
+async def generate(conn: AsyncConnection, users: int, platforms: int, events: int, seed: int):
+    rng = random.Random(seed)
+    started = time.perf_counter()
+    # Один хэш на всех: иначе bcrypt займет больше времени, чем вставка. Стоимость
+    # та же, что подберет приложение, иначе первый вход каждого пересчитает хэш
+    calibrate_rounds()
+    await _insert_batches(conn, User, user_rows(users, rng, hash_password(PASSWORD)))
+    await _insert_batches(conn, Platform, platform_rows(platforms, rng))
+    print(f"пользователи и площадки: {time.perf_counter() - started:.1f} с")
+
+    started = time.perf_counter()
+    if conn.dialect.name == "postgresql":
+        step = 1_000_000
+        for first in range(0, events, step):
+            await conn.execute(text(_EVENTS_SQL), {
+                "first": first, "last": min(first + step, events) - 1,
+                "start": EVENTS_START, "slots": SLOTS_PER_DAY, "first_hour": SLOT_START_HOUR,
+                "prefix": PLATFORM_PREFIX + "%", "login": f"{TAG}\\_%", "names": list(EVENT_NAMES),
+            })
+    else:
+        result = await conn.execute(
+            select(Platform.PlatformID, Platform.City, Platform.Address)
+            .where(_tagged_platforms()).order_by(Platform.PlatformID)
+        )
+        platform_list = [tuple(row) for row in result]
+        user_ids = list((await conn.execute(
+            select(User.UserID).where(_tagged_users()).order_by(User.UserID)
+        )).scalars())
+        for first in range(0, events, BATCH_ROWS):
+            rows = [event_row(g, platform_list, user_ids) for g in range(first, min(first + BATCH_ROWS, events))]
+            await conn.execute(insert(Event), rows)
+    print(f"события: {time.perf_counter() - started:.1f} с")
+
+
+async def main(args: argparse.Namespace) -> int:
+    engine = get_engine()
+    try:
+        async with engine.begin() as conn:
+            if conn.dialect.name != "postgresql":
+                # Миграции написаны под Postgres, для SQLite схема берется из моделей
+                await conn.run_sync(Base.metadata.create_all)
+            await clean(conn)
+            if args.clean:
+                print("сгенерированные данные удалены")
+                return 0
+            if args.events and not args.platforms:
+                raise SystemExit("для событий нужны площадки (--platforms)")
+            if args.events and not args.users:
+                raise SystemExit("для событий нужны пользователи (--users)")
+            await generate(conn, args.users, args.platforms, args.events, args.seed)
+        if engine.dialect.name == "postgresql":
+            async with engine.connect() as conn:
+                await conn.execute(text('ANALYZE "Users", "Platforms", "Events"'))
+        async with engine.connect() as conn:
+            counts = (await conn.execute(select(
+                select(func.count()).where(_tagged_users()).scalar_subquery(),
+                select(func.count()).where(_tagged_platforms()).scalar_subquery(),
+                select(func.count()).select_from(Event).join(User).where(_tagged_users()).scalar_subquery(),
+            ))).one()
+        print(f"пользователей: {counts[0]}, площадок: {counts[1]}, событий: {counts[2]}")
+    finally:
+        await dispose_engine()
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Синтетические данные для нагрузочных тестов")
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--platforms", type=int, default=2000)
+    parser.add_argument("--events", type=int, default=1000000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--clean", action="store_true", help="только удалить сгенерированные данные")
+    sys.exit(asyncio.run(main(parser.parse_args())))
@@ -0,0 +1,354 @@
+"""Нагрузочный прогон API в процессе, с отчетом и сравнением с базовой линией.
+
+Запуск: python -m benchmarks.load [--scenario mixed] [--duration 30] [--warmup 3]
+                                  [--concurrency 16] [--seed 0] [--out report.json]
+                                  [--baseline baseline.json] [--tolerance 0.15]
+
+Нужны данные benchmarks.datagen. Виртуальные пользователи (--concurrency)
+входят под своими логинами и до конца прогона выполняют операции сценария
+с заданными весами через httpx.ASGITransport, без сети и uvicorn. Генератор
+нагрузки делит процесс и event loop с приложением, поэтому абсолютные числа
+ниже, чем у отдельного сервера: сравнивать имеет смысл прогоны на одной машине.
+
+Для каждой операции считаются запросы, ошибки (код не 2xx/304), запросы в
+секунду, p50/p95/p99 и среднее число SQL-выражений на запрос (по
+before_cursor_execute, с привязкой к операции через contextvar). Отчет
+пишется в --out. С --baseline отчет сравнивается с сохраненным ранее: рост
+p95 или падение пропускной способности больше --tolerance (для операций
+хотя бы с MIN_SAMPLES запросами), а также рост числа выражений на запрос
+сильнее того же допуска считаются регрессией, и скрипт завершается с кодом 1.
+"""
+import argparse
+import asyncio
+import contextvars
+import io
+import itertools
+import json
+import platform as platform_info
+import random
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from datetime import date, datetime, timedelta, timezone
+from typing import Awaitable, Callable, Dict, List, Optional
+
+import httpx
+from PIL import Image
+from sqlalchemy import event, select, func
+
+from app.database.database import get_engine, get_session_factory
+from app.models.models import User, Platform, Event
+from benchmarks.datagen import TAG, PASSWORD, PLATFORM_PREFIX, PLATFORM_NAMES, EVENT_NAMES
+from main import app
+
+SCENARIOS: Dict[str, Dict[str, int]] = {
+    "read": {"list_platforms": 3, "get_platform": 4, "list_events": 3, "get_event": 4, "get_user": 2, "suggest": 2},
+    "write": {"login": 1, "create_event": 6, "upload": 1},
+    "mixed": {
+        "login": 1, "list_platforms": 4, "get_platform": 6, "list_events": 4, "get_event": 6,
+        "get_user": 2, "suggest": 2, "create_event": 2, "upload": 1,
+    },
+}
+# Созданные при прогоне события идут по одному в день начиная с этой даты,
+# поэтому не пересекаются ни с данными datagen, ни друг с другом
+CREATED_EVENTS_START = date(2200, 1, 1)
+SAMPLE_EVENTS = 10000
+# Меньше запросов - p95 и rps операции шумят сильнее допуска, сравнивается только число SQL
+MIN_SAMPLES = 50
+
+_operation: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("load_operation", default=None)
+
+
+class Dataset:
+    """Идентификаторы сгенерированных данных, из которых операции выбирают случайные."""
+
+    def __init__(self, users: List[tuple], platforms: List[tuple], events: List[int], cities: List[str]):
+        self.users = users  # (UserID, Login)
+        self.platforms = platforms  # (PlatformID, City)
+        self.events = events
+        self.cities = cities
+
+    @classmethod
+    async def load(cls) -> "Dataset":
+        async with get_session_factory()() as session:
+            users = [tuple(row) for row in await session.execute(
+                select(User.UserID, User.Login).where(User.Login.startswith(f"{TAG}_", autoescape=True))
+            )]
+            platforms = [tuple(row) for row in await session.execute(
+                select(Platform.PlatformID, Platform.City).where(Platform.Name.startswith(PLATFORM_PREFIX, autoescape=True))
+            )]
+            events = list((await session.execute(
+                select(Event.EventID).where(Event.PlatformID.in_([p[0] for p in platforms[:1000]])).limit(SAMPLE_EVENTS)
+            )).scalars()) if platforms else []
+        cities = sorted({city for _, city in platforms})
+        return cls(users, platforms, events, cities)
+
+    async def counts(self) -> Dict[str, int]:
+        async with get_session_factory()() as session:
+            events = (await session.execute(
+                select(func.count()).select_from(Event).join(User).where(User.Login.startswith(f"{TAG}_", autoescape=True))
+            )).scalar_one()
+        return {"users": len(self.users), "platforms": len(self.platforms), "events": events}
+
+
+class VirtualUser:
+    def __init__(self, client: httpx.AsyncClient, data: Dataset, rng: random.Random, user: tuple, created: itertools.count):
+        self.client = client
+        self.data = data
+        self.rng = rng
+        self.user_id, self.user_login = user
+        self.created = created
+        self.headers: Dict[str, str] = {}
+        self.created_events: List[int] = []
+
+    async def sign_in(self):
+        r = await self.client.post("/v1/token", data={"username": self.user_login, "password": PASSWORD})
+        r.raise_for_status()
+        self.headers = {"Authorization": f"Bearer {r.json()['access_token']}"}
+
+    # Операции: возвращают ответ, время и ошибки считает драйвер
+
+    async def login(self):
+        _, login = self.rng.choice(self.data.users)
+        return await self.client.post("/v1/token", data={"username": login, "password": PASSWORD})
+
+    async def list_platforms(self):
+        return await self.client.get("/v1/platforms/", params={"city": self.rng.choice(self.data.cities), "limit": 50})
+
+    async def get_platform(self):
+        platform_id, _ = self.rng.choice(self.data.platforms)
+        return await self.client.get(f"/v1/platforms/{platform_id}")
+
+    async def list_events(self):
+        platform_id, _ = self.rng.choice(self.data.platforms)
+        return await self.client.get("/v1/events/", params={"platform_id": platform_id, "limit": 50})
+
+    async def get_event(self):
+        return await self.client.get(f"/v1/events/{self.rng.choice(self.data.events)}")
+
+    async def get_user(self):
+        user_id, _ = self.rng.choice(self.data.users)
+        return await self.client.get(f"/v1/users/{user_id}")
+
+    async def suggest(self):
+        _, city = self.rng.choice(self.data.platforms)
+        word = self.rng.choice(PLATFORM_NAMES + EVENT_NAMES)
+        return await self.client.get("/v1/search/suggest", params={"q": word[:self.rng.randint(2, len(word))], "city": city})
+
+    async def create_event(self):
+        platform_id, city = self.rng.choice(self.data.platforms)
+        day = (CREATED_EVENTS_START + timedelta(days=next(self.created))).isoformat()
+        r = await self.client.post("/v1/events/", headers=self.headers, json={
+            "UserID": self.user_id, "PlatformID": platform_id, "Name": "Нагрузочный тест", "City": city,
+            "DateStart": day, "DateEnd": day, "TimeStart": "10:00", "TimeEnd": "11:00",
+            "Description": "benchmarks.load", "Address": "-",
+        })
+        if r.status_code == 200:
+            self.created_events.append(r.json()["EventID"])
+        return r
+
+    async def upload(self):
+        color = tuple(self.rng.randrange(256) for _ in range(3))
+        buffer = io.BytesIO()
+        Image.new("RGB", (64, 64), color).save(buffer, "PNG")
+        return await self.client.put(
+            f"/v1/users/{self.user_id}", headers=self.headers,
+            files={"photo_file": ("load.png", buffer.getvalue(), "image/png")}
+        )
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.statements: Dict[str, int] = defaultdict(int)
+        self.recording = False
+
+    def on_statement(self, conn, cursor, statement, parameters, context, executemany):
+        operation = _operation.get()
+        if operation is not None and self.recording:
+            self.statements[operation] += 1
+
+    async def call(self, name: str, operation: Callable[[], Awaitable[httpx.Response]]):
+        token = _operation.set(name)
+        started = time.perf_counter()
+        try:
+            response = await operation()
+            ok = 200 <= response.status_code < 300 or response.status_code == 304
+        except Exception:
+            ok = False
+        finally:
+            _operation.reset(token)
+        if self.recording:
+            self.latencies[name].append(time.perf_counter() - started)
+            if not ok:
+                self.errors[name] += 1
+
+
+def _percentile(ordered: List[float], q: float) -> float:
+    """Ближайший ранг: значение, не меньше которого q-я доля наблюдений."""
+    if not ordered:
+        return 0.0
+    rank = max(1, int(round(q * len(ordered) + 0.5 - 1e-9)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def _summary(latencies: List[float], errors: int, statements: int, duration: float) -> dict:
+    ordered = sorted(latencies)
+    count = len(ordered)
+    return {
+        "requests": count,
+        "errors": errors,
+        "rps": round(count / duration, 2),
+        "p50_ms": round(_percentile(ordered, 0.50) * 1000, 3),
+        "p95_ms": round(_percentile(ordered, 0.95) * 1000, 3),
+        "p99_ms": round(_percentile(ordered, 0.99) * 1000, 3),
+        "statements_per_request": round(statements / count, 3) if count else 0.0,
+    }
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+async def run(args: argparse.Namespace) -> dict:
+    weights = SCENARIOS[args.scenario]
+    names, cumulative = list(weights), list(itertools.accumulate(weights.values()))
+    recorder = Recorder()
+    async with app.router.lifespan_context(app):
+        data = await Dataset.load()
+        if not data.users or not data.platforms or not data.events:
+            raise SystemExit("нет данных для нагрузки, сначала запустите python -m benchmarks.datagen")
+        engine = get_engine()
+        event.listen(engine.sync_engine, "before_cursor_execute", recorder.on_statement)
+        created = itertools.count()
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://load", timeout=None) as client:
+            rng = random.Random(args.seed)
+            users = [
+                VirtualUser(client, data, random.Random(args.seed * 1000 + i), user, created)
+                for i, user in enumerate(rng.sample(data.users, min(args.concurrency, len(data.users))))
+            ]
+            await asyncio.gather(*(user.sign_in() for user in users))
+
+            stop_at = 0.0
+
+            async def loop(user: VirtualUser):
+                while time.perf_counter() < stop_at:
+                    name = user.rng.choices(names, cum_weights=cumulative)[0]
+                    await recorder.call(name, getattr(user, name))
+
+            stop_at = time.perf_counter() + args.warmup
+            await asyncio.gather(*(loop(user) for user in users))
+            recorder.recording = True
+            started = time.perf_counter()
+            stop_at = started + args.duration
+            await asyncio.gather(*(loop(user) for user in users))
+            duration = time.perf_counter() - started
+            recorder.recording = False
+
+            # Созданные прогоном события удаляются, чтобы следующий прогон шел на тех же данных
+            for user in users:
+                for event_id in user.created_events:
+                    await client.delete(f"/v1/events/{event_id}", headers=user.headers)
+        event.remove(engine.sync_engine, "before_cursor_execute", recorder.on_statement)
+        dataset = await data.counts()
+
+    operations = {
+        name: _summary(recorder.latencies[name], recorder.errors[name], recorder.statements[name], duration)
+        for name in names if recorder.latencies[name]
+    }
+    total = _summary(
+        [value for values in recorder.latencies.values() for value in values],
+        sum(recorder.errors.values()), sum(recorder.statements.values()), duration
+    )
+    return {
+        "meta": {
+            "scenario": args.scenario, "concurrency": len(users), "duration_s": round(duration, 3),
+            "warmup_s": args.warmup, "seed": args.seed,
+            "started_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "dialect": get_engine().dialect.name, "dataset": dataset,
+            "python": platform_info.python_version(), "commit": _git_commit(),
+        },
+        "total": total,
+        "operations": operations,
+    }
+
+
+def compare(report: dict, baseline: dict, tolerance: float) -> List[str]:
+    """Печатает сравнение с базовой линией и возвращает список регрессий."""
+    regressions = []
+    print(f"\n{'operation':16} {'rps':>21} {'p95, ms':>23} {'SQL/req':>15}")
+    rows = list(report["operations"].items()) + [("TOTAL", report["total"])]
+    for name, current in rows:
+        base = baseline["total"] if name == "TOTAL" else baseline["operations"].get(name)
+        if base is None:
+            print(f"{name:16} (нет в базовой линии)")
+            continue
+        rps_change = current["rps"] / base["rps"] - 1 if base["rps"] else 0.0
+        p95_change = current["p95_ms"] / base["p95_ms"] - 1 if base["p95_ms"] else 0.0
+        marks = []
+        if min(current["requests"], base["requests"]) >= MIN_SAMPLES:
+            if rps_change < -tolerance:
+                marks.append("rps")
+            if p95_change > tolerance:
+                marks.append("p95")
+        # Кэши (подсказки, каталог) делают число выражений не строго постоянным;
+        # N+1 дает рост в разы, а не на проценты
+        if current["statements_per_request"] > base["statements_per_request"] * (1 + tolerance) + 0.01:
+            marks.append("SQL")
+        if marks:
+            regressions.append(f"{name}: {', '.join(marks)}")
+        print(
+            f"{name:16} {base['rps']:>8.1f} -> {current['rps']:>8.1f} {rps_change:+4.0%}"
+            f" {base['p95_ms']:>8.1f} -> {current['p95_ms']:>8.1f} {p95_change:+4.0%}"
+            f" {base['statements_per_request']:>6.2f} -> {current['statements_per_request']:>5.2f}"
+            + ("  <-- " + ", ".join(marks) if marks else "")
+        )
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Нагрузочный прогон API в процессе")
+    parser.add_argument("--scenario", choices=sorted(SCENARIOS), default="mixed")
+    parser.add_argument("--duration", type=float, default=30.0, help="секунд измерения")
+    parser.add_argument("--warmup", type=float, default=3.0, help="секунд прогрева без учета")
+    parser.add_argument("--concurrency", type=int, default=16, help="виртуальных пользователей")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default="load_report.json")
+    parser.add_argument("--baseline", help="отчет прошлого прогона для сравнения")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="допустимое ухудшение rps и p95 (доля)")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+    print(f"{'operation':16} {'requests':>9} {'errors':>7} {'rps':>9} {'p50':>9} {'p95':>9} {'p99':>9} {'SQL/req':>8}")
+    for name, stats in list(report["operations"].items()) + [("TOTAL", report["total"])]:
+        print(
+            f"{name:16} {stats['requests']:>9} {stats['errors']:>7} {stats['rps']:>9.1f}"
+            f" {stats['p50_ms']:>9.2f} {stats['p95_ms']:>9.2f} {stats['p99_ms']:>9.2f} {stats['statements_per_request']:>8.2f}"
+        )
+    print(f"отчет: {args.out}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline["meta"].get("scenario") != report["meta"]["scenario"]:
+            print("внимание: сценарий базовой линии другой")
+        regressions = compare(report, baseline, args.tolerance)
+        if regressions:
+            print("\nрегрессии: " + "; ".join(regressions))
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,99 @@
+"""Стоимость сериализации страницы списка на 10 000 строк.
+
+Запуск: python -m benchmarks.serialization [--rows N] [--repeat N]
+
+Сравниваются прежний путь (схема на каждую строку, затем проверка по
+response_model и json.dumps внутри FastAPI) и быстрый (SchemaMapper одной
+проверкой на список и dump_json без повторной проверки). Строки ORM
+создаются в памяти, база не нужна.
+"""
+import argparse
+import asyncio
+import json
+import time
+from datetime import datetime, date, time as dtime
+from typing import List
+
+from fastapi.responses import JSONResponse, ORJSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+from app.models.models import Event, Platform
+from app.routing.events.events_router import _events
+from app.routing.platform.platform_router import _platforms, _to_response
+from app.schemas.request.events.events_schemas import EventResponse
+from app.schemas.request.platform.platform_schemas import PlatformResponse
+
+
+def _platform_rows(n: int):
+    return [
+        Platform(
+            PlatformID=i, Name=f"Площадка {i}", City="Москва", Address=f"ул. Тестовая, {i}",
+            Latitude=55.0 + i * 1e-5, Longitude=37.0 + i * 1e-5, Image=f"{i:064x}.png",
+            UpdatedAt=datetime(2026, 1, 1)
+        )
+        for i in range(n)
+    ]
+
+
+def _event_rows(n: int):
+    return [
+        Event(
+            EventID=i, UserID=i % 100, PlatformID=i % 1000, Name=f"Событие {i}", City="Москва",
+            DateStart=datetime(2026, 1, 1), DateEnd=datetime(2026, 1, 1),
+            TimeStart=dtime(10), TimeEnd=dtime(11), Description="Описание", Address="Адрес",
+            UpdatedAt=datetime(2026, 1, 1)
+        )
+        for i in range(n)
+    ]
+
+
+def _best(fn, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main(args: argparse.Namespace):
+    platforms, events = _platform_rows(args.rows), _event_rows(args.rows)
+    platform_field = create_response_field(name="platforms", type_=List[PlatformResponse])
+    event_field = create_response_field(name="events", type_=List[EventResponse])
+
+    def legacy(field, content, response_class=JSONResponse):
+        # То, что делает FastAPI с возвращенным dict при response_model
+        serialized = asyncio.run(serialize_response(field=field, response_content=content))
+        return response_class(serialized).body
+
+    cases = {
+        "platforms: прежний путь": lambda: legacy(
+            platform_field, [_to_response(p) for p in platforms]
+        ),
+        "platforms: прежний путь + orjson": lambda: legacy(
+            platform_field, [_to_response(p) for p in platforms], ORJSONResponse
+        ),
+        "platforms: SchemaMapper + dump_json": lambda: _platforms.dump_json(_platforms.many(platforms)),
+        "events: прежний путь": lambda: legacy(event_field, events),
+        "events: прежний путь + orjson": lambda: legacy(
+            event_field, events, ORJSONResponse
+        ),
+        "events: SchemaMapper + dump_json": lambda: _events.dump_json(_events.many(events)),
+    }
+
+    # Оба пути должны отдавать одинаковые данные
+    assert json.loads(cases["platforms: прежний путь"]()) == json.loads(cases["platforms: SchemaMapper + dump_json"]())
+    assert json.loads(cases["events: прежний путь"]()) == json.loads(cases["events: SchemaMapper + dump_json"]())
+
+    print(f"{args.rows} строк, лучшее из {args.repeat}")
+    for name, fn in cases.items():
+        seconds = _best(fn, args.repeat)
+        print(f"{name:44} {seconds * 1000:8.1f} мс  {seconds / args.rows * 1e6:6.2f} мкс/строка")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Сериализация списков")
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    main(parser.parse_args())
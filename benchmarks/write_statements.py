@@ -0,0 +1,145 @@
+"""Число SQL-запросов на одну запись через API.
+
+Запуск: python -m benchmarks.write_statements
+
+Каждый эндпоинт вызывается через ASGI-транспорт против базы из настроек,
+запросы считаются по событию before_cursor_execute движка. Отдельно
+учитываются чтения (SELECT) - например, поиск пользователя по токену при
+холодном кэше - и запросы, меняющие данные. BEGIN/COMMIT asyncpg отправляет
+мимо курсора, в счет они не входят. Если запросов записи больше бюджета,
+скрипт завершается с кодом 1. Созданные данные удаляются в конце.
+"""
+import asyncio
+import io
+import sys
+import uuid
+from contextlib import contextmanager
+from typing import Dict, List
+
+import httpx
+from PIL import Image
+from sqlalchemy import event, text
+
+from app.database.database import get_engine, get_session_factory
+from app.settings.settings import settings
+from main import app
+
+# Сколько изменяющих запросов допускается на вызов
+BUDGET = {
+    "POST /v1/register": 1,
+    "PUT /v1/users/{id}": 1,
+    "PUT /v1/users/{id} (PhotoURL)": 2,
+    "POST /v1/platforms/": 2,
+    "PUT /v1/platforms/{id}": 1,
+    "PUT /v1/platforms/{id} (Latitude)": 1,
+    "PUT /v1/platforms/{id} (image)": 2,
+    "POST /v1/events/": 1,
+    "POST /v1/events/bulk (100)": 1,
+    "PUT /v1/events/{id}": 1,
+    "DELETE /v1/events/{id}": 1,
+    "DELETE /v1/platforms/{id}": 1,
+}
+
+
+class StatementCounter:
+    def __init__(self):
+        self.statements: List[str] = []
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement.lstrip())
+
+    @contextmanager
+    def measure(self, results: Dict[str, Dict[str, int]], name: str):
+        self.statements = []
+        yield
+        reads = sum(1 for s in self.statements if s.upper().startswith("SELECT"))
+        results[name] = {"reads": reads, "writes": len(self.statements) - reads}
+
+
+def _png(color) -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", (16, 16), color).save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+async def run() -> Dict[str, Dict[str, int]]:
+    counter = StatementCounter()
+    results: Dict[str, Dict[str, int]] = {}
+    # Фоновая отметка готовности вариантов попала бы в счет следующего вызова
+    settings.IMAGE_VARIANTS_ENABLED = False
+    async with app.router.lifespan_context(app):
+        event.listen(get_engine().sync_engine, "before_cursor_execute", counter)
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            login = f"bench_{uuid.uuid4().hex[:8]}"
+            with counter.measure(results, "POST /v1/register"):
+                r = await client.post("/v1/register", json={"Login": login, "PasswordHash": "pw", "Email": f"{login}@example.com"})
+            user_id = r.json()["user_id"]
+            token = (await client.post("/v1/token", data={"username": login, "password": "pw"})).json()["access_token"]
+            auth = {"Authorization": f"Bearer {token}"}
+
+            with counter.measure(results, "PUT /v1/users/{id}"):
+                await client.put(f"/v1/users/{user_id}", params={"City": "Bench"}, headers=auth)
+            with counter.measure(results, "PUT /v1/users/{id} (PhotoURL)"):
+                await client.put(f"/v1/users/{user_id}", files={"photo_file": ("p.png", _png((1, 1, 1)), "image/png")}, headers=auth)
+
+            form = {"name": login, "city": "Bench", "address": "-", "latitude": "55.7", "longitude": "37.6"}
+            with counter.measure(results, "POST /v1/platforms/"):
+                r = await client.post("/v1/platforms/", data=form, files={"image": ("a.png", _png((2, 2, 2)), "image/png")}, headers=auth)
+            platform_id = r.json()["PlatformID"]
+            with counter.measure(results, "PUT /v1/platforms/{id}"):
+                await client.put(f"/v1/platforms/{platform_id}", data={"name": login + "_2"}, headers=auth)
+            # Одна координата: GeoHash досчитывается по второй из БД
+            with counter.measure(results, "PUT /v1/platforms/{id} (Latitude)"):
+                r = await client.put(f"/v1/platforms/{platform_id}", data={"latitude": "55.8"}, headers=auth)
+            r.raise_for_status()
+            with counter.measure(results, "PUT /v1/platforms/{id} (image)"):
+                await client.put(f"/v1/platforms/{platform_id}", files={"image": ("b.png", _png((3, 3, 3)), "image/png")}, headers=auth)
+
+            def payload(minute: int) -> dict:
+                # Минутные события одного дня, чтобы не пересекались
+                return {
+                    "UserID": user_id, "PlatformID": platform_id, "Name": "bench", "City": "Bench",
+                    "DateStart": "2099-01-01", "DateEnd": "2099-01-01",
+                    "TimeStart": f"{minute // 60:02d}:{minute % 60:02d}",
+                    "TimeEnd": f"{(minute + 1) // 60:02d}:{(minute + 1) % 60:02d}",
+                    "Description": "-", "Address": "-"
+                }
+
+            with counter.measure(results, "POST /v1/events/"):
+                r = await client.post("/v1/events/", json=payload(0), headers=auth)
+            event_id = r.json()["EventID"]
+            with counter.measure(results, "POST /v1/events/bulk (100)"):
+                await client.post("/v1/events/bulk", json=[payload(i) for i in range(1, 101)], headers=auth)
+            with counter.measure(results, "PUT /v1/events/{id}"):
+                await client.put(f"/v1/events/{event_id}", json={"Name": "bench_2"}, headers=auth)
+            with counter.measure(results, "DELETE /v1/events/{id}"):
+                await client.delete(f"/v1/events/{event_id}", headers=auth)
+
+            async with get_session_factory()() as session:
+                await session.execute(text('DELETE FROM "Events" WHERE "PlatformID" = :id'), {"id": platform_id})
+                await session.commit()
+            with counter.measure(results, "DELETE /v1/platforms/{id}"):
+                await client.delete(f"/v1/platforms/{platform_id}", headers=auth)
+
+            async with get_session_factory()() as session:
+                await session.execute(text('DELETE FROM "Users" WHERE "UserID" = :id'), {"id": user_id})
+                await session.commit()
+        event.remove(get_engine().sync_engine, "before_cursor_execute", counter)
+    return results
+
+
+def main() -> int:
+    results = asyncio.run(run())
+    over = 0
+    print(f"{'endpoint':34} {'writes':>6} {'budget':>6} {'reads':>6}")
+    for name, counts in results.items():
+        budget = BUDGET[name]
+        mark = "" if counts["writes"] <= budget else "  <-- over budget"
+        over += counts["writes"] > budget
+        print(f"{name:34} {counts['writes']:>6} {budget:>6} {counts['reads']:>6}{mark}")
+    return 1 if over else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,17 +1,58 @@
 from fastapi import FastAPI, HTTPException
-from fastapi.staticfiles import StaticFiles
 import uvicorn
+import asyncio
+from contextlib import asynccontextmanager
 from app.routing.main_router import main_router
+from app.database.database import init_engine, dispose_engine
+from app.security.hasher import calibrate_rounds
+from app.settings.settings import settings
+from app.storage.variants import shutdown_variant_pool
+from app.storage.static import MediaFiles
+from app.cache import user_cache
+from app.service.platform_service.platform_catalog import platform_catalog
+from app.utils.serialization import default_response_class
+from app.metrics.middleware import MetricsMiddleware
+from app.metrics.profiler import ProfilerMiddleware, profiler_enabled
+from app.routing.metrics.metrics_router import router as metrics_router
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Пул соединений создается один раз на процесс и закрывается при остановке
+    init_engine()
+    # Стоимость bcrypt подбирается под целевое время хэширования на этой машине
+    await asyncio.to_thread(calibrate_rounds)
+    catalog_task = None
+    if settings.PLATFORM_CATALOG_ENABLED:
+        # Снимок позволяет отвечать до первой загрузки каталога из БД
+        platform_catalog.load_snapshot()
+        catalog_task = asyncio.create_task(platform_catalog.run())
+    yield
+    if catalog_task is not None:
+        catalog_task.cancel()
+        await asyncio.gather(catalog_task, return_exceptions=True)
+        await platform_catalog.close()
+    shutdown_variant_pool()
+    await user_cache.close()
+    await dispose_engine()
+
 
 app = FastAPI(
     title= "PlayPlace",
     description="Платформа для поиска спортивных площадок",
     version="1.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    default_response_class=default_response_class(),
+    lifespan=lifespan
 )
-app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
+app.mount("/uploads", MediaFiles(directory=settings.UPLOAD_DIR), name="uploads")
 app.include_router(main_router)
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+    app.include_router(metrics_router)
+if profiler_enabled():
+    app.add_middleware(ProfilerMiddleware)
 
 
 
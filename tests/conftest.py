@@ -0,0 +1,25 @@
+import os
+
+import pytest
+
+# Обязательные настройки для импорта приложения; база в тестах - SQLite в памяти
+for name, value in {
+    "POSTGRES_HOST": "localhost",
+    "POSTGRES_PORT": "5432",
+    "POSTGRES_USER": "test",
+    "POSTGRES_PASSWORD": "test",
+    "POSTGRES_DB": "test",
+    "API_BASE_PORT": "8000",
+    "JWT_ALGORITHM": "HS256",
+    "JWT_SECRET_KEY": "test-secret-test-secret-test-secret",
+    "JWT_ACCESS_TOKEN_LIFETIME_HOURS": "1",
+    "JWT_ACCESS_TOKEN_LIFETIME_MINUTES": "60",
+    "JWT_REFRESH_TOKEN_LIFETIME_HOURS": "24",
+    "BCRYPT_ROUNDS": "4",
+}.items():
+    os.environ.setdefault(name, value)
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
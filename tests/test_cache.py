@@ -0,0 +1,70 @@
+import anyio
+import fakeredis
+import pytest
+
+from app.cache.backends import MISSING, MemoryCache, RedisCache
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture(params=["memory", "redis"])
+def cache(request):
+    if request.param == "memory":
+        return MemoryCache(max_size=100)
+    return RedisCache(client=fakeredis.FakeAsyncRedis(), prefix="test:")
+
+
+async def test_missing_key(cache):
+    assert await cache.get("absent") is MISSING
+
+
+async def test_set_get(cache):
+    await cache.set("id:1", {"Login": "user"}, ttl=60)
+    assert await cache.get("id:1") == {"Login": "user"}
+
+
+async def test_ttl_expires(cache):
+    await cache.set("id:1", {"Login": "user"}, ttl=0.05)
+    await anyio.sleep(0.1)
+    assert await cache.get("id:1") is MISSING
+
+
+async def test_zero_ttl_is_not_stored(cache):
+    await cache.set("id:1", {"Login": "user"}, ttl=0)
+    assert await cache.get("id:1") is MISSING
+
+
+async def test_negative_entry(cache):
+    # Закэшированное отсутствие отличается от промаха
+    await cache.set("login:nobody", None, ttl=60)
+    assert await cache.get("login:nobody") is None
+
+
+async def test_delete(cache):
+    await cache.set("id:1", {"Login": "user"}, ttl=60)
+    await cache.set("login:user", {"Login": "user"}, ttl=60)
+    await cache.delete("id:1", "login:user", "login:absent")
+    assert await cache.get("id:1") is MISSING
+    assert await cache.get("login:user") is MISSING
+
+
+async def test_memory_evicts_least_recently_used():
+    cache = MemoryCache(max_size=2)
+    await cache.set("a", 1, ttl=60)
+    await cache.set("b", 2, ttl=60)
+    await cache.get("a")
+    await cache.set("c", 3, ttl=60)
+    assert await cache.get("b") is MISSING
+    assert await cache.get("a") == 1
+    assert await cache.get("c") == 3
+
+
+async def test_redis_invalidation_is_shared():
+    # Два воркера с общим Redis: сброс в одном виден другому
+    server = fakeredis.FakeServer()
+    first = RedisCache(client=fakeredis.FakeAsyncRedis(server=server), prefix="kurs:user:")
+    second = RedisCache(client=fakeredis.FakeAsyncRedis(server=server), prefix="kurs:user:")
+    await first.set("id:1", {"Login": "user"}, ttl=60)
+    assert await second.get("id:1") == {"Login": "user"}
+    await second.delete("id:1")
+    assert await first.get("id:1") is MISSING
@@ -0,0 +1,29 @@
+import argparse
+
+import asyncpg
+import pytest
+from sqlalchemy.exc import DBAPIError
+
+from app.database import plancheck
+from app.database.database import dispose_engine, get_engine
+
+pytestmark = pytest.mark.anyio
+
+
+async def _postgres_available() -> bool:
+    try:
+        async with get_engine().connect():
+            return True
+    except (OSError, DBAPIError, asyncpg.PostgresError):
+        return False
+    finally:
+        await dispose_engine()
+
+
+async def test_service_queries_use_indexes():
+    """План каждого SELECT сервисов без Seq Scan (нужна мигрированная база Postgres из настроек)."""
+    if not await _postgres_available():
+        pytest.skip("Postgres из настроек недоступен")
+    # С enable_seqscan = off хватает небольших объемов: падает только запрос без индекса
+    args = argparse.Namespace(users=2000, platforms=500, events=20000, strict=True)
+    assert await plancheck.main(args) == 0
@@ -0,0 +1,81 @@
+import fakeredis
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.pool import StaticPool
+
+from app.cache.backends import MISSING, MemoryCache, RedisCache
+from app.models.models import Base
+from app.schemas.request.users.user_registration_schema import UserRegistration
+from app.service.user_service import user_service as user_service_module
+from app.service.user_service.user_service import UserService
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture(params=["memory", "redis"])
+def cache(request, monkeypatch):
+    if request.param == "memory":
+        backend = MemoryCache(max_size=100)
+    else:
+        backend = RedisCache(client=fakeredis.FakeAsyncRedis(), prefix="test:")
+    monkeypatch.setattr(user_service_module, "user_cache", backend)
+    return backend
+
+
+@pytest.fixture
+async def session():
+    engine = create_async_engine("sqlite+aiosqlite://", poolclass=StaticPool)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    async with AsyncSession(engine, expire_on_commit=False) as session:
+        yield session
+    await engine.dispose()
+
+
+async def _register(service: UserService, login: str, password: str = "secret"):
+    return await service.register(UserRegistration(Login=login, Email=f"{login}@example.com", PasswordHash=password))
+
+
+async def test_negative_entry_cleared_by_register(session, cache):
+    service = UserService(session)
+    assert await service.get_user_by_login("Alice") is None
+    assert await cache.get("login:alice") is None
+
+    await _register(service, "Alice")
+    user = await service.get_user_by_login("alice")
+    assert user is not None and user.Login == "Alice"
+
+
+async def test_cache_has_no_password_hash(session, cache):
+    service = UserService(session)
+    user = await _register(service, "bob")
+    cached_user = await service.get_user_by_id(user.UserID)
+    assert cached_user.PasswordHash
+    entry = await cache.get(f"id:{user.UserID}")
+    assert entry is not MISSING and "PasswordHash" not in entry
+    assert (await service.get_user_by_id(user.UserID)).PasswordHash is None
+
+
+async def test_update_invalidates_id_and_logins(session, cache):
+    service = UserService(session)
+    user = await _register(service, "carol")
+    await service.get_user_by_id(user.UserID)
+    await service.get_user_by_login("carol")
+
+    await service.update_profile(user.UserID, {"Login": "Caroline", "City": "Казань"})
+
+    assert (await service.get_user_by_id(user.UserID)).City == "Казань"
+    assert await service.get_user_by_login("carol") is None
+    assert (await service.get_user_by_login("caroline")).UserID == user.UserID
+
+
+async def test_login_checks_password_in_database(session, cache):
+    service = UserService(session)
+    user = await _register(service, "dave", password="old")
+    await service.get_user_by_login("dave")
+    await service.update_profile(user.UserID, {"Password": "new"})
+    # Запись другого воркера, не получившего сброс
+    await cache.set("login:dave", {"UserID": user.UserID, "Login": "dave", "PasswordHash": "stale"}, ttl=60)
+
+    assert await service.authenticate_user("dave", "old") == "Invalid password"
+    assert (await service.authenticate_user("DAVE", "new")).UserID == user.UserID